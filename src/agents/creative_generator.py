@@ -1,33 +1,134 @@
-from langchain_groq import ChatGroq
 from langchain_core.messages import SystemMessage, HumanMessage
-import yaml
-import os
+import asyncio
+import contextvars
 import json
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from src.utils.config import load_config
 from src.utils.logger import logger
-from src.utils.error_handler import safe_execute, AgentExecutionError
+from src.utils.error_handler import safe_execute, AgentExecutionError, BudgetExceededError
+from src.utils.llm import create_llm, invoke_llm, ainvoke_llm
+from src.utils import tracing
+from src.utils.evidence import SEGMENT_SEPARATORS
 from src.schema import CreativeOutput, InsightOutput
 
 # Load config
-with open("config/config.yaml", "r") as f:
-    config = yaml.safe_load(f)
+config = load_config()
+fan_out_settings = config.get("creative", {})
+
+def _table_rows(table: str) -> Tuple[List[str], List[Tuple[str, List[str]]]]:
+    """
+    Header cells and (line, cells) of each body row of a markdown table.
+    """
+    def cells(line):
+        return [cell.strip() for cell in line.strip().strip("|").split("|")]
+    lines = table.splitlines()
+    if len(lines) < 2:
+        return [], []
+    return cells(lines[0]), [(line, cells(line)) for line in lines[2:] if line.strip().startswith("|")]
+
+def _filter_context(top_ads_context: str, campaigns: List[str]) -> str:
+    """
+    Keeps the table header and the top-ads rows whose campaign_name is exactly one
+    of `campaigns`; the whole context if there is no such row or column.
+    """
+    header, rows = _table_rows(top_ads_context)
+    if "campaign_name" not in header or not campaigns:
+        return top_ads_context
+    column = header.index("campaign_name")
+    kept = [line for line, cells in rows if column < len(cells) and cells[column] in campaigns]
+    return "\n".join(top_ads_context.splitlines()[:2] + kept) if kept else top_ads_context
+
+def _resolve_campaign(segment: str, campaigns: Dict[str, str]) -> Optional[str]:
+    """
+    The campaign a free-text segment names, matched like EvidenceVerifier resolves
+    segments: the whole text, or one part of a combined segment such as
+    "Campaign A / Instagram". None for platforms, audiences and other dimensions.
+    """
+    text = str(segment or "").strip().lower()
+    for part in [text] + SEGMENT_SEPARATORS.split(text):
+        if part in campaigns:
+            return campaigns[part]
+    return None
+
+def shard_insights(insights_json: str, top_ads_context: str, mode: str, campaigns: Optional[List[str]] = None) -> List[Tuple[str, str, str]]:
+    """
+    Splits the insights into (label, insights_json, top_ads_context) shards: one per
+    insight, or one per campaign. An insight belongs to the first campaign its
+    evidence segments name, checked against `campaigns` (the dataset's campaign
+    names; the top-ads campaigns if not given); insights about other segments go
+    to one "account-wide" shard with the full context. A single shard means no
+    fan-out.
+    """
+    try:
+        insights = json.loads(insights_json)
+    except json.JSONDecodeError:
+        return [("all insights", insights_json, top_ads_context)]
+    if mode not in ("campaign", "insight") or not isinstance(insights, list) or len(insights) < 2:
+        return [("all insights", insights_json, top_ads_context)]
+
+    if campaigns is None:
+        header, rows = _table_rows(top_ads_context)
+        column = header.index("campaign_name") if "campaign_name" in header else None
+        campaigns = [cells[column] for _, cells in rows if column is not None and column < len(cells)]
+    known = {str(name).strip().lower(): str(name) for name in campaigns}
+
+    groups = {}
+    for i, insight in enumerate(insights):
+        named = [_resolve_campaign(ev.get("segment"), known) for ev in insight.get("evidence") or []]
+        named = [name for name in named if name]
+        key = f"insight {i + 1}" if mode == "insight" else (named[0] if named else "account-wide")
+        group = groups.setdefault(key, {"insights": [], "campaigns": []})
+        group["insights"].append(insight)
+        group["campaigns"].extend(name for name in named if name not in group["campaigns"])
+    return [(label, json.dumps(group["insights"]),
+             top_ads_context if label == "account-wide" else _filter_context(top_ads_context, group["campaigns"]))
+            for label, group in groups.items()]
+
+def _run_coroutine(coroutine):
+    """
+    Runs a coroutine to completion from synchronous code. Inside a running event
+    loop (service mode, notebooks) asyncio.run would fail, so the coroutine gets
+    its own loop on a worker thread, with the caller's context so that spans and
+    token usage are still attributed to the current step.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    context = contextvars.copy_context()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(context.run, asyncio.run, coroutine).result()
+
+def merge_outputs(outputs: List[Optional[CreativeOutput]]) -> Optional[CreativeOutput]:
+    """
+    Concatenates shard outputs in shard order, dropping failed shards and repeated
+    recommendations.
+    """
+    seen = set()
+    recommendations = []
+    for output in outputs:
+        for rec in output.recommendations if output else []:
+            key = (rec.campaign_name, rec.suggested_headline)
+            if key not in seen:
+                seen.add(key)
+                recommendations.append(rec)
+    return CreativeOutput(recommendations=recommendations) if recommendations else None
 
 class CreativeGenerator:
     def __init__(self):
         logger.info("Initializing CreativeGenerator")
-        self.llm = ChatGroq(
-            model=config["llm"]["model"],
-            temperature=0.7, # Higher temp for creativity
-            groq_api_key=os.getenv("GROQ_API_KEY")
-        )
+        self.llm = create_llm(temperature=0.7) # Higher temp for creativity
+        # Campaign names from the dataset, set by create_agents to shard insights per campaign
+        self.campaigns: Optional[List[str]] = None
 
-    @safe_execute(default_return=None, log_context="CreativeGenerator.generate", retries=3)
-    def generate(self, insights_json: str, top_ads_context: str) -> CreativeOutput:
+    def system_prompt(self) -> str:
         """
-        Generates creative recommendations based on structured insights.
+        The system prompt, without the per-call inputs; part of the step memo key.
         """
-        logger.info("Generating creative recommendations...")
-        
+        return self._build_messages("", "")[0].content
+
+    def _build_messages(self, insights_json: str, top_ads_context: str) -> list:
         system_prompt = """You are a Creative Strategy Agent.
 Your goal is to generate new ad creatives that directly address performance issues identified in the insights.
 
@@ -53,19 +154,84 @@ CRITICAL:
 - Do not generate generic advice. Be specific.
 """
         
-        structured_llm = self.llm.with_structured_output(CreativeOutput)
+        return [
+            SystemMessage(content=system_prompt),
+            HumanMessage(content=f"Insights:\n{insights_json}\n\nTop Ads Context:\n{top_ads_context}")
+        ]
+
+    def _shards(self, insights_json: str, top_ads_context: str) -> List[Tuple[str, str, str]]:
+        return shard_insights(insights_json, top_ads_context, fan_out_settings.get("fan_out", "off"), self.campaigns)
+
+    def _merge(self, shards: List[Tuple[str, str, str]], outputs: list, insights_json: str) -> Optional[CreativeOutput]:
+        failed = [label for (label, _, _), output in zip(shards, outputs) if not isinstance(output, CreativeOutput)]
+        budget_errors = [o for o in outputs if isinstance(o, BudgetExceededError)]
+        if failed:
+            logger.warning(f"Creative shards failed after retries: {failed}")
+        if len(failed) == len(shards) and budget_errors:
+            raise budget_errors[0]
+        merged = merge_outputs([o if isinstance(o, CreativeOutput) else None for o in outputs])
+        logger.decision("CreativeGenerator", insights_json, merged, f"Merged creative recommendations from {len(shards) - len(failed)}/{len(shards)} shards")
+        return merged
+
+    # Each shard is retried on its own, so one malformed response does not regenerate the rest
+    @safe_execute(default_return=None, log_context="CreativeGenerator.shard", retries=fan_out_settings.get("shard_retries", 2))
+    async def _agenerate_shard(self, label: str, insights_json: str, top_ads_context: str) -> CreativeOutput:
+        tracing.current_span().set(shard=label)
+        return await ainvoke_llm(self.llm, self._build_messages(insights_json, top_ads_context), schema=CreativeOutput)
+
+    async def _afan_out(self, shards: List[Tuple[str, str, str]], insights_json: str) -> Optional[CreativeOutput]:
+        logger.info(f"Generating creatives in {len(shards)} shards: {[label for label, _, _ in shards]}")
+        semaphore = asyncio.Semaphore(fan_out_settings.get("max_concurrency", 4))
+
+        async def run(shard):
+            async with semaphore:
+                try:
+                    return await self._agenerate_shard(*shard)
+                except BudgetExceededError as e:
+                    return e
+
+        outputs = await asyncio.gather(*(run(shard) for shard in shards))
+        return self._merge(shards, outputs, insights_json)
+
+    @safe_execute(default_return=None, log_context="CreativeGenerator.generate", retries=3)
+    def generate(self, insights_json: str, top_ads_context: str) -> CreativeOutput:
+        """
+        Generates creative recommendations based on structured insights. With
+        `creative.fan_out` set, insights are split per campaign or per insight and
+        the shards run concurrently.
+        """
+        logger.info("Generating creative recommendations...")
+        shards = self._shards(insights_json, top_ads_context)
+        if len(shards) > 1:
+            return _run_coroutine(self._afan_out(shards, insights_json))
         
         try:
-            response = structured_llm.invoke([
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=f"Insights:\n{insights_json}\n\nTop Ads Context:\n{top_ads_context}")
-            ])
+            response = invoke_llm(self.llm, self._build_messages(insights_json, top_ads_context), schema=CreativeOutput)
             
             # Log decision
-            logger.decision("CreativeGenerator", insights_json, str(response)[:100], "Generated creative recommendations")
+            logger.decision("CreativeGenerator", insights_json, response, "Generated creative recommendations")
+            
+            return response
             
+        except Exception as e:
+            logger.error(f"Failed to generate creatives: {e}")
+            raise AgentExecutionError("LLM failed to produce valid creative recommendations.") from e
+
+    @safe_execute(default_return=None, log_context="CreativeGenerator.agenerate", retries=3)
+    async def agenerate(self, insights_json: str, top_ads_context: str) -> CreativeOutput:
+        """
+        Async variant of generate(), used by the concurrent plan executor.
+        """
+        logger.info("Generating creative recommendations...")
+        shards = self._shards(insights_json, top_ads_context)
+        if len(shards) > 1:
+            return await self._afan_out(shards, insights_json)
+        
+        try:
+            response = await ainvoke_llm(self.llm, self._build_messages(insights_json, top_ads_context), schema=CreativeOutput)
+            logger.decision("CreativeGenerator", insights_json, response, "Generated creative recommendations")
             return response
             
         except Exception as e:
             logger.error(f"Failed to generate creatives: {e}")
-            raise AgentExecutionError("LLM failed to produce valid creative recommendations.")
+            raise AgentExecutionError("LLM failed to produce valid creative recommendations.") from e
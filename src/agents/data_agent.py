@@ -1,91 +1,350 @@
+import asyncio
+import json
+import threading
 import pandas as pd
 from langchain_core.tools import tool
-from langchain_groq import ChatGroq
 from langchain_core.messages import SystemMessage, HumanMessage
-import yaml
-import os
 import re
+from src.utils.config import load_config
 from src.utils.logger import logger
-from src.utils.error_handler import safe_execute, DataProcessingError
-from src.utils.validators import validate_schema
+from src.utils.error_handler import safe_execute, BudgetExceededError, DataProcessingError
+from src.utils import tracing
+from src.utils.data_loader import load_dataset_delta, resolve_csv_path, snapshot_file
+from src.utils.metric_cube import MetricCube
+from src.utils.llm import create_llm, invoke_llm, ainvoke_llm
+from src.utils.cache import DiskCache, content_hash
+from src.utils.sandbox import SandboxPool, share_frame
+from src.utils.sandbox_worker import render_result
+from src.utils.operations import OPERATIONS, run_operation
+from src.utils.anomalies import precompute_anomalies, render_anomalies
+from src.schema import OperationCall
 
 # Load config
-with open("config/config.yaml", "r") as f:
-    config = yaml.safe_load(f)
+config = load_config()
+
+# Persistent memos shared across runs: normalized instruction -> validated code,
+# and (code, dataset fingerprint) -> rendered result.
+code_memo = DiskCache.from_settings(config.get("cache", {}).get("data_agent_code", {}), ".cache/data_agent_code.sqlite", "code_memo")
+result_memo = DiskCache.from_settings(config.get("cache", {}).get("data_agent_results", {}), ".cache/data_agent_results.sqlite", "result_memo")
+
+def normalize_instruction(instruction: str) -> str:
+    """
+    Canonical form of an instruction for memoization: case, whitespace and
+    trailing punctuation do not change what is being asked.
+    """
+    return re.sub(r"\s+", " ", instruction.strip().lower()).rstrip(" .!?;:")
+
+# Code that names specific dates is tied to the dataset version it was written for
+DATE_LITERAL = re.compile(r"\d{4}-\d{2}-\d{2}")
 
 class DataAgent:
     def __init__(self):
         logger.info("Initializing DataAgent")
-        csv_path = config["data"]["sample_path"] if config.get("use_sample_data", False) else config["data"]["csv_path"]
+        csv_path = resolve_csv_path()
         try:
-            self.df = pd.read_csv(csv_path)
-            self.df['date'] = pd.to_datetime(self.df['date'])
-            
-            # Calculate derived metrics if missing
-            if 'cpm' not in self.df.columns:
-                self.df['cpm'] = (self.df['spend'] / self.df['impressions'] * 1000).fillna(0)
-            if 'cpc' not in self.df.columns:
-                self.df['cpc'] = (self.df['spend'] / self.df['clicks']).fillna(0)
-                
-            logger.debug(f"Loaded data from {csv_path} with shape {self.df.shape}")
-            
-            # Validate Schema (Strict)
-            validate_schema(self.df)
-            
+            # Typed, validated frame; served from a memory-mapped snapshot when the CSV is unchanged
+            # and extended with just the appended rows when it only grew
+            self.df, self.data_fingerprint, self.data_delta = load_dataset_delta(csv_path)
+            self.data_lineage = self.data_delta.get("lineage", self.data_fingerprint)
         except Exception as e:
             logger.error(f"Failed to load or validate data from {csv_path}: {e}")
             raise e
 
-        self.llm = ChatGroq(
-            model=config["llm"]["model"],
-            temperature=0,
-            groq_api_key=os.getenv("GROQ_API_KEY")
-        )
+        # Pre-aggregated rollups for the common campaign/adset/date breakdowns
+        self.cube = MetricCube(self.df)
+        self._anomalies = None
+        self._anomaly_lock = threading.Lock()
 
-    @safe_execute(default_return="Error: DataAgent failed to execute.", log_context="DataAgent.execute", retries=3)
-    def execute(self, instruction: str) -> str:
-        """
-        Generates and executes pandas code based on the instruction.
-        """
-        logger.info(f"Executing data instruction: {instruction}")
+        # Generated code runs in isolated worker processes unless the sandbox is disabled
+        sandbox_settings = config.get("execution", {}).get("sandbox", {})
+        self.sandbox = None
+        if sandbox_settings.get("enabled", False):
+            self.sandbox = SandboxPool(
+                # Workers memory-map a hard link to the ingest snapshot rather than a second copy of the data
+                share_frame(self.df, self.data_fingerprint, snapshot_path=snapshot_file(csv_path, self.data_fingerprint)),
+                workers=sandbox_settings.get("workers", 2),
+                timeout_seconds=sandbox_settings.get("timeout_seconds", 30),
+                max_memory_mb=sandbox_settings.get("max_memory_mb", 2048)
+            )
+
+        self.llm = create_llm(temperature=0)
+
+    def _load_prompt_template(self) -> str:
         with open("prompts/data_agent_prompt.md", "r") as f:
-            prompt_template = f.read()
+            return f.read()
+
+    def _build_messages(self, instruction: str) -> list:
+        prompt_template = self._load_prompt_template()
             
         system_prompt = prompt_template.format(
             columns=list(self.df.columns),
+            cube_dimensions=self.cube.dimensions,
             date_min=self.df['date'].min(),
             date_max=self.df['date'].max()
         )
+        return [
+            SystemMessage(content=system_prompt),
+            HumanMessage(content=instruction)
+        ]
 
-        # We ask the LLM to generate the code
-        response = self.llm.invoke([
+    def _build_operation_messages(self, instruction: str) -> list:
+        with open("prompts/data_operation_prompt.md", "r") as f:
+            prompt_template = f.read()
+
+        system_prompt = prompt_template.format(
+            columns=list(self.df.columns),
+            dimensions=self.cube.dimensions,
+            metrics=self.cube.measures + ["roas", "ctr", "cpm", "cpc"],
+            date_min=self.cube.date_min,
+            date_max=self.cube.date_max
+        )
+        return [
             SystemMessage(content=system_prompt),
             HumanMessage(content=instruction)
-        ])
-        
-        match = re.search(r"```python(.*?)```", response.content, re.DOTALL)
+        ]
+
+    def _run_operation(self, instruction: str, call: OperationCall):
+        """
+        Runs a catalog operation and returns its rendered result, or None if the
+        instruction has to go through free-form code generation instead.
+        """
+        if call.operation not in OPERATIONS:
+            return None
+
+        result_key = content_hash({"operation": call.model_dump(), "dataset": self.data_fingerprint})
+        rendered = result_memo.get(result_key) if result_memo is not None else None
+        if rendered is not None:
+            logger.info(f"Reusing memoized result for operation '{call.operation}' (execution skipped).")
+            tracing.current_span().set(operation=call.operation, result_memo="hit")
+            return rendered
+
+        try:
+            with tracing.span(f"operation {call.operation}", kind="exec", operation=call.operation):
+                result = run_operation(call, self.cube, self.df)
+        except (ValueError, KeyError) as e:
+            logger.info(f"Operation '{call.operation}' cannot serve this instruction ({e}); falling back to code generation.")
+            return None
+        tracing.current_span().set(operation=call.operation)
+
+        rendered = render_result(result)
+        logger.decision("DataAgent", instruction, rendered, f"Executed catalog operation '{call.operation}'")
+        if result_memo is not None:
+            result_memo.set(result_key, rendered)
+        return rendered
+
+    def anomaly_report(self) -> str:
+        """
+        Ranked anomaly table (rolling z-scores, change points and contribution to
+        change per segment) rendered for InsightAgent. Computed once per dataset
+        version; "" if disabled or the data is too short.
+        """
+        settings = config.get("anomalies", {})
+        if not settings.get("enabled", True):
+            return ""
+        with self._anomaly_lock:
+            if self._anomalies is None:
+                key = content_hash({"anomalies": settings, "dataset": self.data_fingerprint})
+                rendered = result_memo.get(key) if result_memo is not None else None
+                if rendered is None:
+                    with tracing.span("precompute anomalies", kind="exec"):
+                        rendered = render_anomalies(precompute_anomalies(self.cube))
+                    if result_memo is not None:
+                        result_memo.set(key, rendered)
+                self._anomalies = rendered
+        return self._anomalies
+
+    def _operation_key(self, instruction: str) -> str:
+        with open("prompts/data_operation_prompt.md", "r") as f:
+            prompt = f.read()
+        return content_hash({
+            "operation_for": normalize_instruction(instruction),
+            "dataset": self.data_lineage,
+            "model": config["llm"]["model"],
+            "prompt": content_hash(prompt)
+        })
+
+    def _recall_operation(self, instruction: str):
+        stored = code_memo.get(self._operation_key(instruction)) if code_memo is not None else None
+        if stored is None:
+            return None
+        logger.info("Reusing memoized operation for this instruction (LLM call skipped).")
+        return OperationCall.model_validate_json(stored)
+
+    def _remember_operation(self, instruction: str, call: OperationCall):
+        # Relative windows (last_n_days) carry over to appended data; absolute dates may not
+        if code_memo is not None and call.start is None and call.end is None:
+            code_memo.set(self._operation_key(instruction), call.model_dump_json())
+
+    def _select_operation(self, instruction: str):
+        if not config.get("execution", {}).get("operation_catalog", True):
+            return None
+        call = self._recall_operation(instruction)
+        if call is not None:
+            return call
+        try:
+            call = invoke_llm(self.llm, self._build_operation_messages(instruction), schema=OperationCall)
+            self._remember_operation(instruction, call)
+            return call
+        except BudgetExceededError:
+            raise
+        except Exception as e:
+            # The catalog is a fast path only; code generation still answers the instruction
+            logger.warning(f"Operation selection failed, falling back to code generation: {e}")
+            return None
+
+    async def _aselect_operation(self, instruction: str):
+        if not config.get("execution", {}).get("operation_catalog", True):
+            return None
+        call = self._recall_operation(instruction)
+        if call is not None:
+            return call
+        try:
+            call = await ainvoke_llm(self.llm, self._build_operation_messages(instruction), schema=OperationCall)
+            self._remember_operation(instruction, call)
+            return call
+        except BudgetExceededError:
+            raise
+        except Exception as e:
+            logger.warning(f"Operation selection failed, falling back to code generation: {e}")
+            return None
+
+    def _extract_code(self, content: str) -> str:
+        match = re.search(r"```python(.*?)```", content, re.DOTALL)
         if match:
             code = match.group(1).strip()
         else:
-            code = response.content.strip().replace("```python", "").replace("```", "").strip()
+            code = content.strip().replace("```python", "").replace("```", "").strip()
         
         logger.debug(f"Generated code:\n{code}")
+        return code
 
-        # Safe execution environment
-        local_vars = {"df": self.df, "pd": pd}
+    def _run_code(self, instruction: str, code: str) -> str:
+        with tracing.span("exec generated code", kind="exec", sandbox=self.sandbox is not None, code_chars=len(code)):
+            return self._exec_code(instruction, code)
+
+    def _exec_code(self, instruction: str, code: str) -> str:
+        if self.sandbox is not None:
+            try:
+                rendered = self.sandbox.run(code)
+            except DataProcessingError as e:
+                logger.error(f"Error executing generated code: {e}")
+                raise DataProcessingError(f"Code execution failed: {e}")
+            logger.decision("DataAgent", instruction, rendered, "Executed generated pandas code in sandbox")
+            return rendered
+
+        # Safe execution environment. A shallow copy keeps column assignments made
+        # by generated code from leaking into the shared frame when steps run concurrently.
+        local_vars = {"df": self.df.copy(deep=False), "pd": pd, "cube": self.cube}
         try:
             exec(code, {}, local_vars)
             result = local_vars.get("result")
             
             # Log decision
-            logger.decision("DataAgent", instruction, str(result)[:100], "Executed generated pandas code")
+            logger.decision("DataAgent", instruction, result, "Executed generated pandas code")
             
-            if isinstance(result, pd.DataFrame):
-                return result.to_markdown()
-            elif isinstance(result, pd.Series):
-                return result.to_markdown()
-            else:
-                return str(result)
+            return render_result(result)
         except Exception as e:
             logger.error(f"Error executing generated code: {e}")
             raise DataProcessingError(f"Code execution failed: {e}")
+
+    def rollup(self, dimensions=None, metrics=None, by_date=True, start=None, end=None, filters=None) -> pd.DataFrame:
+        """
+        Fast breakdown of spend/impressions/clicks/purchases/revenue and derived
+        ROAS/CTR/CPM/CPC from the pre-aggregated cube, without scanning the raw frame.
+        See MetricCube.query for the arguments.
+        """
+        return self.cube.query(dimensions, metrics=metrics, by_date=by_date, start=start, end=end, filters=filters)
+
+    def _code_key(self, instruction: str) -> str:
+        # Generated code depends on the instruction, the data it was written against and the prompt.
+        # Appending rows keeps the lineage, so code stays valid for the grown dataset.
+        return content_hash({
+            "instruction": normalize_instruction(instruction),
+            "dataset": self.data_lineage,
+            "model": config["llm"]["model"],
+            "prompt": content_hash(self._load_prompt_template())
+        })
+
+    def _recall_code(self, code_key: str):
+        stored = code_memo.get(code_key) if code_memo is not None else None
+        code = None
+        if stored is not None:
+            entry = json.loads(stored)
+            # Snippets with literal dates only serve the exact dataset version they were written for
+            if entry.get("dataset") in (None, self.data_fingerprint):
+                code = entry["code"]
+        if code is not None:
+            logger.info("Reusing memoized code for this instruction (LLM call skipped).")
+        tracing.current_span().set(code_memo="off" if code_memo is None else ("hit" if code is not None else "miss"))
+        return code
+
+    def _run_memoized(self, instruction: str, code: str, code_key: str, from_memo: bool) -> str:
+        """
+        Runs generated code unless the same code already ran against this dataset version.
+        Code is only memoized once it has executed successfully.
+        """
+        result_key = content_hash({"code": content_hash(code), "dataset": self.data_fingerprint})
+        rendered = result_memo.get(result_key) if result_memo is not None else None
+        if rendered is not None:
+            logger.info("Reusing memoized result for this code and dataset (execution skipped).")
+            tracing.current_span().set(result_memo="hit")
+            return rendered
+
+        try:
+            rendered = self._run_code(instruction, code)
+        except DataProcessingError:
+            if from_memo and code_memo is not None:
+                # Never serve the same broken snippet again; the retry will regenerate it
+                code_memo.delete(code_key)
+            raise
+
+        if result_memo is not None:
+            result_memo.set(result_key, rendered)
+        if code_memo is not None and not from_memo:
+            pinned = self.data_fingerprint if DATE_LITERAL.search(code) else None
+            code_memo.set(code_key, json.dumps({"code": code, "dataset": pinned}))
+        return rendered
+
+    @safe_execute(default_return="Error: DataAgent failed to execute.", log_context="DataAgent.execute", retries=3)
+    def execute(self, instruction: str) -> str:
+        """
+        Answers the instruction with a typed catalog operation when one fits, and
+        otherwise generates and executes pandas code.
+        Repeated instructions reuse memoized code and results for the current dataset.
+        """
+        logger.info(f"Executing data instruction: {instruction}")
+
+        code_key = self._code_key(instruction)
+        code = self._recall_code(code_key)
+        from_memo = code is not None
+        if not from_memo:
+            call = self._select_operation(instruction)
+            if call is not None:
+                rendered = self._run_operation(instruction, call)
+                if rendered is not None:
+                    return rendered
+            # We ask the LLM to generate the code
+            response = invoke_llm(self.llm, self._build_messages(instruction))
+            code = self._extract_code(response.content)
+        return self._run_memoized(instruction, code, code_key, from_memo)
+
+    @safe_execute(default_return="Error: DataAgent failed to execute.", log_context="DataAgent.aexecute", retries=3)
+    async def aexecute(self, instruction: str) -> str:
+        """
+        Async variant of execute(). The LLM call is awaited and the generated
+        code runs in a worker thread so other plan steps keep making progress.
+        """
+        logger.info(f"Executing data instruction: {instruction}")
+
+        code_key = self._code_key(instruction)
+        code = self._recall_code(code_key)
+        from_memo = code is not None
+        if not from_memo:
+            call = await self._aselect_operation(instruction)
+            if call is not None:
+                rendered = await asyncio.to_thread(self._run_operation, instruction, call)
+                if rendered is not None:
+                    return rendered
+            response = await ainvoke_llm(self.llm, self._build_messages(instruction))
+            code = self._extract_code(response.content)
+        return await asyncio.to_thread(self._run_memoized, instruction, code, code_key, from_memo)
@@ -1,23 +1,20 @@
-from langchain_groq import ChatGroq
 from langchain_core.messages import SystemMessage, HumanMessage
-import yaml
-import os
 import json
+import re
+from src.utils.config import load_config
 from src.utils.logger import logger
-from src.utils.error_handler import safe_execute
+from src.utils.error_handler import safe_execute, BudgetExceededError
+from src.utils.evidence import EvidenceVerifier, METRICS, describe
+from src.utils.llm import create_llm, invoke_llm
+from src.utils import tracing
 
 # Load config
-with open("config/config.yaml", "r") as f:
-    config = yaml.safe_load(f)
+config = load_config()
 
 class EvaluatorAgent:
     def __init__(self):
         logger.info("Initializing EvaluatorAgent")
-        self.llm = ChatGroq(
-            model=config["llm"]["model"],
-            temperature=0,
-            groq_api_key=os.getenv("GROQ_API_KEY")
-        )
+        self.llm = create_llm(temperature=0)
 
     def validate_statistical_rigor(self, insights_json: str) -> list:
         """
@@ -51,44 +48,113 @@ class EvaluatorAgent:
             
         return errors
 
+    def verify_evidence(self, insights_json: str, cube) -> list:
+        """
+        Checks every Evidence delta against the data (see src/utils/evidence.py).
+        Returns one result per evidence item, or [] without a cube.
+        """
+        if cube is None or not config.get("evaluation", {}).get("verify_evidence", True):
+            return []
+        try:
+            return EvidenceVerifier(cube).verify(json.loads(insights_json))
+        except Exception as e:
+            logger.warning(f"Evidence verification skipped: {e}")
+            return []
+
+    def _settled_qualitatively(self, query: str, final_report: str, checks: list) -> bool:
+        """
+        True when the code-based checks already answer the qualitative checklist:
+        every claim is verified, each metric named in the query is evidenced and
+        the report has creative recommendations.
+        """
+        if not checks or any(c["status"] != "verified" for c in checks):
+            return False
+        asked = {m for m in METRICS if re.search(rf"\b{m}\b", query.lower())}
+        evidenced = {str(c["metric"]).lower() for c in checks}
+        if "## Creative Recommendations" not in final_report:
+            return False
+        creatives = final_report.split("## Creative Recommendations", 1)[1].strip()
+        return bool(asked) and asked <= evidenced and bool(creatives)
+
     @safe_execute(default_return="Error: Evaluation failed.", log_context="EvaluatorAgent.evaluate", retries=3)
-    def evaluate(self, query: str, final_report: str, insights_json: str) -> str:
+    def evaluate(self, query: str, final_report: str, insights_json: str, cube=None) -> str:
         """
-        Reviews the final report and performs statistical validation.
+        Reviews the final report: statistical rigor and evidence deltas are checked in
+        code against `cube` (the DataAgent's MetricCube), and the LLM is only asked
+        for the qualitative review when those checks do not decide the verdict.
         """
         logger.info("Evaluating final report...")
-        
+        span = tracing.current_span()
+
         # 1. Statistical Validation (Code-based)
         stat_errors = self.validate_statistical_rigor(insights_json)
         stat_validation_msg = "PASS" if not stat_errors else f"FAIL ({len(stat_errors)} issues found)"
-        
+
         if stat_errors:
             logger.warning(f"Statistical Validation Failed: {stat_errors}")
-        else:
-            logger.info("Statistical Validation Passed.")
+            # The verdict cannot be anything but FAIL, so no LLM round-trip
+            result = f"FAIL: Statistical validation found {len(stat_errors)} issue(s): " + " ".join(stat_errors)
+            span.set(verdict="numeric", llm_review="skipped")
+            logger.decision("EvaluatorAgent", query, result, "Failed on statistical checks (LLM review skipped)")
+            return result
+        logger.info("Statistical Validation Passed.")
 
-        # 2. Qualitative Validation (LLM-based)
+        # 2. Evidence deltas against the data (Code-based)
+        checks = self.verify_evidence(insights_json, cube)
+        counts = {status: sum(c["status"] == status for c in checks) for status in ("verified", "contradicted", "unverifiable")}
+        span.set(evidence=counts)
+        # Claims whose direction the data opposes fail outright; a magnitude that only misses the
+        # checked windows may be about another period and is left to the LLM review
+        contradicted = [describe(c) for c in checks if c["status"] == "contradicted" and c.get("opposed")]
+        if contradicted:
+            logger.warning(f"Evidence contradicted by the data: {contradicted}")
+            result = f"FAIL: {len(contradicted)} evidence delta(s) contradicted by the data. " + " ".join(contradicted)
+            span.set(verdict="numeric", llm_review="skipped")
+            logger.decision("EvaluatorAgent", query, result, "Failed on evidence verification (LLM review skipped)")
+            return result
+
+        mode = config.get("evaluation", {}).get("llm_review", "unsettled")
+        if mode != "always" and self._settled_qualitatively(query, final_report, checks):
+            result = f"PASS ({counts['verified']} evidence deltas verified against the data; LLM review skipped)"
+            span.set(verdict="numeric", llm_review="skipped")
+            logger.decision("EvaluatorAgent", query, result, "Passed on statistical and evidence checks (LLM review skipped)")
+            return result
+
+        # 3. Qualitative Validation (LLM-based)
+        evidence_msg = "\n".join(describe(c) for c in checks) or "Not checked (no data available)."
         system_prompt = """You are the Evaluator Agent.
 Your job is to quality-check the final report generated by the system.
 
+The numbers have already been checked in code: statistical validation passed and
+no evidence delta goes against the direction of the data. Claims marked unverifiable
+could not be mapped onto the data. Claims contradicted for the checked windows may
+refer to another period: judge whether the report states or implies that period.
+
 Checklist:
 1. Does the report directly answer the user's query?
-2. Are the insights supported by data (numbers/metrics)?
+2. Are the insights supported by data (numbers/metrics), given the evidence check?
 3. Are the creative recommendations relevant?
 
 Input:
 - User Query
 - Final Report
 - Statistical Validation Result (from code)
+- Evidence Check (from code)
 
 Output:
-If the report is good AND Statistical Validation Passed: output "PASS".
+If the report is good: output "PASS".
 If there are issues, output "FAIL: <reason>" and suggestions for improvement.
 """
-        response = self.llm.invoke([
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=f"User Query: {query}\n\nStatistical Validation: {stat_validation_msg}\nErrors: {stat_errors}\n\nFinal Report:\n{final_report}")
-        ])
+        span.set(verdict="llm", llm_review="called")
+        try:
+            response = invoke_llm(self.llm, [
+                SystemMessage(content=system_prompt),
+                HumanMessage(content=f"User Query: {query}\n\nStatistical Validation: {stat_validation_msg}\n\nEvidence Check:\n{evidence_msg}\n\nFinal Report:\n{final_report}")
+            ])
+        except BudgetExceededError as e:
+            # Degrade to the code-based checks rather than overrun the token budget
+            logger.warning(f"Skipping LLM review: {e}")
+            return f"{stat_validation_msg} (statistical checks only; LLM review skipped: token budget exhausted)"
         
         result = response.content
         logger.decision("EvaluatorAgent", query, result, "Evaluated report quality")
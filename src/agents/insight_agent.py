@@ -1,36 +1,30 @@
-from langchain_groq import ChatGroq
 from langchain_core.messages import SystemMessage, HumanMessage
-import yaml
-import os
 import json
 from typing import List
+from src.utils.config import load_config
 from src.utils.logger import logger
 from src.utils.error_handler import safe_execute, AgentExecutionError
+from src.utils.llm import create_llm, invoke_llm, ainvoke_llm
 from src.schema import InsightOutput
 
 # Load config
-with open("config/config.yaml", "r") as f:
-    config = yaml.safe_load(f)
+config = load_config()
 
 class InsightAgent:
     def __init__(self):
         logger.info("Initializing InsightAgent")
-        self.llm = ChatGroq(
-            model=config["llm"]["model"],
-            temperature=config["llm"]["temperature"],
-            groq_api_key=os.getenv("GROQ_API_KEY")
-        )
+        self.llm = create_llm(temperature=config["llm"]["temperature"])
 
-    @safe_execute(default_return="[]", log_context="InsightAgent.analyze", retries=3)
-    def analyze(self, data_summary: str, context: str) -> str:
+    def system_prompt(self) -> str:
         """
-        Analyzes the data summary to generate structured insights.
-        Returns a JSON string list of InsightOutput objects.
+        The system prompt, without the per-call inputs; part of the step memo key.
         """
-        logger.info(f"Analyzing data for context: {context}")
-        
+        return self._build_messages("", "")[0].content
+
+    def _build_messages(self, data_summary: str, context: str) -> list:
         system_prompt = """You are an Insight Agent. Your goal is to interpret data summaries and find the "Why".
 You will be given a context (what we are looking for) and a data summary (markdown table or text).
+The data summary may start with a "Precomputed Anomalies" table ranking segments by how unusual their recent metrics are; use it to locate where and when things changed.
 
 Your output MUST be a valid JSON list of objects matching this schema:
 {
@@ -53,20 +47,45 @@ CRITICAL:
 3. Return ONLY the JSON list. No markdown formatting like ```json.
 """
         
-        structured_llm = self.llm.with_structured_output(List[InsightOutput])
+        return [
+            SystemMessage(content=system_prompt),
+            HumanMessage(content=f"Context: {context}\n\nData Summary:\n{data_summary}")
+        ]
+
+    def _to_json(self, response: List[InsightOutput], context: str) -> str:
+        # Log decision
+        logger.decision("InsightAgent", context, response, "Generated structured insights")
+        
+        # Convert back to JSON string for the pipeline
+        return json.dumps([insight.model_dump() for insight in response])
+
+    @safe_execute(default_return="[]", log_context="InsightAgent.analyze", retries=3)
+    def analyze(self, data_summary: str, context: str) -> str:
+        """
+        Analyzes the data summary to generate structured insights.
+        Returns a JSON string list of InsightOutput objects.
+        """
+        logger.info(f"Analyzing data for context: {context}")
         
         try:
-            response = structured_llm.invoke([
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=f"Context: {context}\n\nData Summary:\n{data_summary}")
-            ])
+            response = invoke_llm(self.llm, self._build_messages(data_summary, context), schema=List[InsightOutput])
+            return self._to_json(response, context)
             
-            # Log decision
-            logger.decision("InsightAgent", context, str(response)[:100], "Generated structured insights")
-            
-            # Convert back to JSON string for the pipeline
-            return json.dumps([insight.model_dump() for insight in response])
+        except Exception as e:
+            logger.error(f"Failed to generate structured insights: {e}")
+            raise AgentExecutionError("LLM failed to produce valid JSON insights.") from e
+
+    @safe_execute(default_return="[]", log_context="InsightAgent.aanalyze", retries=3)
+    async def aanalyze(self, data_summary: str, context: str) -> str:
+        """
+        Async variant of analyze(), used by the concurrent plan executor.
+        """
+        logger.info(f"Analyzing data for context: {context}")
+        
+        try:
+            response = await ainvoke_llm(self.llm, self._build_messages(data_summary, context), schema=List[InsightOutput])
+            return self._to_json(response, context)
             
         except Exception as e:
             logger.error(f"Failed to generate structured insights: {e}")
-            raise AgentExecutionError("LLM failed to produce valid JSON insights.")
+            raise AgentExecutionError("LLM failed to produce valid JSON insights.") from e
@@ -1,15 +1,14 @@
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_groq import ChatGroq
-from pydantic import BaseModel, Field
-from typing import List
-import yaml
-import os
+from pydantic import BaseModel, Field, PrivateAttr, ValidationError
+from typing import List, Optional
+from src.utils import plan_library as library, tracing
+from src.utils.config import load_config
 from src.utils.logger import logger
 from src.utils.error_handler import safe_execute, AgentError
+from src.utils.llm import create_llm, invoke_llm
 
 # Load config
-with open("config/config.yaml", "r") as f:
-    config = yaml.safe_load(f)
+config = load_config()
 
 class PlanStep(BaseModel):
     step_name: str = Field(description="Name of the step")
@@ -18,24 +17,56 @@ class PlanStep(BaseModel):
 
 class Plan(BaseModel):
     steps: List[PlanStep]
+    # Plan library entry this plan was reused from; None for plans from the LLM
+    _library_entry: Optional[str] = PrivateAttr(default=None)
 
 class PlannerAgent:
     def __init__(self):
         logger.info("Initializing PlannerAgent")
-        self.llm = ChatGroq(
-            model=config["llm"]["model"],
-            temperature=config["llm"]["temperature"],
-            groq_api_key=os.getenv("GROQ_API_KEY")
-        )
+        self.llm = create_llm(temperature=config["llm"]["temperature"])
+        # Campaign names from the dataset, set by create_agents for plan library slot-filling
+        self.entities: List[str] = []
+
+    def _reuse_plan(self, user_query: str) -> Optional[Plan]:
+        if library.plan_library is None:
+            return None
+        match = library.plan_library.match(user_query, self.entities)
+        if match is None:
+            tracing.current_span().set(plan_source="llm")
+            return None
+        plan_dict, entry_id, score = match
+        try:
+            plan = Plan.model_validate(plan_dict)
+        except ValidationError as e:
+            logger.warning(f"Plan template {entry_id} no longer validates, planning with the LLM: {e}")
+            return None
+        plan._library_entry = entry_id
+        tracing.current_span().set(plan_source="library", plan_similarity=score)
+        logger.info(f"📚 Reusing plan template {entry_id} (similarity {score:.2f}); planner LLM skipped.")
+        return plan
+
+    def record_outcome(self, user_query: str, plan: Plan, passed: bool):
+        """
+        Teaches the plan library: plans of passing runs are learned, and reused plans
+        are credited or debited with the evaluation of the run.
+        """
+        if library.plan_library is None:
+            return
+        if plan._library_entry is not None:
+            library.plan_library.record(plan._library_entry, user_query, passed)
+        elif passed:
+            library.plan_library.learn(user_query, plan.model_dump(), self.entities)
 
     @safe_execute(log_context="PlannerAgent.create_plan", raise_on_error=True, retries=3)
     def create_plan(self, user_query: str) -> Plan:
+        plan = self._reuse_plan(user_query)
+        if plan is not None:
+            return plan
         logger.info(f"Creating plan for query: {user_query}")
         with open("prompts/planner_prompt.md", "r") as f:
             system_prompt = f.read()
         
-        structured_llm = self.llm.with_structured_output(Plan)
-        return structured_llm.invoke([
+        return invoke_llm(self.llm, [
             SystemMessage(content=system_prompt),
             HumanMessage(content=user_query)
-        ])
+        ], schema=Plan)
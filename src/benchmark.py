@@ -0,0 +1,222 @@
+"""
+Offline end-to-end benchmark of the pipeline, driven by the fake LLM.
+
+    python -m src.benchmark --rows 100 10000 1000000 --latency 0.05
+    python -m src.benchmark --rows 100 10000 --baseline reports/benchmark_baseline.json
+
+For each dataset size it runs one full query (agent start-up incl. data load,
+planning, plan execution, evaluation and report writing) and reports wall time,
+CPU time, peak RSS and prompt sizes per stage. With --baseline, the run fails if
+a stage got slower than the baseline by more than --tolerance.
+
+CPU time and RSS cover the orchestrator process only; sandbox workers run
+generated code in separate processes.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import sys
+import time
+from typing import Any, Dict, List, Optional
+from src.utils.config import load_config
+from src.utils.logger import logger
+
+config = load_config()
+
+STAGES = ["init", "plan", "execute", "evaluate", "write"]
+# Absolute slack so that millisecond-scale stages do not trip the regression gate
+MIN_REGRESSION_SECONDS = 0.05
+
+def build_dataset(rows: int, directory: str = ".cache/benchmark") -> str:
+    """
+    Returns a synthetic dataset of `rows` rows, generating it on first use. The
+    generator is seeded from config, so every run benchmarks the same data.
+    """
+    from src.utils.synthetic_data import SyntheticAdsGenerator
+
+    path = os.path.join(directory, f"bench_{rows}.csv")
+    if not os.path.exists(path):
+        SyntheticAdsGenerator(rows=rows).write_csv(path)
+    return path
+
+class Checkpoints:
+    """
+    Snapshots of wall clock, process CPU time, peak RSS and prompt totals. A stage
+    is the difference between two consecutive checkpoints.
+    """
+    def __init__(self):
+        self.points: Dict[str, Dict[str, float]] = {}
+
+    def mark(self, label: str):
+        from src.utils.llm import prompt_stats
+        usage = prompt_stats.stats()
+        self.points[label] = {
+            "wall": time.perf_counter(),
+            "cpu": time.process_time(),
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "prompt_tokens": usage["prompt_tokens"],
+            "llm_calls": usage["calls"],
+            "max_prompt_tokens": usage["max_prompt_tokens"],
+        }
+
+    def stage(self, start: str, end: str) -> Dict[str, float]:
+        a, b = self.points[start], self.points[end]
+        return {
+            "wall_seconds": round(b["wall"] - a["wall"], 4),
+            "cpu_seconds": round(b["cpu"] - a["cpu"], 4),
+            "peak_rss_mb": round(b["peak_rss_mb"], 1),
+            "llm_calls": int(b["llm_calls"] - a["llm_calls"]),
+            "prompt_tokens": int(b["prompt_tokens"] - a["prompt_tokens"]),
+        }
+
+def configure_offline(latency: float, sandbox: bool, use_cache: bool, rate_limit: bool):
+    """
+    Points every agent at the fake LLM and takes persistent caches out of the
+    measurement unless `use_cache` is set.
+    """
+    config["llm"]["provider"] = "fake"
+    config["llm"]["fake_latency_seconds"] = latency
+    config.setdefault("execution", {}).setdefault("sandbox", {})["enabled"] = sandbox
+    config.setdefault("cache", {}).setdefault("snapshot", {})["enabled"] = use_cache
+
+    from src.utils import llm, plan_library, step_memo
+    from src.agents import data_agent
+    if not use_cache:
+        llm.llm_cache = None
+        data_agent.code_memo = None
+        data_agent.result_memo = None
+        step_memo.step_memo = None
+        plan_library.plan_library = None
+    if not rate_limit:
+        from src.utils.rate_limiter import TokenBucketRateLimiter
+        llm.rate_limiter = TokenBucketRateLimiter(requests_per_minute=1e9, tokens_per_minute=1e12)
+
+async def benchmark_size(rows: int, query: str, output_dir: str) -> Dict[str, Any]:
+    from src.run import create_agents, run_query
+
+    csv_path = build_dataset(rows)
+    config["use_sample_data"] = False
+    config["data"]["csv_path"] = csv_path
+
+    checkpoints = Checkpoints()
+    steps: Dict[int, Dict[str, Any]] = {}
+
+    def progress(event: Dict[str, Any]):
+        name = event["event"]
+        if name == "planned":
+            checkpoints.mark("planned")
+        elif name == "step_started":
+            steps[event["step"]] = {"name": event["name"], "agent": event["agent"], "started": time.perf_counter()}
+        elif name == "step_completed":
+            step = steps.setdefault(event["step"], {"name": event["name"], "started": time.perf_counter()})
+            step["wall_seconds"] = round(time.perf_counter() - step.pop("started"), 4)
+            step["ok"] = event.get("ok", False)
+            checkpoints.mark("executed")
+        elif name == "evaluated":
+            checkpoints.mark("evaluated")
+
+    checkpoints.mark("start")
+    agents = create_agents()
+    checkpoints.mark("initialized")
+    try:
+        summary = await run_query(query, agents, os.path.join(output_dir, f"rows_{rows}"), progress)
+        checkpoints.mark("end")
+    finally:
+        if agents.data_agent.sandbox is not None:
+            agents.data_agent.sandbox.close()
+
+    boundaries = ["start", "initialized", "planned", "executed", "evaluated", "end"]
+    stages = {}
+    for stage, (start, end) in zip(STAGES, zip(boundaries, boundaries[1:])):
+        if start in checkpoints.points and end in checkpoints.points:
+            stages[stage] = checkpoints.stage(start, end)
+    return {
+        "rows": rows,
+        "status": summary.get("status"),
+        "total_wall_seconds": round(checkpoints.points["end"]["wall"] - checkpoints.points["start"]["wall"], 4),
+        "max_prompt_tokens": int(checkpoints.points["end"]["max_prompt_tokens"]),
+        "stages": stages,
+        "steps": [steps[i] for i in sorted(steps)],
+    }
+
+def compare_to_baseline(results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    Returns one message per stage whose wall time regressed beyond `tolerance`.
+    """
+    regressions = []
+    previous = {entry["rows"]: entry for entry in baseline.get("sizes", [])}
+    for entry in results:
+        before = previous.get(entry["rows"])
+        if before is None:
+            continue
+        for stage, metrics in entry["stages"].items():
+            old = before["stages"].get(stage, {}).get("wall_seconds")
+            new = metrics["wall_seconds"]
+            if old is not None and new > old * (1 + tolerance) and new - old > MIN_REGRESSION_SECONDS:
+                regressions.append(f"{entry['rows']} rows / {stage}: {old:.3f}s -> {new:.3f}s")
+    return regressions
+
+def format_results(results: List[Dict[str, Any]]) -> str:
+    lines = [f"{'rows':>10} {'stage':>9} {'wall s':>9} {'cpu s':>9} {'peak MB':>9} {'calls':>6} {'prompt tok':>11}"]
+    for entry in results:
+        for stage, m in entry["stages"].items():
+            lines.append(f"{entry['rows']:>10} {stage:>9} {m['wall_seconds']:>9.3f} {m['cpu_seconds']:>9.3f} {m['peak_rss_mb']:>9.1f} {m['llm_calls']:>6} {m['prompt_tokens']:>11}")
+        lines.append(f"{entry['rows']:>10} {'total':>9} {entry['total_wall_seconds']:>9.3f}   (largest prompt ~{entry['max_prompt_tokens']} tokens, status {entry['status']})")
+    return "\n".join(lines)
+
+async def run_benchmark(sizes: List[int], query: str, latency: float = 0.0, sandbox: bool = True,
+                        use_cache: bool = False, rate_limit: bool = False, output_dir: str = ".cache/benchmark") -> Dict[str, Any]:
+    configure_offline(latency, sandbox, use_cache, rate_limit)
+    results = []
+    for rows in sizes:
+        results.append(await benchmark_size(rows, query, output_dir))
+    return {
+        "query": query,
+        "latency_seconds": latency,
+        "sandbox": sandbox,
+        "cache": use_cache,
+        "sizes": results,
+    }
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmark with a fake LLM")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 10_000, 100_000], help="Dataset sizes to benchmark")
+    parser.add_argument("--query", type=str, default="Analyze why ROAS dropped last week and suggest creative fixes")
+    parser.add_argument("--latency", type=float, default=0.0, help="Injected seconds per fake LLM call")
+    parser.add_argument("--no-sandbox", action="store_true", help="Run generated code in-process")
+    parser.add_argument("--cache", action="store_true", help="Keep the LLM/code/result/snapshot caches enabled")
+    parser.add_argument("--rate-limit", action="store_true", help="Keep the configured API rate limits")
+    parser.add_argument("--output", type=str, default="reports/benchmark.json", help="Where to write the results")
+    parser.add_argument("--baseline", type=str, help="Results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown per stage vs. the baseline")
+    parser.add_argument("--verbose", action="store_true", help="Show pipeline logs")
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        for handler in logger.handlers:
+            if isinstance(handler, logging.StreamHandler) and not isinstance(handler, logging.FileHandler):
+                handler.setLevel(logging.WARNING)
+
+    report = asyncio.run(run_benchmark(
+        args.rows, args.query, latency=args.latency, sandbox=not args.no_sandbox,
+        use_cache=args.cache, rate_limit=args.rate_limit
+    ))
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(format_results(report["sizes"]))
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare_to_baseline(report["sizes"], json.load(f), args.tolerance)
+        if regressions:
+            print("Performance regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print(f"No stage regressed more than {args.tolerance:.0%} against {args.baseline}.")
+
+if __name__ == "__main__":
+    main()
@@ -1,58 +1,250 @@
 import argparse
 import asyncio
+import contextlib
 import os
 import json
+import re
 import time
+from types import SimpleNamespace
 from dotenv import load_dotenv
-from src.agents.planner import PlannerAgent
-from src.agents.data_agent import DataAgent
-from src.agents.insight_agent import InsightAgent
-from src.agents.creative_generator import CreativeGenerator
-from src.agents.evaluator import EvaluatorAgent
-from src.utils.logger import logger, current_run_dir
-from src.utils.error_handler import AgentError
+from src.utils.config import load_config
+import src.utils.logger as log_setup
+from src.utils.logger import logger, start_run
+from src.utils import tracing
+from src.utils.error_handler import AgentError, BudgetExceededError
+from src.utils.scheduler import execute_plan
+
+# Agents, LangChain and pandas are imported inside the functions that need them,
+# so that --help, --validate and argument errors return without loading them.
+
+# Load config
+config = load_config()
 
 # Load environment variables
 load_dotenv(".env")
 
-# Check for API Key
-api_key = os.getenv("GROQ_API_KEY")
-if not api_key:
-    logger.critical("GROQ_API_KEY not found in environment variables. Exiting.")
-    exit(1)
+# Inputs some agents need that do not depend on earlier steps: agent -> [(context key, DataAgent instruction)].
+# They are fetched speculatively as soon as the plan contains that agent.
+SIDE_INPUTS = {
+    "CreativeGenerator": [("top_ads", "Get top 5 ads by ROAS with their creative messages")],
+}
 
-async def main():
-    parser = argparse.ArgumentParser(description="Kasparro Agentic FB Analyst V2")
-    parser.add_argument("query", type=str, help="The analysis query (e.g., 'Analyze ROAS drop')")
-    args = parser.parse_args()
+def build_data_summary(steps, results, upto=None):
+    """
+    Concatenates DataAgent outputs in plan order, optionally only those before step `upto`.
+    """
+    summary = ""
+    for i, step in enumerate(steps[:upto]):
+        if step.agent == "DataAgent" and results.get(i) is not None:
+            summary += f"\n\n### Data Output ({step.step_name}):\n{results[i]}"
+    return summary
 
-    query = args.query
-    logger.info(f"Starting Analysis for: '{query}'")
-    logger.info(f"Run Logs Directory: {current_run_dir}")
+def compact_for(agent, text):
+    """
+    Compacts a data summary to the context budget configured for `agent`.
+    """
+    settings = config.get("context", {})
+    budget = settings.get("budgets", {}).get(agent)
+    if budget is None or not text:
+        return text
+    from src.utils.compaction import compact_text
+    from src.utils.llm import estimate_tokens
+
+    compacted = compact_text(
+        text,
+        budget,
+        max_rows=settings.get("max_table_rows", 20),
+        edge_rows=settings.get("edge_rows", 5),
+        outlier_rows=settings.get("outlier_rows", 5)
+    )
+    before, after = estimate_tokens([text]), estimate_tokens([compacted])
+    if after < before:
+        logger.info(f"Compacted data summary for {agent}: ~{before} -> ~{after} tokens", extra={"metrics": {"compaction": {"agent": agent, "before": before, "after": after}}})
+    return compacted
+
+def latest_output(steps, results, agent, upto=None):
+    """
+    Returns the output of the last successful `agent` step (before `upto`, if given).
+    """
+    for i in reversed(range(len(steps[:upto]))):
+        if steps[i].agent == agent and results.get(i) is not None:
+            return results[i]
+    return None
+
+def build_report(query, data_section, insights_section, creatives_section):
+    return f"""# Kasparro Analysis Report (V2 High Bar)
+
+## Query
+{query}
+
+## Data Analysis
+{data_section}
 
+## Strategic Insights
+{insights_section}
+
+## Creative Recommendations
+{creatives_section}
+"""
+
+def format_insights_readable(insights_json):
+    # Parse for readable context
     try:
-        # Initialize Agents
-        planner = PlannerAgent()
-        data_agent = DataAgent()
-        insight_agent = InsightAgent()
-        creative_gen = CreativeGenerator()
-        evaluator = EvaluatorAgent()
-    except Exception as e:
-        logger.critical(f"Failed to initialize agents: {e}")
-        return
+        insights = json.loads(insights_json)
+        readable_insights = ""
+        for insight in insights:
+            readable_insights += f"- **Hypothesis**: {insight['hypothesis']}\n"
+            readable_insights += f"  - Confidence: {insight['confidence']}\n"
+            readable_insights += f"  - Impact: {insight['impact']}\n"
+        return readable_insights
+    except:
+        return "Failed to parse insights JSON."
+
+def create_agents():
+    """
+    Builds one set of agents. The DataAgent loads and validates the dataset once,
+    so every query in a process shares the same frame, cube and sandbox.
+    """
+    from src.agents.planner import PlannerAgent
+    from src.agents.data_agent import DataAgent
+    from src.agents.insight_agent import InsightAgent
+    from src.agents.creative_generator import CreativeGenerator
+    from src.agents.evaluator import EvaluatorAgent
+
+    planner, data_agent, creative_gen = PlannerAgent(), DataAgent(), CreativeGenerator()
+    if "campaign_name" in data_agent.df.columns:
+        campaigns = [str(name) for name in data_agent.df["campaign_name"].dropna().unique()]
+        planner.entities = campaigns
+        creative_gen.campaigns = campaigns
+    return SimpleNamespace(
+        planner=planner,
+        data_agent=data_agent,
+        insight_agent=InsightAgent(),
+        creative_gen=creative_gen,
+        evaluator=EvaluatorAgent()
+    )
+
+def save_trace(trace, output_dir):
+    """
+    Writes trace.json next to the report and appends the trace to traces.jsonl
+    in the run's log directory, if a run has started.
+    """
+    path = os.path.join(output_dir, "trace.json")
+    try:
+        trace.write(path)
+        if log_setup.current_run_dir is not None:
+            trace.append_to(os.path.join(log_setup.current_run_dir, "traces.jsonl"))
+    except OSError as e:
+        logger.warning(f"Could not write trace: {e}")
+        return None
+    return path
+
+def save_usage(ledger, output_dir):
+    """
+    Writes the query's token usage to usage.json next to the report and refreshes
+    the process totals in the run's log directory.
+    """
+    from src.utils.usage import session_usage
+
+    path = os.path.join(output_dir, "usage.json")
+    try:
+        ledger.write(path)
+        if log_setup.current_run_dir is not None:
+            session_usage.write(os.path.join(log_setup.current_run_dir, "usage.json"))
+    except OSError as e:
+        logger.warning(f"Could not write token usage: {e}")
+        return None
+    return path
+
+async def run_query(query, agents, output_dir="reports", progress=None):
+    """
+    Plans and executes one query with the shared agents and writes report.md and
+    insights.json to `output_dir`. Returns a summary with status and latency.
+    `progress`, if given, is called with a dict for each pipeline event.
+    Token usage is written to usage.json and checked against the configured
+    budgets; unless tracing is disabled, the run is also recorded as a span tree
+    in trace.json.
+    """
+    from src.utils.usage import TokenLedger, session_usage, track_run
+
+    ledger = TokenLedger.from_config(parent=session_usage)
+    trace = tracing.start_trace("run_query", query=query) if config.get("tracing", {}).get("enabled", True) else None
+    summary = {"query": query, "status": "failed", "output_dir": output_dir}
+    try:
+        with track_run(ledger), (trace.root if trace is not None else contextlib.nullcontext()):
+            summary = await _run_query(query, agents, output_dir, progress)
+            if trace is not None:
+                trace.root.set(status=summary["status"])
+                if summary["status"] != "ok":
+                    trace.root.fail("Run did not complete")
+    finally:
+        usage_path = save_usage(ledger, output_dir)
+        trace_path = save_trace(trace, output_dir) if trace is not None else None
+
+    totals = ledger.summary()
+    summary["tokens"] = {"prompt": totals["prompt_tokens"], "completion": totals["completion_tokens"], "retries": totals["retry_tokens"]}
+    if ledger.budget_exceeded:
+        summary["budget_exceeded"] = totals["budget"]["exceeded"]
+        logger.warning(f"⚠️ Token budget exhausted for '{query}': {totals['budget']['exceeded'][0]}")
+    if usage_path:
+        summary["usage_path"] = usage_path
+    if trace_path:
+        summary["trace_path"] = trace_path
+    return summary
+
+async def prefetch(agents, key, instruction):
+    """
+    Fetches a side input with the DataAgent, traced under its own span.
+    """
+    from src.utils.usage import step_scope
+
+    logger.info(f"Fetching {key} for context...")
+    with tracing.span(f"fetch {key}", agent="DataAgent"), step_scope(f"fetch {key}"):
+        return await agents.data_agent.aexecute(instruction)
+
+async def discard_prefetches(prefetches):
+    """
+    Cancels side-input fetches still running once the plan is done (no step used
+    them, e.g. the CreativeGenerator step failed first) and drops their results.
+    """
+    for key, task in prefetches.items():
+        if not task.done():
+            logger.info(f"Discarding unused prefetch of {key}.")
+            task.cancel()
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass
+
+async def _run_query(query, agents, output_dir, progress):
+    emit = progress or (lambda event: None)
+    started = time.perf_counter()
+    summary = {"query": query, "status": "failed", "output_dir": output_dir}
+    logger.info(f"Starting Analysis for: '{query}'")
 
     # Step 1: Plan
+    from src.utils.usage import step_scope
+
     logger.info("Planner: Creating execution plan...")
     try:
-        plan = planner.create_plan(query)
+        with tracing.span("plan", kind="step", agent="PlannerAgent"), step_scope("plan"):
+            plan = await asyncio.to_thread(agents.planner.create_plan, query)
         if not plan:
-            logger.error("Planner failed to create a plan. Exiting.")
-            return
+            logger.error("Planner failed to create a plan.")
+            summary["latency_seconds"] = round(time.perf_counter() - started, 3)
+            return summary
         logger.info(f"Plan created with {len(plan.steps)} steps.")
+        emit({"event": "planned", "steps": [{"step": i + 1, "name": step.step_name, "agent": step.agent} for i, step in enumerate(plan.steps)]})
+    except BudgetExceededError as e:
+        logger.error(f"Planning stopped: {e}")
+        summary["status"] = "budget_exceeded"
+        summary["latency_seconds"] = round(time.perf_counter() - started, 3)
+        return summary
     except Exception as e:
         logger.error(f"Planning failed: {e}")
-        return
-    
+        summary["latency_seconds"] = round(time.perf_counter() - started, 3)
+        return summary
+
     context = {
         "query": query, 
         "data_summary": "", 
@@ -61,63 +253,125 @@ async def main():
         "creative_recommendations": None
     }
     
+    # Side inputs go out alongside the first steps instead of waiting for the step that needs them
+    prefetches = {}
+    if config.get("execution", {}).get("prefetch_side_inputs", True):
+        for key, instruction in {k: v for step in plan.steps for k, v in SIDE_INPUTS.get(step.agent, [])}.items():
+            prefetches[key] = asyncio.create_task(prefetch(agents, key, instruction))
+
+    async def side_input(key):
+        if not context[key]:
+            if key in prefetches:
+                context[key] = await prefetches[key]
+            else:
+                instruction = next(v for inputs in SIDE_INPUTS.values() for k, v in inputs if k == key)
+                context[key] = await prefetch(agents, key, instruction)
+        return context[key]
+
     # Step 2: Execute Plan
-    for i, step in enumerate(plan.steps):
+    # Steps run as a dependency graph: independent DataAgent steps go out together and
+    # each InsightAgent step only waits for the DataAgent outputs that precede it.
+    async def run_step(i, step, results):
+        with tracing.span(f"step {i + 1}: {step.step_name}", kind="step", agent=step.agent, step=i + 1) as step_span, \
+                step_scope(f"{i + 1}. {step.step_name}"):
+            output = await execute_step(i, step, results)
+            if output is None:
+                step_span.fail("Step produced no output")
+            return output
+
+    # Insight and creative outputs are reused while their inputs stay within tolerance
+    # of the run that produced them (e.g. when only a few rows were appended to the CSV)
+    from src.utils.step_memo import step_memo
+    lineage = getattr(agents.data_agent, "data_lineage", None)
+
+    def reuse_key(step, agent):
+        if step_memo is None or lineage is None:
+            return None
+        return step_memo.key(query, step.agent, step.description, lineage, agent.system_prompt())
+
+    def recall_step(step, memo_key, inputs):
+        output = step_memo.recall(memo_key, inputs) if memo_key is not None else None
+        tracing.current_span().set(step_memo="off" if memo_key is None else ("hit" if output is not None else "miss"))
+        if output is not None:
+            logger.info(f"♻️ Reusing previous {step.agent} output: inputs have not moved materially.")
+        return output
+
+    def remember_step(memo_key, inputs, output):
+        # "[]" is what a failed InsightAgent call returns; never pin a failure
+        if memo_key is not None and output and output != "[]":
+            step_memo.remember(memo_key, inputs, output)
+
+    async def execute_step(i, step, results):
         logger.info(f"▶️ Step {i+1}: {step.step_name} ({step.agent}) - {step.description}")
+        emit({"event": "step_started", "step": i + 1, "name": step.step_name, "agent": step.agent})
         
         try:
+            output = None
             step_output = ""
             if step.agent == "DataAgent":
-                result = data_agent.execute(step.description)
-                context["data_summary"] += f"\n\n### Data Output ({step.step_name}):\n{result}"
-                step_output = result
+                output = await agents.data_agent.aexecute(step.description)
+                step_output = output
                 
             elif step.agent == "InsightAgent":
                 # Insight Agent now returns JSON string
-                result_json = insight_agent.analyze(context["data_summary"], step.description)
-                context["insights_json"] = result_json # Store raw JSON for pipeline
-                
-                # Parse for readable context
+                # Ranked anomalies over every segment come first, then the DataAgent outputs
                 try:
-                    insights = json.loads(result_json)
-                    readable_insights = ""
-                    for insight in insights:
-                        readable_insights += f"- **Hypothesis**: {insight['hypothesis']}\n"
-                        readable_insights += f"  - Confidence: {insight['confidence']}\n"
-                        readable_insights += f"  - Impact: {insight['impact']}\n"
-                    context["insights_readable"] = readable_insights
-                except:
-                    context["insights_readable"] = "Failed to parse insights JSON."
-                
-                step_output = context["insights_readable"]
+                    anomalies = await asyncio.to_thread(agents.data_agent.anomaly_report)
+                except Exception as e:
+                    # The table only helps; the step still runs on the DataAgent outputs alone
+                    logger.warning(f"⚠️ Anomaly precomputation failed, continuing without it: {e}")
+                    anomalies = ""
+                data_summary = compact_for("InsightAgent", anomalies + build_data_summary(plan.steps, results, upto=i))
+                memo_key = reuse_key(step, agents.insight_agent)
+                output = recall_step(step, memo_key, data_summary)
+                if output is None:
+                    output = await agents.insight_agent.aanalyze(data_summary, step.description)
+                    remember_step(memo_key, data_summary, output)
+                step_output = format_insights_readable(output)
                 
             elif step.agent == "CreativeGenerator":
-                # For creative gen, we need top ads. Let's ask DataAgent to get them if not present.
-                if not context["top_ads"]:
-                    logger.info("Fetching top ads for context...")
-                    top_ads = data_agent.execute("Get top 5 ads by ROAS with their creative messages")
-                    context["top_ads"] = top_ads
-                
+                # For creative gen, we need top ads (usually prefetched while earlier steps ran)
+                await side_input("top_ads")
+
                 # Pass JSON insights directly
-                result = creative_gen.generate(context["insights_json"], context["top_ads"])
-                if result:
-                    context["creative_recommendations"] = result
-                    step_output = str(result.model_dump())
+                insights = latest_output(plan.steps, results, "InsightAgent", upto=i) or "[]"
+                inputs = f"{insights}\n{context['top_ads']}"
+                memo_key = reuse_key(step, agents.creative_gen)
+                reused = recall_step(step, memo_key, inputs)
+                if reused is not None:
+                    from src.schema import CreativeOutput
+                    output = CreativeOutput.model_validate_json(reused)
+                else:
+                    output = await agents.creative_gen.agenerate(insights, context["top_ads"])
+                    if output:
+                        remember_step(memo_key, inputs, output.model_dump_json())
+                if output:
+                    step_output = str(output.model_dump())
                 else:
                     logger.warning("Creative Generator returned no results.")
             
             logger.info(f"Step {i+1} completed.")
             logger.debug(f"Step Output: {step_output[:200]}...")
-            
-            logger.info("Waiting 2s to respect API rate limits...")
-            time.sleep(2)
+            emit({"event": "step_completed", "step": i + 1, "name": step.step_name, "ok": output is not None})
+            return output
 
         except AgentError as e:
             logger.error(f"Step {i+1} failed with AgentError: {e}")
+            emit({"event": "step_completed", "step": i + 1, "name": step.step_name, "ok": False, "error": str(e)})
             # Decide whether to continue or stop based on severity. For V2, we log and continue if possible, or exit.
             # For now, let's continue but mark as failed.
-        except Exception as e:
-            logger.error(f"Step {i+1} failed with unexpected error: {e}")
+            return None
+
+    max_concurrency = config.get("execution", {}).get("max_concurrency", 4)
+    try:
+        results = await execute_plan(plan.steps, run_step, max_concurrency=max_concurrency)
+    finally:
+        await discard_prefetches(prefetches)
+
+    context["data_summary"] = build_data_summary(plan.steps, results)
+    context["insights_json"] = latest_output(plan.steps, results, "InsightAgent") or "[]"
+    context["insights_readable"] = format_insights_readable(context["insights_json"])
+    context["creative_recommendations"] = latest_output(plan.steps, results, "CreativeGenerator")
 
     # Step 3: Compile Report
     logger.info("Compiling Final Report...")
@@ -147,39 +401,190 @@ async def main():
             creatives_section += f"- **New Message**: {rec.suggested_message}\n"
             creatives_section += f"- **Reasoning**: {rec.reasoning}\n\n"
 
-    report = f"""# Kasparro Analysis Report (V2 High Bar)
-
-## Query
-{query}
-
-## Data Analysis
-{context['data_summary']}
-
-## Strategic Insights
-{insights_section}
-
-## Creative Recommendations
-{creatives_section}
-"""
+    report = build_report(query, context["data_summary"], insights_section, creatives_section)
 
     # Step 4: Evaluate
+    # The saved report keeps every table; the evaluator reviews a compacted copy.
     logger.info("Evaluator: Reviewing report...")
-    eval_result = evaluator.evaluate(query, report, context["insights_json"])
+    evaluator_report = build_report(query, compact_for("EvaluatorAgent", context["data_summary"]), insights_section, creatives_section)
+    with tracing.span("evaluate", kind="step", agent="EvaluatorAgent"), step_scope("evaluate"):
+        eval_result = await asyncio.to_thread(agents.evaluator.evaluate, query, evaluator_report, context["insights_json"], getattr(agents.data_agent, "cube", None))
     logger.info(f"Evaluator Result: {eval_result}")
+    emit({"event": "evaluated", "result": eval_result})
+    try:
+        agents.planner.record_outcome(query, plan, str(eval_result).startswith("PASS"))
+    except Exception as e:
+        logger.warning(f"Could not update the plan library: {e}")
 
     # Save Outputs
-    os.makedirs("reports", exist_ok=True)
-    report_path = os.path.join("reports", "report.md")
-    with open(report_path, "w") as f:
-        f.write(report)
-    
-    # Save structured data
-    insights_path = os.path.join("reports", "insights.json")
-    with open(insights_path, "w") as f:
-        f.write(context["insights_json"])
-            
+    with tracing.span("write outputs"):
+        os.makedirs(output_dir, exist_ok=True)
+        report_path = os.path.join(output_dir, "report.md")
+        with open(report_path, "w") as f:
+            f.write(report)
+
+        # Save structured data
+        insights_path = os.path.join(output_dir, "insights.json")
+        with open(insights_path, "w") as f:
+            f.write(context["insights_json"])
+
+    summary.update({
+        "status": "ok",
+        "report_path": report_path,
+        "insights_path": insights_path,
+        "evaluation": eval_result,
+        "latency_seconds": round(time.perf_counter() - started, 3)
+    })
     logger.info(f"✅ Analysis Complete! Report saved to {report_path}")
-    logger.info(f"📄 Full execution logs available in: {current_run_dir}")
+    return summary
+
+def load_batch(path):
+    """
+    Reads queries from a JSONL file. Each line is an object with a "query" field
+    and an optional "id"; blank lines are skipped.
+    """
+    queries = []
+    seen = set()
+    with open(path, "r") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            query = record.get("query")
+            if not query:
+                raise ValueError(f"{path}:{line_no}: missing 'query' field")
+            query_id = re.sub(r"[^A-Za-z0-9_.-]+", "_", str(record.get("id") or f"q{len(queries) + 1:03d}"))
+            if query_id in seen:
+                # Every query needs its own output directory
+                query_id = f"{query_id}_{len(queries) + 1}"
+            seen.add(query_id)
+            queries.append((query_id, query))
+    return queries
+
+async def run_batch(queries, agents, output_dir="reports/batch", concurrency=2):
+    """
+    Runs queries concurrently over one set of agents. LLM calls from every query
+    share the process-wide rate limiter, so the API quota holds regardless of
+    `concurrency`. Writes summary.json with per-query status and latency.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    started = time.perf_counter()
+
+    async def run_one(query_id, query):
+        async with semaphore:
+            try:
+                result = await run_query(query, agents, os.path.join(output_dir, query_id))
+            except Exception as e:
+                logger.error(f"Query {query_id} failed: {e}")
+                result = {"query": query, "status": "failed", "error": str(e)}
+            result["id"] = query_id
+            return result
+
+    results = await asyncio.gather(*(run_one(query_id, query) for query_id, query in queries))
+    latencies = [r["latency_seconds"] for r in results if "latency_seconds" in r]
+    summary = {
+        "queries": len(results),
+        "succeeded": sum(r["status"] == "ok" for r in results),
+        "wall_seconds": round(time.perf_counter() - started, 3),
+        "mean_latency_seconds": round(sum(latencies) / len(latencies), 3) if latencies else None,
+        "max_latency_seconds": max(latencies) if latencies else None,
+        "results": results
+    }
+    os.makedirs(output_dir, exist_ok=True)
+    summary_path = os.path.join(output_dir, "summary.json")
+    with open(summary_path, "w") as f:
+        json.dump(summary, f, indent=2, default=str)
+    logger.info(f"Batch complete: {summary['succeeded']}/{summary['queries']} queries succeeded in {summary['wall_seconds']}s. Summary: {summary_path}")
+    return summary
+
+def log_run_stats():
+    from src.agents.data_agent import code_memo, result_memo
+    from src.utils.llm import llm_cache, prompt_stats
+    from src.utils.usage import session_usage
+
+    for cache in (llm_cache, code_memo, result_memo):
+        if cache is not None:
+            cache_stats = cache.stats()
+            logger.info(f"{cache.name}: {cache_stats['hits']} hits, {cache_stats['misses']} misses.", extra={"metrics": {cache.name: cache_stats}})
+
+    usage = prompt_stats.stats()
+    logger.info(f"LLM prompts: {usage['calls']} calls, ~{usage['prompt_tokens']} prompt tokens (largest ~{usage['max_prompt_tokens']}).", extra={"metrics": {"prompts": usage}})
+    tokens = session_usage.summary()
+    logger.info(f"Token usage: {tokens['prompt_tokens']} prompt + {tokens['completion_tokens']} completion ({tokens['retry_tokens']} on retries).", extra={"metrics": {"tokens": tokens}})
+
+def validate_dataset():
+    """
+    Loads and validates the configured dataset without constructing any agent.
+    """
+    from src.utils.data_loader import load_dataset, resolve_csv_path
+
+    csv_path = resolve_csv_path()
+    try:
+        df, fingerprint_id = load_dataset(csv_path)
+    except Exception as e:
+        logger.error(f"❌ {csv_path} failed validation: {e}")
+        exit(1)
+    logger.info(f"✅ {csv_path}: {len(df)} rows, {len(df.columns)} columns passed validation (version {fingerprint_id[:12]}).")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Kasparro Agentic FB Analyst V2")
+    parser.add_argument("query", type=str, nargs="?", help="The analysis query (e.g., 'Analyze ROAS drop')")
+    parser.add_argument("--batch", type=str, help="JSONL file with one {\"id\", \"query\"} object per line")
+    parser.add_argument("--validate", action="store_true", help="Only load and validate the dataset (no LLM calls)")
+    parser.add_argument("--serve", action="store_true", help="Run as a resident service that accepts analysis jobs over HTTP")
+    parser.add_argument("--host", type=str, default=config.get("service", {}).get("host", "127.0.0.1"), help="Service bind address")
+    parser.add_argument("--port", type=int, default=config.get("service", {}).get("port", 8080), help="Service port")
+    parser.add_argument("--socket", type=str, default=None, help="Serve on this Unix socket instead of host/port")
+    parser.add_argument("--concurrency", type=int, default=config.get("execution", {}).get("batch_concurrency", 2), help="Queries run at the same time in batch mode")
+    args = parser.parse_args()
+    if sum([bool(args.query), bool(args.batch), args.serve, args.validate]) != 1:
+        parser.error("Provide exactly one of a query, --batch FILE, --serve or --validate.")
+
+    if args.validate:
+        validate_dataset()
+        return
+
+    # Check for API Key
+    from src.utils.llm import uses_fake_llm
+    if not os.getenv("GROQ_API_KEY") and not uses_fake_llm():
+        logger.critical("GROQ_API_KEY not found in environment variables. Exiting.")
+        exit(1)
+
+    run_dir = start_run()
+    logger.info(f"Run Logs Directory: {run_dir}")
+
+    try:
+        agents = create_agents()
+    except Exception as e:
+        logger.critical(f"Failed to initialize agents: {e}")
+        return
+
+    if args.serve:
+        from src.service import serve
+        service_settings = config.get("service", {})
+        runner = lambda query, output_dir, progress: run_query(query, agents, output_dir, progress)
+        try:
+            await serve(
+                runner,
+                host=args.host,
+                port=args.port,
+                socket_path=args.socket,
+                max_concurrent_jobs=service_settings.get("max_concurrent_jobs", 4),
+                history=service_settings.get("job_history", 500)
+            )
+        finally:
+            log_run_stats()
+        return
+
+    if args.batch:
+        queries = load_batch(args.batch)
+        logger.info(f"Batch mode: {len(queries)} queries from {args.batch} (concurrency {args.concurrency})")
+        await run_batch(queries, agents, concurrency=args.concurrency)
+    else:
+        await run_query(args.query, agents)
+
+    log_run_stats()
+    logger.info(f"📄 Full execution logs available in: {run_dir}")
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, validator
-from typing import List, Optional, Dict, Any
+from typing import List, Literal, Optional, Dict, Any
 from datetime import datetime
 
 class InputSchema(BaseModel):
@@ -53,3 +53,18 @@ class CreativeOutput(BaseModel):
     Collection of creative recommendations.
     """
     recommendations: List[CreativeRecommendation]
+
+class OperationCall(BaseModel):
+    """
+    A DataAgent request mapped onto the typed analytic operation catalog.
+    """
+    operation: Literal["period_over_period", "top_n", "daily_trend", "segment_breakdown", "correlation", "free_form"] = Field(
+        description="Catalog operation to run, or 'free_form' if none fits the instruction"
+    )
+    metrics: List[str] = Field(default_factory=list, description="Metrics to compute, e.g. ['roas', 'ctr']")
+    dimensions: List[str] = Field(default_factory=list, description="Segment columns to break down by, e.g. ['campaign_name']")
+    n: Optional[int] = Field(default=None, description="Number of rows for top_n")
+    ascending: bool = Field(default=False, description="Sort ascending (e.g. worst performers first)")
+    last_n_days: Optional[int] = Field(default=None, description="Restrict to the last N days (period length for period_over_period)")
+    start: Optional[str] = Field(default=None, description="Start date (YYYY-MM-DD), inclusive")
+    end: Optional[str] = Field(default=None, description="End date (YYYY-MM-DD), inclusive")
@@ -0,0 +1,246 @@
+"""
+Resident service mode: one process keeps the agents, their LLM clients and the
+validated dataset warm and serves analysis jobs over a small HTTP API on asyncio.
+
+    POST /jobs                {"query": "..."}  -> 202 {"id": ..., "status": "queued"}
+    GET  /jobs                                  -> recent jobs
+    GET  /jobs/{id}                             -> job status, progress events and result
+    GET  /jobs/{id}/events                      -> progress events streamed as NDJSON until the job ends
+    GET  /health                                -> {"status": "ok", ...}
+
+The API is plain HTTP/1.1 without keep-alive, so it works with curl and any HTTP
+client, over TCP or a Unix socket.
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from src.utils.logger import logger
+
+# Runner signature: (query, output_dir, progress callback) -> run summary
+Runner = Callable[[str, str, Callable[[Dict[str, Any]], None]], Awaitable[Dict[str, Any]]]
+
+MAX_BODY_BYTES = 1024 * 1024
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large"}
+
+class Job:
+    def __init__(self, query: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.query = query
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.events: List[Dict[str, Any]] = []
+        self.updated = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def emit(self, event: Dict[str, Any]):
+        # Must run on the event loop thread
+        self.events.append({"time": round(time.time(), 3), **event})
+        self.updated.set()
+
+    def to_dict(self, include_events: bool = True) -> Dict[str, Any]:
+        data = {
+            "id": self.id,
+            "query": self.query,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+        if include_events:
+            data["events"] = self.events
+        return data
+
+class JobManager:
+    """
+    Queues analysis jobs and runs at most `max_concurrent_jobs` at a time. Only the
+    most recent `history` jobs are kept in memory.
+    """
+    def __init__(self, runner: Runner, max_concurrent_jobs: int = 4, history: int = 500, output_dir: str = "reports/jobs"):
+        self.runner = runner
+        self.output_dir = output_dir
+        self.history = history
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrent_jobs))
+        self._tasks = set()
+
+    def submit(self, query: str) -> Job:
+        job = Job(query)
+        self.jobs[job.id] = job
+        self._prune()
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        logger.info(f"Accepted job {job.id}: '{query}'")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def _prune(self):
+        while len(self.jobs) > self.history:
+            oldest_id, oldest = next(iter(self.jobs.items()))
+            if not oldest.done:
+                break
+            del self.jobs[oldest_id]
+
+    async def _run(self, job: Job):
+        async with self._semaphore:
+            job.status = "running"
+            job.started_at = time.time()
+            job.emit({"event": "started"})
+
+            loop = asyncio.get_running_loop()
+            def progress(event: Dict[str, Any]):
+                # Progress may be reported from worker threads; events are appended on the loop
+                loop.call_soon_threadsafe(job.emit, event)
+
+            try:
+                job.result = await self.runner(job.query, os.path.join(self.output_dir, job.id), progress)
+                job.status = "done" if job.result.get("status") == "ok" else "failed"
+            except Exception as e:
+                logger.error(f"Job {job.id} failed: {e}")
+                job.error = str(e)
+                job.status = "failed"
+            job.finished_at = time.time()
+            # Let progress events queued by the runner land before the final one
+            await asyncio.sleep(0)
+            job.emit({"event": job.status, "result": job.result, "error": job.error})
+
+    async def wait_idle(self):
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+async def _read_request(reader: asyncio.StreamReader):
+    request_line = (await reader.readline()).decode("latin-1").strip()
+    if not request_line:
+        return None
+    method, target, _ = request_line.split(" ", 2)
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode("latin-1")
+        if line in ("\r\n", "\n", ""):
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0) or 0)
+    if length > MAX_BODY_BYTES:
+        return method, target, None
+    body = await reader.readexactly(length) if length else b""
+    return method, target, body
+
+def _json_response(status: int, payload: Any) -> bytes:
+    body = json.dumps(payload, default=str).encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    )
+    return head.encode("latin-1") + body
+
+class AnalysisService:
+    """
+    HTTP front end for a JobManager.
+    """
+    def __init__(self, jobs: JobManager):
+        self.jobs = jobs
+        self.started_at = time.time()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await _read_request(reader)
+            if request is not None:
+                await self._dispatch(*request, writer)
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            writer.write(_json_response(400, {"error": f"Malformed request: {e}"}))
+        except ConnectionError:
+            pass
+        finally:
+            try:
+                await writer.drain()
+                writer.close()
+            except ConnectionError:
+                pass
+
+    async def _dispatch(self, method: str, target: str, body: Optional[bytes], writer: asyncio.StreamWriter):
+        parts = [p for p in target.split("?", 1)[0].split("/") if p]
+
+        if parts == ["health"]:
+            active = sum(1 for job in self.jobs.jobs.values() if not job.done)
+            writer.write(_json_response(200, {"status": "ok", "uptime_seconds": round(time.time() - self.started_at, 1), "active_jobs": active}))
+        elif parts == ["jobs"] and method == "POST":
+            if body is None:
+                writer.write(_json_response(413, {"error": "Request body too large."}))
+                return
+            try:
+                query = json.loads(body or b"{}").get("query")
+            except (json.JSONDecodeError, AttributeError):
+                query = None
+            if not isinstance(query, str) or not query.strip():
+                writer.write(_json_response(400, {"error": "Body must be a JSON object with a non-empty 'query'."}))
+                return
+            job = self.jobs.submit(query.strip())
+            writer.write(_json_response(202, {"id": job.id, "status": job.status}))
+        elif parts == ["jobs"] and method == "GET":
+            writer.write(_json_response(200, [job.to_dict(include_events=False) for job in reversed(self.jobs.jobs.values())]))
+        elif len(parts) in (2, 3) and parts[0] == "jobs" and method == "GET":
+            job = self.jobs.get(parts[1])
+            if job is None:
+                writer.write(_json_response(404, {"error": f"Unknown job '{parts[1]}'."}))
+            elif len(parts) == 2:
+                writer.write(_json_response(200, job.to_dict()))
+            elif parts[2] == "events":
+                await self._stream_events(job, writer)
+            else:
+                writer.write(_json_response(404, {"error": "Not found."}))
+        elif parts and parts[0] in ("jobs", "health"):
+            writer.write(_json_response(405, {"error": f"{method} not allowed on {target}."}))
+        else:
+            writer.write(_json_response(404, {"error": "Not found."}))
+
+    async def _stream_events(self, job: Job, writer: asyncio.StreamWriter):
+        # Close-delimited NDJSON body: one event per line, flushed as it happens
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nCache-Control: no-cache\r\nConnection: close\r\n\r\n")
+        sent = 0
+        while True:
+            if len(job.events) == sent:
+                job.updated.clear()
+                await job.updated.wait()
+                continue
+            pending = job.events[sent:]
+            for event in pending:
+                writer.write(json.dumps(event, default=str).encode("utf-8") + b"\n")
+            sent += len(pending)
+            await writer.drain()
+            if any(event.get("event") in ("done", "failed") for event in pending):
+                return
+
+async def serve(runner: Runner, host: str = "127.0.0.1", port: int = 8080, socket_path: Optional[str] = None,
+                max_concurrent_jobs: int = 4, history: int = 500):
+    """
+    Serves jobs until cancelled. Listens on `socket_path` if given, otherwise on host:port.
+    """
+    service = AnalysisService(JobManager(runner, max_concurrent_jobs=max_concurrent_jobs, history=history))
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = await asyncio.start_unix_server(service.handle, path=socket_path)
+        logger.info(f"🚀 Analysis service listening on unix:{socket_path}")
+    else:
+        server = await asyncio.start_server(service.handle, host=host, port=port)
+        logger.info(f"🚀 Analysis service listening on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
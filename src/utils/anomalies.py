@@ -0,0 +1,194 @@
+"""
+Anomaly and change-point precomputation over every segment at once.
+
+For each breakdown dimension the daily MetricCube rollup is pivoted into a
+(segments x days) matrix per measure, and every statistic is computed on whole
+matrices with NumPy:
+
+- rolling z-score: each day against the mean/std of the `window` days before it;
+  the most extreme z over the last `recent_days` is reported;
+- change point: the single split of the daily series that best separates two means
+  (largest two-sample shift statistic), with the date and size of the shift;
+- contribution to change: the segment's share of the account-level change between
+  the last `recent_days` and the same span before. Ratio metrics use
+  num_s / den_total, so the shares add up to the account change exactly.
+
+Rows are ranked by |z| weighted by the segment's share of recent spend, so a
+small segment needs a larger anomaly to rank as high as a large one. Rows whose
+period change and change-point shift are both below `min_effect_pct` are dropped:
+on very stable series a negligible move can still have a large z.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from src.utils.config import load_config
+from src.utils.metric_cube import MetricCube
+
+config = load_config()
+
+# metric -> (numerator, denominator, scale); additive metrics have no denominator
+COMPONENTS: Dict[str, Tuple[str, Optional[str], float]] = {
+    "roas": ("revenue", "spend", 1.0),
+    "ctr": ("clicks", "impressions", 1.0),
+    "cpm": ("spend", "impressions", 1000.0),
+    "cpc": ("spend", "clicks", 1.0),
+    "spend": ("spend", None, 1.0),
+}
+
+DEFAULT_DIMENSIONS = ["campaign_name", "adset_name", "creative_type", "audience_type"]
+
+def _panel(cube: MetricCube, dimension: Optional[str], measures: List[str], dates: pd.DatetimeIndex) -> Tuple[List[Any], Dict[str, np.ndarray]]:
+    """
+    Segment labels and one (segments x days) matrix per measure; missing days are 0.
+    """
+    daily = cube.query(dimension, by_date=True)
+    if dimension is None:
+        segments = ["All"]
+        matrices = {m: daily[m].reindex(dates, fill_value=0).to_numpy(dtype=float)[None, :] for m in measures}
+        return segments, matrices
+    wide = daily[measures].unstack("date").reindex(columns=pd.MultiIndex.from_product([measures, dates], names=[None, "date"]), fill_value=0)
+    wide = wide.fillna(0)
+    return list(wide.index), {m: wide[m].to_numpy(dtype=float) for m in measures}
+
+def _ratio(num: np.ndarray, den: Optional[np.ndarray], scale: float) -> np.ndarray:
+    if den is None:
+        return num.copy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(den > 0, num / den * scale, np.nan)
+
+def rolling_zscores(series: np.ndarray, window: int) -> np.ndarray:
+    """
+    z of each day against the `window` days before it (NaN without 3 valid days or
+    with a flat baseline). Shape (segments, days - window).
+    """
+    valid = ~np.isnan(series)
+    values = np.where(valid, series, 0.0)
+    pad = np.zeros((series.shape[0], 1))
+    c1 = np.concatenate([pad, np.cumsum(values, axis=1)], axis=1)
+    c2 = np.concatenate([pad, np.cumsum(values ** 2, axis=1)], axis=1)
+    cn = np.concatenate([pad, np.cumsum(valid, axis=1)], axis=1)
+    days = series.shape[1]
+    count = cn[:, window:days] - cn[:, :days - window]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = (c1[:, window:days] - c1[:, :days - window]) / count
+        var = (c2[:, window:days] - c2[:, :days - window]) / count - mean ** 2
+        std = np.sqrt(np.clip(var, 0, None))
+        z = (series[:, window:] - mean) / std
+    # Relative tolerance: a baseline that only varies by rounding noise counts as flat
+    flat = std <= 1e-9 * np.maximum(np.abs(mean), 1.0)
+    return np.where((count >= 3) & ~flat, z, np.nan)
+
+def change_points(series: np.ndarray, min_segment: int = 3) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Best single mean-shift split per row: (split index, shift statistic, shift in %).
+    The split index is the first day after the change.
+    """
+    rows, days = series.shape
+    missing = np.isnan(series)
+    # Days without data take the row's mean, so they do not create a shift of their own
+    row_mean = np.where(missing, 0, series).sum(axis=1, keepdims=True) / np.maximum((~missing).sum(axis=1, keepdims=True), 1)
+    filled = np.where(missing, row_mean, series)
+    splits = np.arange(min_segment, days - min_segment + 1)
+    if len(splits) == 0:
+        return np.zeros(rows, dtype=int), np.zeros(rows), np.full(rows, np.nan)
+    c1 = np.cumsum(filled, axis=1)
+    total = c1[:, -1:]
+    left = c1[:, splits - 1] / splits
+    right = (total - c1[:, splits - 1]) / (days - splits)
+    std = filled.std(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        stat = np.abs(right - left) * np.sqrt(splits * (days - splits) / days) / std
+    stat = np.nan_to_num(stat, nan=0.0, posinf=0.0)
+    best = stat.argmax(axis=1)
+    pick = np.arange(rows)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shift = (right[pick, best] / left[pick, best] - 1) * 100
+    return splits[best], stat[pick, best], shift
+
+def precompute_anomalies(cube: MetricCube, metrics: Optional[List[str]] = None, dimensions: Optional[List[str]] = None,
+                         window: Optional[int] = None, recent_days: Optional[int] = None, top_k: Optional[int] = None,
+                         min_effect_pct: Optional[float] = None) -> pd.DataFrame:
+    """
+    Ranked anomaly table over the account and every segment of `dimensions`.
+    Settings default to the `anomalies` section of config.yaml.
+    """
+    settings = config.get("anomalies", {})
+    metrics = [m for m in (metrics or settings.get("metrics", list(COMPONENTS))) if m in COMPONENTS]
+    dimensions = [d for d in (dimensions or settings.get("dimensions", DEFAULT_DIMENSIONS)) if d in cube.dimensions]
+    window = window or settings.get("window", 7)
+    recent = recent_days or settings.get("recent_days", 7)
+    top_k = top_k or settings.get("top_k", 15)
+    min_effect = settings.get("min_effect_pct", 5.0) if min_effect_pct is None else min_effect_pct
+
+    measures = sorted({c for m in metrics for c in COMPONENTS[m][:2] if c} & set(cube.measures))
+    metrics = [m for m in metrics if all(c in measures for c in COMPONENTS[m][:2] if c)]
+    dates = pd.date_range(cube.date_min, cube.date_max)
+    if len(dates) < max(window + recent, 2 * recent) or not metrics:
+        return pd.DataFrame()
+
+    _, account = _panel(cube, None, measures, dates)
+    account_cur = {m: account[m][:, -recent:].sum() for m in measures}
+    account_prev = {m: account[m][:, -2 * recent:-recent].sum() for m in measures}
+
+    frames = []
+    for dimension in [None] + dimensions:
+        segments, panel = _panel(cube, dimension, measures, dates)
+        spend_cur = panel["spend"][:, -recent:].sum(axis=1) if "spend" in panel else np.ones(len(segments))
+        spend_share = spend_cur / account_cur["spend"] if account_cur.get("spend") else np.ones(len(segments))
+        for metric in metrics:
+            num_name, den_name, scale = COMPONENTS[metric]
+            num, den = panel[num_name], panel[den_name] if den_name else None
+            series = _ratio(num, den, scale)
+
+            z = rolling_zscores(series, window)[:, -recent:]
+            extreme = np.nan_to_num(np.abs(z), nan=-1.0).argmax(axis=1)
+            z_score = z[np.arange(len(segments)), extreme]
+            split, cp_stat, shift = change_points(series)
+
+            num_cur, num_prev = num[:, -recent:].sum(axis=1), num[:, -2 * recent:-recent].sum(axis=1)
+            if den is None:
+                current, previous = num_cur, num_prev
+                contribution = num_cur - num_prev
+                account_change = account_cur[num_name] - account_prev[num_name]
+            else:
+                den_cur, den_prev = den[:, -recent:].sum(axis=1), den[:, -2 * recent:-recent].sum(axis=1)
+                current, previous = _ratio(num_cur, den_cur, scale), _ratio(num_prev, den_prev, scale)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    contribution = scale * (num_cur / account_cur[den_name] - num_prev / account_prev[den_name])
+                    account_change = scale * (account_cur[num_name] / account_cur[den_name] - account_prev[num_name] / account_prev[den_name])
+            with np.errstate(divide="ignore", invalid="ignore"):
+                change_pct = (current / previous - 1) * 100
+                share = contribution / account_change * 100 if account_change else np.full(len(segments), np.nan)
+
+            frames.append(pd.DataFrame({
+                "dimension": dimension or "account",
+                "segment": [str(s) for s in segments],
+                "metric": metric,
+                "previous": previous,
+                "current": current,
+                "change_pct": change_pct,
+                "z_score": z_score,
+                "change_date": dates[split].strftime("%Y-%m-%d"),
+                "shift_pct": shift,
+                "shift_stat": cp_stat,
+                "contribution_pct": share,
+                "spend_share_pct": spend_share * 100,
+                "score": np.nan_to_num(np.abs(z_score)) * np.sqrt(np.clip(spend_share, 0, None)),
+            }))
+
+    table = pd.concat(frames, ignore_index=True)
+    effect = np.fmax(table["change_pct"].abs(), table["shift_pct"].abs())
+    table = table[(table["score"] > 0) & (effect >= min_effect)].sort_values("score", ascending=False).head(top_k)
+    return table.round({"previous": 4, "current": 4, "change_pct": 1, "z_score": 2, "shift_pct": 1,
+                        "shift_stat": 2, "contribution_pct": 1, "spend_share_pct": 1, "score": 2}).reset_index(drop=True)
+
+def render_anomalies(table: pd.DataFrame, recent_days: Optional[int] = None) -> str:
+    """
+    Markdown section handed to InsightAgent ahead of the DataAgent outputs.
+    """
+    recent = recent_days or config.get("anomalies", {}).get("recent_days", 7)
+    if table.empty:
+        return ""
+    return (f"### Precomputed Anomalies (last {recent} days vs the {recent} before; "
+            f"z = most extreme rolling z-score in the last {recent} days; change_date = detected change point; "
+            f"contribution_pct = share of the account-level change)\n{table.to_markdown(index=False)}")
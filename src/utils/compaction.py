@@ -0,0 +1,128 @@
+from typing import List, Optional, Tuple
+import numpy as np
+from src.utils.llm import estimate_tokens
+
+# Tables never shrink below this many rows while fitting a budget
+MIN_TABLE_ROWS = 4
+# A row is an outlier if one of its numeric cells is this many standard deviations from the column mean
+OUTLIER_Z = 2.0
+
+def _split_cells(line: str) -> List[str]:
+    return [cell.strip() for cell in line.strip().strip("|").split("|")]
+
+def _join_cells(cells: List[str]) -> str:
+    return "| " + " | ".join(cells) + " |"
+
+def _to_number(cell: str) -> Optional[float]:
+    try:
+        return float(cell.replace(",", ""))
+    except ValueError:
+        return None
+
+def _split_blocks(text: str) -> List[Tuple[bool, List[str]]]:
+    """
+    Splits markdown into (is_table, lines) blocks. A table is a run of '|' lines
+    whose second line is the header separator.
+    """
+    blocks: List[Tuple[bool, List[str]]] = []
+    current: List[str] = []
+    in_table = False
+    for line in text.split("\n"):
+        is_table_line = line.lstrip().startswith("|")
+        if is_table_line != in_table and current:
+            blocks.append((in_table, current))
+            current = []
+        in_table = is_table_line
+        current.append(line)
+    if current:
+        blocks.append((in_table, current))
+    return [(is_table and len(lines) > 2 and set(lines[1].strip()) <= set("|:- "), lines) for is_table, lines in blocks]
+
+def compact_table(lines: List[str], max_rows: int, edge_rows: int = 5, outlier_rows: int = 5) -> List[str]:
+    """
+    Shrinks a markdown table to at most `max_rows` body rows.
+
+    Keeps the first and last `edge_rows` rows plus the most extreme outlier rows,
+    in their original order. Columns that hold the same value in every row are
+    dropped and stated once, and the omitted rows are summarised per numeric column.
+    """
+    header, body = _split_cells(lines[0]), [_split_cells(line) for line in lines[2:]]
+    if len(body) <= max_rows:
+        return lines
+
+    width = len(header)
+    body = [row + [""] * (width - len(row)) for row in body]
+    columns = list(zip(*body))
+
+    # Collapse columns that repeat one value (skipping the index column)
+    constant = [c for c in range(1, width) if len(set(columns[c])) == 1]
+    notes = [f"{header[c] or 'index'} = {columns[c][0]}" for c in constant]
+
+    numeric = {}
+    for c in range(1, width):
+        if c in constant:
+            continue
+        values = [_to_number(v) for v in columns[c]]
+        if all(v is not None for v in values):
+            numeric[c] = np.array(values, dtype=float)
+
+    # Reserve part of the cap for outliers so head/tail rows cannot crowd them out
+    reserved = min(outlier_rows, max_rows // 3) if numeric else 0
+    edge = max(1, min(edge_rows, (max_rows - reserved) // 2))
+    keep = set(range(edge)) | set(range(len(body) - edge, len(body)))
+    budget = max_rows - len(keep)
+    if numeric and budget > 0 and outlier_rows > 0:
+        scores = np.zeros(len(body))
+        for values in numeric.values():
+            std = values.std()
+            if std > 0:
+                scores = np.maximum(scores, np.abs(values - values.mean()) / std)
+        candidates = [int(i) for i in np.argsort(-scores) if scores[i] >= OUTLIER_Z and int(i) not in keep]
+        keep |= set(candidates[:min(budget, outlier_rows)])
+
+    kept = sorted(keep)
+    omitted = [i for i in range(len(body)) if i not in keep]
+    visible = [c for c in range(width) if c not in constant]
+
+    out = [_join_cells([header[c] for c in visible]), _join_cells(["---"] * len(visible))]
+    previous = -1
+    for i in kept:
+        if i != previous + 1:
+            out.append(_join_cells(["…"] * len(visible)))
+        out.append(_join_cells([body[i][c] for c in visible]))
+        previous = i
+
+    summary = [f"_Showing {len(kept)} of {len(body)} rows._"]
+    if notes:
+        summary.append(f"_Same in every row: {', '.join(notes)}._")
+    if omitted and numeric:
+        stats = []
+        for c, values in numeric.items():
+            rest = values[omitted]
+            stats.append(f"{header[c]} min {rest.min():.4g} / mean {rest.mean():.4g} / max {rest.max():.4g}")
+        summary.append(f"_Omitted rows: {'; '.join(stats)}._")
+    return out + summary
+
+def compact_text(text: str, token_budget: int, max_rows: int = 20, edge_rows: int = 5, outlier_rows: int = 5) -> str:
+    """
+    Fits markdown with DataAgent tables into roughly `token_budget` tokens.
+
+    Tables are capped at `max_rows`, then the cap is halved until the text fits.
+    Text that still does not fit is truncated with a marker.
+    """
+    blocks = _split_blocks(text)
+    rows = max_rows
+    while True:
+        parts = []
+        for is_table, lines in blocks:
+            parts.extend(compact_table(lines, rows, edge_rows, outlier_rows) if is_table else lines)
+        compacted = "\n".join(parts)
+        if estimate_tokens([compacted]) <= token_budget or rows <= MIN_TABLE_ROWS:
+            break
+        rows = max(MIN_TABLE_ROWS, rows // 2)
+
+    if estimate_tokens([compacted]) > token_budget:
+        marker = "\n\n_[Truncated to fit the context budget.]_"
+        limit = max(0, len(compacted) * token_budget // estimate_tokens([compacted]) - len(marker))
+        compacted = compacted[:limit] + marker
+    return compacted
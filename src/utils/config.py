@@ -0,0 +1,13 @@
+import functools
+from typing import Any, Dict
+import yaml
+
+CONFIG_PATH = "config/config.yaml"
+
+@functools.lru_cache(maxsize=None)
+def load_config(path: str = CONFIG_PATH) -> Dict[str, Any]:
+    """
+    Parses config.yaml once per process; every module shares the returned dict.
+    """
+    with open(path, "r") as f:
+        return yaml.safe_load(f)
@@ -0,0 +1,369 @@
+import glob
+import hashlib
+import io
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+import pandas as pd
+from src.utils.config import load_config
+from src.utils.logger import logger
+from src.utils.cache import content_hash
+from src.utils.validators import validate_schema
+from src.utils.streaming import StreamingAggregator, stream_aggregate
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError: # Optional: snapshots are skipped without pyarrow
+    pa = feather = None
+
+# Aggregation grain for streaming ingestion: the analysis dimensions, without per-ad text
+DEFAULT_GROUP_BY = ["campaign_name", "adset_name", "date", "creative_type", "audience_type", "platform", "country"]
+
+# Bytes read at a time when scanning back for the last complete line
+CHECK_BLOCK_BYTES = 64 * 1024
+# Bytes read at a time when hashing the ingested prefix
+HASH_BLOCK_BYTES = 1024 * 1024
+# Snapshot schema metadata key holding the ingest state (offset, checksum, watermark)
+STATE_KEY = b"ingest_state"
+
+# Load config
+config = load_config()
+
+def resolve_csv_path() -> str:
+    """
+    Returns the dataset path selected by `use_sample_data` in config.yaml.
+    """
+    return config["data"]["sample_path"] if config.get("use_sample_data", False) else config["data"]["csv_path"]
+
+def file_fingerprint(path: str, hash_contents: bool = False) -> Dict[str, object]:
+    """
+    Identifies a specific version of a source file by path, size and mtime, and
+    optionally by a SHA-256 of its contents (for filesystems with unreliable mtimes).
+    """
+    stat = os.stat(path)
+    fingerprint = {"path": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if hash_contents:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        fingerprint["sha256"] = digest.hexdigest()
+    return fingerprint
+
+def prepare_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Parses dates and adds the derived metrics the agents expect.
+    """
+    df['date'] = pd.to_datetime(df['date'])
+
+    # Calculate derived metrics if missing
+    if 'cpm' not in df.columns:
+        df['cpm'] = (df['spend'] / df['impressions'] * 1000).fillna(0)
+    if 'cpc' not in df.columns:
+        df['cpc'] = (df['spend'] / df['clicks']).fillna(0)
+    return df
+
+def _ingestion_settings() -> Dict[str, object]:
+    return config.get("data", {}).get("ingestion", {})
+
+def _snapshot_settings() -> Dict[str, object]:
+    return config.get("cache", {}).get("snapshot", {})
+
+def _snapshot_path(csv_path: str, fingerprint_id: str) -> str:
+    source_id = content_hash(os.path.abspath(csv_path))[:16]
+    return os.path.join(_snapshot_settings().get("dir", ".cache/snapshots"), f"{source_id}-{fingerprint_id[:16]}.arrow")
+
+def snapshot_file(csv_path: str, fingerprint_id: str) -> Optional[str]:
+    """
+    Path of the Arrow snapshot holding this version of the dataset, if one was written.
+    """
+    if feather is None or not _snapshot_settings().get("enabled", True):
+        return None
+    path = _snapshot_path(csv_path, fingerprint_id)
+    return path if os.path.exists(path) else None
+
+def _read_snapshot(path: str) -> Optional[pd.DataFrame]:
+    if not os.path.exists(path):
+        return None
+    try:
+        # Uncompressed Arrow IPC is memory-mapped: columns are paged in from the OS cache, not parsed.
+        return feather.read_table(path, memory_map=True).to_pandas()
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable dataset snapshot {path}: {e}")
+        return None
+
+def _write_snapshot(df: pd.DataFrame, path: str, state: Optional[Dict[str, Any]] = None):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        table = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False)
+        if state is not None:
+            # Stored with the data it describes, so the two can never get out of step
+            table = table.replace_schema_metadata({**(table.schema.metadata or {}), STATE_KEY: json.dumps(state)})
+        feather.write_feather(table, tmp_path, compression="uncompressed")
+        os.replace(tmp_path, path)
+        # Older snapshots of the same source file are stale now
+        prefix = os.path.basename(path).split("-")[0]
+        for stale in glob.glob(os.path.join(os.path.dirname(path), f"{prefix}-*.arrow")):
+            if stale != path:
+                os.remove(stale)
+        logger.debug(f"Wrote dataset snapshot {path}")
+    except Exception as e:
+        logger.warning(f"Could not write dataset snapshot {path}: {e}")
+
+def _hash_range(digest, path: str, start: int, end: int):
+    """
+    Feeds bytes [start, end) of `path` into `digest`.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = f.read(min(HASH_BLOCK_BYTES, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest
+
+def _prefix_checksum(path: str, length: int) -> str:
+    """
+    SHA-256 of the first `length` bytes. Every byte counts: an edited historical row
+    must force a full reload even when the file also grew. Hashing is far cheaper
+    than parsing, and an incremental load extends the digest it verified with the
+    appended bytes instead of reading the prefix twice.
+    """
+    return _hash_range(hashlib.sha256(), path, 0, length).hexdigest()
+
+def _complete_length(path: str, start: int = 0) -> int:
+    """
+    Length of the file up to and including its last newline, so that a row still
+    being appended is left for the next load.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        position = size
+        while position > start:
+            step = min(CHECK_BLOCK_BYTES, position - start)
+            f.seek(position - step)
+            block = f.read(step)
+            newline = block.rfind(b"\n")
+            if newline != -1:
+                return position - step + newline + 1
+            position -= step
+    return start
+
+def _ends_line(path: str, length: int) -> bool:
+    with open(path, "rb") as f:
+        f.seek(max(0, length - 1))
+        return f.read(1) == b"\n"
+
+def _ingest_state(csv_path: str, df: pd.DataFrame, offset: int, streaming: bool, lineage: str, checksum: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "lineage": lineage,
+        "streaming": streaming,
+        "offset": offset,
+        "checksum": checksum or _prefix_checksum(csv_path, offset),
+        "rows": int(df["rows"].sum()) if "rows" in df.columns else len(df),
+        "watermark": str(pd.Timestamp(df["date"].max()).date()) if len(df) else None,
+    }
+
+def _read_state(snapshot_path: str) -> Optional[Dict[str, Any]]:
+    """
+    The ingest state stored in a snapshot's schema metadata (only the schema is read).
+    """
+    try:
+        with pa.memory_map(snapshot_path) as source:
+            metadata = pa.ipc.open_file(source).schema.metadata or {}
+        return json.loads(metadata[STATE_KEY]) if STATE_KEY in metadata else None
+    except (OSError, ValueError, pa.ArrowInvalid):
+        return None
+
+def _previous_snapshot(csv_path: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    The most recent snapshot of `csv_path` that has an ingest state, if any.
+    """
+    pattern = _snapshot_path(csv_path, "*" * 16).replace("*" * 16, "*")
+    for path in sorted(glob.glob(pattern), key=os.path.getmtime, reverse=True):
+        state = _read_state(path)
+        if state is not None:
+            return path, state
+    return None
+
+class _FileSlice(io.RawIOBase):
+    """
+    Read-only view of bytes [start, end) of a file, so the parser never sees rows
+    appended while it runs.
+    """
+    def __init__(self, path: str, start: int, end: int):
+        self.name = path
+        self._file = open(path, "rb")
+        self._file.seek(start)
+        self._remaining = end - start
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer)[:self._remaining]
+        count = self._file.readinto(view) if len(view) else 0
+        self._remaining -= count
+        return count
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+def _open_slice(path: str, start: int, end: int) -> io.BufferedReader:
+    return io.BufferedReader(_FileSlice(path, start, end))
+
+def _read_appended(csv_path: str, offset: int, end: int, columns: list, chunk_size: int):
+    """
+    Yields the rows between byte `offset` and `end` in batches, parsed with the
+    header of the original file.
+    """
+    with _open_slice(csv_path, offset, end) as f:
+        for chunk in pd.read_csv(f, names=columns, header=None, chunksize=chunk_size):
+            chunk["date"] = pd.to_datetime(chunk["date"])
+            yield chunk
+
+def _load_appended(csv_path: str, streaming: bool, ingestion: Dict[str, Any]) -> Optional[Tuple[pd.DataFrame, Dict[str, Any], Dict[str, Any]]]:
+    """
+    Extends the previous snapshot with the rows appended to the CSV since it was
+    written. Returns None (full reload) unless the file only grew and its previously
+    ingested prefix is unchanged.
+    """
+    previous = _previous_snapshot(csv_path)
+    if previous is None:
+        return None
+    snapshot_path, state = previous
+    if state.get("streaming") != streaming:
+        # Raw rows and aggregates cannot be extended into one another
+        return None
+    offset = state.get("offset", 0)
+    end = _complete_length(csv_path, start=offset)
+    if not offset or end <= offset:
+        return None
+    digest = _hash_range(hashlib.sha256(), csv_path, 0, offset)
+    if digest.hexdigest() != state.get("checksum"):
+        return None
+    old = _read_snapshot(snapshot_path)
+    if old is None:
+        return None
+
+    columns = pd.read_csv(csv_path, nrows=0).columns.to_list()
+    chunk_size = ingestion.get("chunk_size", 500000)
+    new_rows = 0
+    new_dates = []
+    if streaming:
+        keys = ingestion.get("group_by", DEFAULT_GROUP_BY)
+        aggregator = StreamingAggregator.resume(old, keys)
+        for chunk in _read_appended(csv_path, offset, end, columns, chunk_size):
+            validate_schema(chunk)
+            aggregator.update(chunk)
+            new_rows += len(chunk)
+            new_dates.append(chunk["date"])
+        df = aggregator.result()
+    else:
+        parts = []
+        for chunk in _read_appended(csv_path, offset, end, columns, chunk_size):
+            chunk = prepare_frame(chunk)
+            validate_schema(chunk)
+            parts.append(chunk)
+            new_rows += len(chunk)
+            new_dates.append(chunk["date"])
+        df = pd.concat([old] + parts, ignore_index=True)
+
+    dates = pd.concat(new_dates)
+    lineage = state.get("lineage") or content_hash(state)
+    delta = {
+        "mode": "incremental",
+        "lineage": lineage,
+        "new_rows": new_rows,
+        "previous_watermark": state.get("watermark"),
+        "changed_from": str(dates.min().date()),
+        "changed_to": str(dates.max().date()),
+    }
+    checksum = _hash_range(digest, csv_path, offset, end).hexdigest()
+    return df, _ingest_state(csv_path, df, end, streaming, lineage, checksum), delta
+
+def load_dataset(csv_path: Optional[str] = None) -> Tuple[pd.DataFrame, str]:
+    """
+    Loads the ads dataset as a validated, typed frame with derived columns.
+
+    The first load of a given file version parses the CSV, validates it and writes a
+    columnar snapshot keyed by the file's fingerprint. Later loads of the same
+    version memory-map that snapshot and skip parsing and validation entirely.
+
+    With `data.ingestion.mode: streaming` the CSV is never held in memory as a whole:
+    it is read in `chunk_size` batches and reduced to per campaign/adset/date sums,
+    and that compact aggregate frame is what the agents analyse.
+
+    Returns:
+        (frame, fingerprint_id) where fingerprint_id changes whenever the source data does.
+    """
+    df, fingerprint_id, _ = load_dataset_delta(csv_path)
+    return df, fingerprint_id
+
+def load_dataset_delta(csv_path: Optional[str] = None) -> Tuple[pd.DataFrame, str, Dict[str, Any]]:
+    """
+    load_dataset() that also reports what changed since the previous snapshot.
+
+    With `data.ingestion.incremental` enabled, a CSV that only grew since its last
+    snapshot is not re-read: the rows after the stored byte offset are parsed,
+    validated and merged into the previous frame (or aggregate), and the new
+    offset and `date` watermark are stored in the new snapshot's metadata.
+
+    Returns:
+        (frame, fingerprint_id, delta) where delta["mode"] is "snapshot", "incremental"
+        or "full" and delta["lineage"] stays the same across appends (it changes when
+        the file is rewritten); incremental loads also give new_rows,
+        previous_watermark and the changed_from/changed_to date range.
+    """
+    csv_path = csv_path or resolve_csv_path()
+    settings = _snapshot_settings()
+    ingestion = _ingestion_settings()
+    streaming = ingestion.get("mode", "full") == "streaming"
+    fingerprint = file_fingerprint(csv_path, hash_contents=settings.get("hash_contents", False))
+    if streaming:
+        # The aggregate is a different frame than the raw rows, so it gets its own identity
+        fingerprint["ingestion"] = {"mode": "streaming", "group_by": ingestion.get("group_by")}
+    fingerprint_id = content_hash(fingerprint)
+    use_snapshot = settings.get("enabled", True) and feather is not None
+    if settings.get("enabled", True) and feather is None:
+        logger.debug("pyarrow is not installed; dataset snapshots are disabled.")
+
+    if use_snapshot:
+        snapshot_path = _snapshot_path(csv_path, fingerprint_id)
+        df = _read_snapshot(snapshot_path)
+        if df is not None:
+            logger.debug(f"Loaded dataset snapshot {snapshot_path} with shape {df.shape} (validation skipped)")
+            state = _read_state(snapshot_path) or {}
+            return df, fingerprint_id, {"mode": "snapshot", "new_rows": 0, "lineage": state.get("lineage", fingerprint_id)}
+
+        if ingestion.get("incremental", False):
+            appended = _load_appended(csv_path, streaming, ingestion)
+            if appended is not None:
+                df, state, delta = appended
+                logger.info(f"Ingested {delta['new_rows']} appended rows ({delta['changed_from']} to {delta['changed_to']}); earlier rows were reused from the snapshot.")
+                _write_snapshot(df, snapshot_path, state)
+                return df, fingerprint_id, delta
+
+    # Parse a fixed byte range, so rows appended meanwhile are left for the next load
+    end = os.path.getsize(csv_path)
+    with _open_slice(csv_path, 0, end) as f:
+        if streaming:
+            df = stream_aggregate(f, chunk_size=ingestion.get("chunk_size", 500000), keys=ingestion.get("group_by", DEFAULT_GROUP_BY))
+        else:
+            df = prepare_frame(pd.read_csv(f))
+            logger.debug(f"Loaded data from {csv_path} with shape {df.shape}")
+
+            # Validate Schema (Strict)
+            validate_schema(df)
+
+    if use_snapshot:
+        # Appends can only be picked up from a line boundary
+        state = _ingest_state(csv_path, df, end, streaming, fingerprint_id) if _ends_line(csv_path, end) else None
+        _write_snapshot(df, snapshot_path, state)
+    return df, fingerprint_id, {"mode": "full", "new_rows": int(df["rows"].sum()) if "rows" in df.columns else len(df), "lineage": fingerprint_id}
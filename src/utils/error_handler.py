@@ -1,8 +1,13 @@
+import asyncio
+import contextvars
 import functools
+import inspect
 import traceback
 import time
 from typing import Any, Callable, Optional, Type
 from src.utils.logger import logger
+from src.utils import tracing
+from src.utils.rate_limiter import is_rate_limit_error
 
 class AgentError(Exception):
     """Base exception for Agent failures."""
@@ -20,6 +25,21 @@ class AgentExecutionError(AgentError):
     """Raised when an agent fails to execute its task."""
     pass
 
+class BudgetExceededError(AgentError):
+    """Raised before an LLM call that would exceed the run's token budget. Never retried."""
+    pass
+
+# (log_context, attempt number) of the innermost safe_execute attempt; used to attribute token usage
+current_attempt: contextvars.ContextVar = contextvars.ContextVar("current_attempt", default=None)
+
+def _budget_error(e: BaseException) -> Optional[BudgetExceededError]:
+    # Agents often wrap LLM failures in their own errors; look through the cause chain
+    while e is not None:
+        if isinstance(e, BudgetExceededError):
+            return e
+        e = e.__cause__
+    return None
+
 def safe_execute(
     default_return: Any = None,
     log_context: str = "Operation",
@@ -38,15 +58,84 @@ def safe_execute(
         retries: Number of times to retry on failure.
         backoff_factor: Multiplier for sleep time between retries.
         allowed_exceptions: Tuple of exceptions that should NOT trigger a retry (fail fast).
+
+    Works for both regular functions and coroutine functions; the async variant
+    backs off with asyncio.sleep so it never blocks the event loop. Each attempt
+    is traced as its own span, so retries show up in the run trace.
+    BudgetExceededError, even when wrapped by the agent, is re-raised at once
+    instead of being retried.
     """
+    def retry_delay(e: Exception, attempt: int) -> float:
+        # Provider 429s are paced by the shared rate limiter (which honours
+        # retry-after), so sleeping here as well would only double the wait.
+        if is_rate_limit_error(e):
+            return 0
+        return backoff_factor * (2 ** attempt)
+
+    def give_up(e: Exception, error_msg: str):
+        logger.error(f"Failed {log_context} after {retries + 1} attempts.")
+        logger.debug(traceback.format_exc())
+
+        if raise_on_error:
+            # If it's already one of our custom errors, re-raise it.
+            # Otherwise, wrap it in AgentExecutionError
+            if isinstance(e, AgentError):
+                raise e
+            raise AgentExecutionError(error_msg) from e
+
+        return default_return
+
     def decorator(func: Callable):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                attempt = 0
+                while attempt <= retries:
+                    try:
+                        logger.debug(f"Starting {log_context} (Attempt {attempt + 1}/{retries + 1})...")
+                        token = current_attempt.set((log_context, attempt + 1))
+                        try:
+                            with tracing.span(log_context, kind="attempt", attempt=attempt + 1):
+                                result = await func(*args, **kwargs)
+                        finally:
+                            current_attempt.reset(token)
+                        logger.debug(f"Completed {log_context} successfully.")
+                        return result
+                    except allowed_exceptions as e:
+                        logger.error(f"Critical error in {log_context}: {str(e)} (No Retry)")
+                        if raise_on_error:
+                            raise e
+                        return default_return
+                    except Exception as e:
+                        budget_error = _budget_error(e)
+                        if budget_error is not None:
+                            # Retrying cannot help once the budget is spent
+                            logger.warning(f"{log_context} stopped: {budget_error}")
+                            raise budget_error
+                        error_msg = f"Error in {log_context} (Attempt {attempt + 1}): {str(e)}"
+                        logger.warning(error_msg)
+
+                        if attempt < retries:
+                            sleep_time = retry_delay(e, attempt)
+                            logger.info(f"Retrying in {sleep_time}s...")
+                            await asyncio.sleep(sleep_time)
+                            attempt += 1
+                        else:
+                            return give_up(e, error_msg)
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             attempt = 0
             while attempt <= retries:
                 try:
                     logger.debug(f"Starting {log_context} (Attempt {attempt + 1}/{retries + 1})...")
-                    result = func(*args, **kwargs)
+                    token = current_attempt.set((log_context, attempt + 1))
+                    try:
+                        with tracing.span(log_context, kind="attempt", attempt=attempt + 1):
+                            result = func(*args, **kwargs)
+                    finally:
+                        current_attempt.reset(token)
                     logger.debug(f"Completed {log_context} successfully.")
                     return result
                 except allowed_exceptions as e:
@@ -55,25 +144,20 @@ def safe_execute(
                         raise e
                     return default_return
                 except Exception as e:
+                    budget_error = _budget_error(e)
+                    if budget_error is not None:
+                        # Retrying cannot help once the budget is spent
+                        logger.warning(f"{log_context} stopped: {budget_error}")
+                        raise budget_error
                     error_msg = f"Error in {log_context} (Attempt {attempt + 1}): {str(e)}"
                     logger.warning(error_msg)
                     
                     if attempt < retries:
-                        sleep_time = backoff_factor * (2 ** attempt)
+                        sleep_time = retry_delay(e, attempt)
                         logger.info(f"Retrying in {sleep_time}s...")
                         time.sleep(sleep_time)
                         attempt += 1
                     else:
-                        logger.error(f"Failed {log_context} after {retries + 1} attempts.")
-                        logger.debug(traceback.format_exc())
-                        
-                        if raise_on_error:
-                            # If it's already one of our custom errors, re-raise it.
-                            # Otherwise, wrap it in AgentExecutionError
-                            if isinstance(e, AgentError):
-                                raise e
-                            raise AgentExecutionError(error_msg) from e
-                        
-                        return default_return
+                        return give_up(e, error_msg)
         return wrapper
     return decorator
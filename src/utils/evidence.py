@@ -0,0 +1,212 @@
+"""
+Numeric verification of insight evidence against the dataset.
+
+Each Evidence item claims a relative change of a metric in a segment (e.g. roas
+"-22%" in "Campaign A"). The claim is checked against period-over-period changes
+computed from the MetricCube: the last N days against the N days before, for each
+configured window. Ratio metrics are recomputed from summed components, and a
+bootstrap over days gives a confidence interval for the change. A claim is
+"verified" when it falls inside the interval (plus a tolerance) for some window,
+"contradicted" when it falls outside for every window with data, and
+"unverifiable" when the delta, metric or segment cannot be mapped onto the data
+or the baseline is zero. A contradiction is "opposed" when the data moved the
+other way in every window, significantly in at least one; otherwise the claim
+may be about a period other than the configured windows.
+"""
+import re
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from src.utils.config import load_config
+from src.utils.metric_cube import MetricCube
+
+config = load_config()
+
+PERCENT = re.compile(r"([+-]?\d+(?:\.\d+)?)\s*%")
+# Separators between the dimension values of a combined segment, e.g. "Instagram / 25-34"
+SEGMENT_SEPARATORS = re.compile(r"\s*(?:/|\||,|;|\s&\s|\sand\s|\sx\s)\s*")
+OVERALL_SEGMENTS = {"", "all", "overall", "total", "account", "all campaigns", "n/a", "none"}
+
+# metric -> (numerator, denominator, scale); additive metrics have no denominator
+METRICS: Dict[str, Tuple[str, Optional[str], float]] = {
+    "roas": ("revenue", "spend", 1.0),
+    "ctr": ("clicks", "impressions", 1.0),
+    "cpm": ("spend", "impressions", 1000.0),
+    "cpc": ("spend", "clicks", 1.0),
+    "spend": ("spend", None, 1.0),
+    "impressions": ("impressions", None, 1.0),
+    "clicks": ("clicks", None, 1.0),
+    "revenue": ("revenue", None, 1.0),
+    "purchases": ("purchases", None, 1.0),
+}
+
+def _settings() -> Dict[str, Any]:
+    return config.get("evaluation", {})
+
+def parse_delta(delta: Any) -> Optional[float]:
+    """
+    The claimed change in percent ("-32%" -> -32.0), or None if it is not a percentage.
+    """
+    match = PERCENT.search(str(delta or ""))
+    if match is None:
+        return None
+    value = float(match.group(1))
+    text = str(delta).lower()
+    # "dropped 32%" carries its sign in words
+    if not match.group(1).startswith(("+", "-")) and any(w in text for w in ("drop", "decreas", "declin", "fell", "down", "lower")):
+        value = -value
+    return value
+
+def _metric(name: str) -> Optional[str]:
+    name = re.sub(r"[^a-z]", "", str(name or "").lower())
+    if name in METRICS:
+        return name
+    for metric in METRICS:
+        if name.startswith(metric) or (len(name) > 2 and metric.startswith(name)):
+            return metric
+    return None
+
+class EvidenceVerifier:
+    """
+    Checks Evidence deltas against a MetricCube. Results are reproducible: the
+    bootstrap is seeded from `random_seed` and the claim being checked.
+    """
+    def __init__(self, cube: MetricCube, windows: Optional[List[int]] = None, samples: Optional[int] = None,
+                 confidence: Optional[float] = None, tolerance_pct: Optional[float] = None):
+        settings = _settings()
+        self.cube = cube
+        self.windows = windows or settings.get("windows", [7, 14])
+        self.samples = samples or settings.get("bootstrap_samples", 1000)
+        self.confidence = confidence or settings.get("confidence_level", 0.95)
+        self.tolerance_pct = settings.get("delta_tolerance_pct", 5.0) if tolerance_pct is None else tolerance_pct
+        self.seed = config.get("random_seed", 42)
+        # Lower-cased dimension value -> (dimension, value), to resolve free-text segments
+        self.values: Dict[str, Tuple[str, Any]] = {}
+        for dim in cube.dimensions:
+            for value in cube.query(dim, metrics=["spend"], by_date=False).index:
+                self.values.setdefault(str(value).strip().lower(), (dim, value))
+
+    def _filters(self, segment: Any) -> Optional[Dict[str, List[Any]]]:
+        """
+        Dimension filters for a segment, {} for the whole account, None if unknown.
+        """
+        text = str(segment or "").strip().lower()
+        if text in OVERALL_SEGMENTS:
+            return {}
+        parts = [text] if text in self.values else SEGMENT_SEPARATORS.split(text)
+        filters: Dict[str, List[Any]] = {}
+        for part in parts:
+            if part not in self.values:
+                return None
+            dim, value = self.values[part]
+            filters.setdefault(dim, []).append(value)
+        return filters
+
+    def _daily(self, filters: Dict[str, List[Any]], metric: str, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+        numerator, denominator, _ = METRICS[metric]
+        columns = [numerator] + ([denominator] if denominator else [])
+        daily = self.cube.query(None, by_date=True, start=start, end=end, filters=filters or None)
+        if any(c not in daily.columns for c in columns):
+            return pd.DataFrame()
+        return daily[columns].reset_index()
+
+    def _bootstrap(self, metric: str, previous: pd.DataFrame, current: pd.DataFrame, seed: int) -> Dict[str, float]:
+        numerator, denominator, scale = METRICS[metric]
+
+        def components(frame):
+            num = frame[numerator].to_numpy(dtype=float)
+            den = frame[denominator].to_numpy(dtype=float) if denominator else np.ones(len(frame))
+            return num, den
+
+        (p_num, p_den), (c_num, c_den) = components(previous), components(current)
+        observed_prev = p_num.sum() / p_den.sum() * scale
+        observed_cur = c_num.sum() / c_den.sum() * scale
+        with np.errstate(divide="ignore", invalid="ignore"):
+            observed = (observed_cur / observed_prev - 1) * 100
+
+        # Resample days with replacement within each period, all draws at once
+        rng = np.random.default_rng(seed)
+        p_idx = rng.integers(0, len(p_num), size=(self.samples, len(p_num)))
+        c_idx = rng.integers(0, len(c_num), size=(self.samples, len(c_num)))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            prev = p_num[p_idx].sum(axis=1) / p_den[p_idx].sum(axis=1)
+            cur = c_num[c_idx].sum(axis=1) / c_den[c_idx].sum(axis=1)
+            changes = (cur / prev - 1) * 100
+        changes = changes[np.isfinite(changes)]
+        alpha = (1 - self.confidence) / 2 * 100
+        low, high = np.percentile(changes, [alpha, 100 - alpha]) if len(changes) else (observed, observed)
+        return {"observed_pct": round(float(observed), 2), "ci_low_pct": round(float(low), 2), "ci_high_pct": round(float(high), 2)}
+
+    def check(self, metric_name: Any, delta: Any, segment: Any) -> Dict[str, Any]:
+        """
+        Verdict for one Evidence item, with the observed change and its interval for
+        the window that best matches the claim.
+        """
+        result: Dict[str, Any] = {"metric": metric_name, "delta": delta, "segment": segment}
+        claimed = parse_delta(delta)
+        metric = _metric(metric_name)
+        filters = self._filters(segment)
+        if claimed is None or metric is None or filters is None:
+            reason = "delta is not a percentage" if claimed is None else ("unknown metric" if metric is None else "unknown segment")
+            return {**result, "status": "unverifiable", "reason": reason}
+
+        windows = []
+        for days in self.windows:
+            current_start = self.cube.date_max - pd.Timedelta(days=days - 1)
+            previous_start = current_start - pd.Timedelta(days=days)
+            daily = self._daily(filters, metric, previous_start, self.cube.date_max)
+            if daily.empty:
+                continue
+            is_current = (daily["date"] >= current_start).to_numpy()
+            previous, current = daily[~is_current], daily[is_current]
+            denominator = METRICS[metric][1] or METRICS[metric][0]
+            # Two days per period at least, and something to divide by in both
+            if len(previous) < 2 or len(current) < 2 or previous[denominator].sum() == 0 or current[denominator].sum() == 0:
+                continue
+            seed = zlib.crc32(f"{self.seed}|{metric}|{segment}|{days}".encode())
+            stats = self._bootstrap(metric, previous, current, seed)
+            # A zero baseline gives an infinite or undefined change, which no claim can be checked against
+            if not np.isfinite(stats["observed_pct"]):
+                continue
+            low, high = stats["ci_low_pct"] - self.tolerance_pct, stats["ci_high_pct"] + self.tolerance_pct
+            supported = low <= claimed <= high
+            against = claimed * stats["observed_pct"] < 0
+            significant = low > 0 or high < 0
+            windows.append({"window_days": days, "supported": supported, "against": against, "significant": significant, **stats})
+
+        if not windows:
+            return {**result, "status": "unverifiable", "reason": "no data or no non-zero baseline in the comparison windows"}
+        # The data moved the other way in every window, significantly in one at least:
+        # no choice of period explains that away
+        opposed = all(w["against"] for w in windows) and any(w["against"] and w["significant"] for w in windows)
+        best = min(windows, key=lambda w: (not w["supported"], abs(w["observed_pct"] - claimed)))
+        status = "verified" if best.pop("supported") else "contradicted"
+        best.pop("against"), best.pop("significant")
+        if status == "contradicted":
+            # Only the configured windows are checked; a claim about another period may still hold
+            best["opposed"] = opposed
+        return {**result, "claimed_pct": claimed, "status": status, **best}
+
+    def verify(self, insights: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Checks every evidence item of every insight; results carry the insight number.
+        """
+        results = []
+        for i, insight in enumerate(insights):
+            for ev in insight.get("evidence") or []:
+                results.append({"insight": i + 1, **self.check(ev.get("metric"), ev.get("delta"), ev.get("segment"))})
+        return results
+
+def describe(result: Dict[str, Any]) -> str:
+    """
+    One-line account of a verification result, for verdicts and logs.
+    """
+    claim = f"Insight {result['insight']}: {result['metric']} {result['delta']} ({result.get('segment') or 'overall'})"
+    if result["status"] == "unverifiable":
+        return f"{claim}: unverifiable, {result['reason']}"
+    status = result["status"]
+    if status == "contradicted" and not result.get("opposed"):
+        status = "contradicted for the checked windows (may refer to another period)"
+    return (f"{claim}: {status}, observed {result['observed_pct']:+.1f}% over the last {result['window_days']} days "
+            f"vs the {result['window_days']} before (CI {result['ci_low_pct']:+.1f}% to {result['ci_high_pct']:+.1f}%)")
@@ -0,0 +1,137 @@
+"""
+Deterministic, offline stand-in for ChatGroq used by the benchmark harness and
+tests. Responses are canned per schema so that the whole pipeline (plan, data
+operations, generated code, insights, creatives, evaluation) runs without a
+network connection; `latency_seconds` simulates provider round trips.
+"""
+import asyncio
+import time
+from typing import Any, Dict, List
+from langchain_core.messages import AIMessage
+
+FAKE_MODEL_NAME = "fake-llm"
+
+CANNED_PLAN = {
+    "steps": [
+        {"step_name": "Daily metrics", "agent": "DataAgent",
+         "description": "Calculate daily ROAS, CPM, CTR, and Spend for the last 14 days."},
+        {"step_name": "Campaign change", "agent": "DataAgent",
+         "description": "Compare ROAS and CTR per campaign for the last 7 days against the previous 7 days."},
+        {"step_name": "Adset spend", "agent": "DataAgent",
+         "description": "Summarize spend, impressions and clicks for every campaign and adset."},
+        {"step_name": "Diagnose", "agent": "InsightAgent",
+         "description": "Identify which metric and campaign explain the ROAS change."},
+        {"step_name": "Creatives", "agent": "CreativeGenerator",
+         "description": "Propose new creatives for the campaigns with falling ROAS."},
+    ]
+}
+
+# Free-form instructions get this snippet; it touches every row like typical generated code
+CANNED_CODE = (
+    "result = df.groupby(['campaign_name', 'adset_name'])[['spend', 'impressions', 'clicks']]"
+    ".sum().sort_values('spend', ascending=False)"
+)
+
+CANNED_INSIGHTS = {
+    "items": [{
+        "hypothesis": "ROAS fell because CTR declined on the largest campaign while CPM held steady.",
+        "evidence": [
+            {"metric": "ctr", "delta": "-18%", "segment": "Largest campaign"},
+            {"metric": "roas", "delta": "-22%", "segment": "Largest campaign"},
+        ],
+        "impact": "High",
+        "confidence": 0.8,
+        "reasoning": "Stable CPM with falling CTR points to creative fatigue rather than auction pressure.",
+    }]
+}
+
+CANNED_CREATIVES = {
+    "recommendations": [{
+        "campaign_name": "Largest campaign",
+        "current_performance_issue": "CTR down 18% week over week",
+        "suggested_headline": "All-day comfort, zero ride-up",
+        "suggested_message": "Try the new breathable range risk-free with 30-day returns.",
+        "reasoning": "Refreshes a fatigued creative with a concrete benefit and offer.",
+    }]
+}
+
+def _text(messages: List[Any]) -> str:
+    return "\n".join(str(getattr(m, "content", m)) for m in messages)
+
+def _usage(messages: List[Any], content: str) -> Dict[str, int]:
+    input_tokens = len(_text(messages)) // 4 + 1
+    output_tokens = len(content) // 4 + 1
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+def _operation_call(instruction: str) -> Dict[str, Any]:
+    instruction = instruction.lower()
+    if "top" in instruction:
+        return {"operation": "top_n", "metrics": ["roas"], "n": 5}
+    if "daily" in instruction:
+        return {"operation": "daily_trend", "metrics": ["roas", "cpm", "ctr", "spend"], "last_n_days": 14}
+    if "previous" in instruction or "compare" in instruction:
+        return {"operation": "period_over_period", "metrics": ["roas", "ctr"], "dimensions": ["campaign_name"], "last_n_days": 7}
+    return {"operation": "free_form"}
+
+class _StructuredFake:
+    def __init__(self, llm: "FakeChatModel", schema: Any, include_raw: bool):
+        self.llm = llm
+        self.schema = schema
+        self.include_raw = include_raw
+
+    def _respond(self, messages: List[Any]) -> Any:
+        name = self.schema.__name__
+        if name == "Plan":
+            payload = CANNED_PLAN
+        elif name == "OperationCall":
+            payload = _operation_call(str(getattr(messages[-1], "content", messages[-1])))
+        elif name == "InsightOutputList":
+            payload = CANNED_INSIGHTS
+        elif name == "CreativeOutput":
+            payload = CANNED_CREATIVES
+        else:
+            raise ValueError(f"Fake LLM has no canned response for schema '{name}'.")
+        parsed = self.schema.model_validate(payload)
+        if not self.include_raw:
+            return parsed
+        raw = AIMessage(content="", usage_metadata=_usage(messages, parsed.model_dump_json()))
+        return {"raw": raw, "parsed": parsed, "parsing_error": None}
+
+    def invoke(self, messages: List[Any]) -> Any:
+        self.llm.calls += 1
+        time.sleep(self.llm.latency_seconds)
+        return self._respond(messages)
+
+    async def ainvoke(self, messages: List[Any]) -> Any:
+        self.llm.calls += 1
+        await asyncio.sleep(self.llm.latency_seconds)
+        return self._respond(messages)
+
+class FakeChatModel:
+    """
+    Minimal ChatGroq look-alike: invoke/ainvoke return an AIMessage and
+    with_structured_output returns canned, schema-valid objects.
+    """
+    def __init__(self, temperature: float = 0.0, latency_seconds: float = 0.0):
+        self.temperature = temperature
+        self.latency_seconds = latency_seconds
+        self.model_name = FAKE_MODEL_NAME
+        self.calls = 0
+
+    def _respond(self, messages: List[Any]) -> AIMessage:
+        system = str(getattr(messages[0], "content", "")) if messages else ""
+        content = f"```python\n{CANNED_CODE}\n```" if "Data Agent" in system else "PASS"
+        return AIMessage(content=content, usage_metadata=_usage(messages, content))
+
+    def invoke(self, messages: List[Any]) -> AIMessage:
+        self.calls += 1
+        time.sleep(self.latency_seconds)
+        return self._respond(messages)
+
+    async def ainvoke(self, messages: List[Any]) -> AIMessage:
+        self.calls += 1
+        await asyncio.sleep(self.latency_seconds)
+        return self._respond(messages)
+
+    def with_structured_output(self, schema: Any, include_raw: bool = False) -> _StructuredFake:
+        return _StructuredFake(self, schema, include_raw)
@@ -0,0 +1,287 @@
+import json
+import os
+import threading
+import time
+import typing
+from typing import TYPE_CHECKING, Any, List, Optional
+from pydantic import TypeAdapter, create_model
+from src.utils.config import load_config
+from src.utils.logger import logger
+from src.utils.cache import DiskCache, content_hash
+from src.utils.rate_limiter import rate_limiter, is_rate_limit_error, get_retry_after
+from src.utils import tracing, usage
+
+if TYPE_CHECKING: # LangChain is imported lazily; it dominates CLI startup time
+    from langchain_groq import ChatGroq
+
+# Load config
+config = load_config()
+
+# Rough characters-per-token ratio for Llama-family tokenizers on English/markdown text.
+CHARS_PER_TOKEN = 4
+
+def uses_fake_llm() -> bool:
+    """
+    True when agents should use the offline fake model (llm.provider: "fake" or
+    KASPARRO_FAKE_LLM=1), e.g. for benchmarks and tests without network access.
+    """
+    if os.getenv("KASPARRO_FAKE_LLM", "").lower() in ("1", "true", "yes"):
+        return True
+    return config["llm"].get("provider", "groq") == "fake"
+
+def create_llm(temperature: float) -> "ChatGroq":
+    """
+    Builds the ChatGroq client used by every agent.
+    Provider-side retries are disabled so that 429s reach the shared rate limiter
+    (and safe_execute) instead of being retried blindly inside the client.
+    """
+    if uses_fake_llm():
+        from src.utils.fake_llm import FakeChatModel
+        latency = float(os.getenv("KASPARRO_FAKE_LLM_LATENCY", config["llm"].get("fake_latency_seconds", 0.0)))
+        return FakeChatModel(temperature=temperature, latency_seconds=latency)
+
+    from langchain_groq import ChatGroq
+
+    return ChatGroq(
+        model=config["llm"]["model"],
+        temperature=temperature,
+        groq_api_key=os.getenv("GROQ_API_KEY"),
+        max_retries=0
+    )
+
+# Global response cache shared by every agent in this process
+llm_cache = DiskCache.from_settings(config.get("cache", {}).get("llm", {}), ".cache/llm_cache.sqlite", "llm_cache")
+
+def _schema_id(schema: Any) -> str:
+    if schema is None:
+        return "text"
+    return json.dumps(TypeAdapter(schema).json_schema(), sort_keys=True)
+
+def _cache_key(llm: "ChatGroq", messages: List[Any], schema: Any) -> Optional[str]:
+    """
+    Content-addressed key over everything that determines the response. Returns None
+    for calls that should not be cached (cache disabled or sampling temperature).
+    """
+    temperature = getattr(llm, "temperature", None)
+    max_temperature = config.get("cache", {}).get("llm", {}).get("max_temperature", 0.0)
+    if llm_cache is None or temperature is None or temperature > max_temperature:
+        return None
+    return content_hash({
+        "model": getattr(llm, "model_name", None),
+        "temperature": temperature,
+        "messages": [[getattr(m, "type", ""), str(getattr(m, "content", m))] for m in messages],
+        "schema": _schema_id(schema)
+    })
+
+def _cache_load(key: Optional[str], schema: Any) -> Any:
+    if key is None:
+        return None
+    cached = llm_cache.get(key)
+    if cached is None:
+        return None
+    try:
+        if schema is None:
+            from langchain_core.messages import AIMessage
+            return AIMessage(content=cached)
+        return TypeAdapter(schema).validate_json(cached)
+    except Exception as e:
+        logger.warning(f"Discarding unreadable LLM cache entry: {e}")
+        return None
+
+def _cache_store(key: Optional[str], schema: Any, result: Any):
+    if key is None:
+        return
+    if schema is None:
+        value = str(result.content)
+    else:
+        value = TypeAdapter(schema).dump_json(result).decode("utf-8")
+    llm_cache.set(key, value)
+
+def estimate_tokens(messages: List[Any]) -> int:
+    """
+    Cheap prompt size estimate used to reserve tokens/min capacity before a call.
+    """
+    chars = sum(len(str(getattr(m, "content", m))) for m in messages)
+    return chars // CHARS_PER_TOKEN + 1
+
+class PromptStats:
+    """
+    Running totals of the (estimated) prompt tokens actually sent to the provider.
+    """
+    def __init__(self):
+        self.calls = 0
+        self.tokens = 0
+        self.max_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, tokens: int):
+        with self._lock:
+            self.calls += 1
+            self.tokens += tokens
+            self.max_tokens = max(self.max_tokens, tokens)
+        logger.debug(f"LLM prompt: ~{tokens} tokens", extra={"metrics": {"prompt_tokens": tokens}})
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "prompt_tokens": self.tokens, "max_prompt_tokens": self.max_tokens}
+
+prompt_stats = PromptStats()
+
+def _structured_runnable(llm: "ChatGroq", schema: Any):
+    """
+    Returns (runnable, unwrap) for a structured-output call. List schemas such as
+    List[InsightOutput] are wrapped in a container model, since tool calling needs
+    an object at the top level.
+    """
+    if typing.get_origin(schema) in (list, List):
+        (item_type,) = typing.get_args(schema)
+        container = create_model(f"{item_type.__name__}List", items=(List[item_type], ...))
+        return llm.with_structured_output(container, include_raw=True), lambda parsed: parsed.items
+    return llm.with_structured_output(schema, include_raw=True), lambda parsed: parsed
+
+def _completion_allowance() -> int:
+    return config.get("rate_limit", {}).get("completion_tokens_estimate", 512)
+
+def _usage_tokens(message: Any) -> Optional[int]:
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        return usage.get("total_tokens")
+    return None
+
+def _unpack(response: Any, unwrap):
+    if isinstance(response, dict) and "raw" in response:
+        if response.get("parsing_error"):
+            raise response["parsing_error"]
+        if response.get("parsed") is None:
+            raise ValueError("LLM returned no structured output.")
+        return response["raw"], unwrap(response["parsed"])
+    return response, response
+
+def _on_error(e: Exception):
+    if is_rate_limit_error(e):
+        rate_limiter.on_rate_limited(get_retry_after(e))
+
+def _llm_span(llm: "ChatGroq", schema: Any):
+    if schema is None:
+        name = "text"
+    elif typing.get_origin(schema) in (list, List):
+        name = f"List[{typing.get_args(schema)[0].__name__}]"
+    else:
+        name = getattr(schema, "__name__", str(schema))
+    return tracing.span(f"llm {name}", kind="llm", model=getattr(llm, "model_name", None), schema=name)
+
+def _trace_usage(span: Any, message: Any):
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        span.set(prompt_tokens=usage.get("input_tokens"), completion_tokens=usage.get("output_tokens"))
+
+def _settle(ledger: Any, labels: dict, prompt_tokens: int, message: Any, result: Any):
+    reported = getattr(message, "usage_metadata", None) or {}
+    completion = reported.get("output_tokens")
+    if completion is None:
+        completion = len(str(getattr(message, "content", "") or result)) // CHARS_PER_TOKEN + 1
+    ledger.record(labels, reported.get("input_tokens") or prompt_tokens, completion)
+
+class _Call:
+    """
+    Bookkeeping for one LLM call that missed the cache, shared by invoke_llm and
+    ainvoke_llm so that only the provider call itself differs between them.
+    """
+    def __init__(self, llm: "ChatGroq", messages: List[Any], schema: Any, key: Optional[str], ledger: Any, span: Any):
+        self.schema = schema
+        self.key = key
+        self.ledger = ledger
+        self.span = span
+        self.runnable, self.unwrap = _structured_runnable(llm, schema) if schema is not None else (llm, None)
+        self.prompt_tokens = estimate_tokens(messages)
+        self.estimated = self.prompt_tokens + _completion_allowance()
+        self.labels = ledger.reserve(self.estimated)
+        prompt_stats.record(self.prompt_tokens)
+        self._queued = time.perf_counter()
+
+    def admitted(self):
+        self.span.set(prompt_tokens_estimate=self.prompt_tokens, rate_limit_wait_ms=round((time.perf_counter() - self._queued) * 1000, 3))
+
+    def not_admitted(self):
+        self.ledger.record(self.labels, 0, 0, ok=False)
+
+    def failed(self, e: Exception):
+        _on_error(e)
+        # The prompt was sent; count it even though the call failed
+        self.ledger.record(self.labels, self.prompt_tokens, 0, ok=False)
+
+    def finish(self, response: Any) -> Any:
+        """
+        Parses the response and records its usage; raises (after failed()) if the
+        structured output is missing or invalid.
+        """
+        try:
+            raw, result = _unpack(response, self.unwrap)
+        except Exception as e:
+            self.failed(e)
+            raise
+        rate_limiter.on_success()
+        _trace_usage(self.span, raw)
+        _settle(self.ledger, self.labels, self.prompt_tokens, raw, result)
+        rate_limiter.record_usage(self.estimated, _usage_tokens(raw))
+        _cache_store(self.key, self.schema, result)
+        return result
+
+def _prepare(llm: "ChatGroq", messages: List[Any], schema: Any, span: Any):
+    """
+    (cached result, None) on a cache hit, else (None, _Call) with tokens reserved.
+    """
+    key = _cache_key(llm, messages, schema)
+    cached = _cache_load(key, schema)
+    ledger = usage.current_ledger()
+    if cached is not None:
+        logger.debug("LLM cache hit.")
+        span.set(cache="hit")
+        ledger.record_cached()
+        return cached, None
+    span.set(cache="miss" if key is not None else "off")
+    return None, _Call(llm, messages, schema, key, ledger, span)
+
+def invoke_llm(llm: "ChatGroq", messages: List[Any], schema: Any = None) -> Any:
+    """
+    Single entry point for synchronous LLM calls. Reserves rate limiter capacity,
+    feeds provider 429s back into the limiter and returns either the AIMessage or,
+    when `schema` is given, the parsed structured output. Deterministic calls are
+    served from the on-disk response cache when possible.
+    """
+    with _llm_span(llm, schema) as span:
+        cached, call = _prepare(llm, messages, schema, span)
+        if call is None:
+            return cached
+        try:
+            rate_limiter.acquire(call.estimated)
+        except BaseException:
+            call.not_admitted()
+            raise
+        call.admitted()
+        try:
+            response = call.runnable.invoke(messages)
+        except Exception as e:
+            call.failed(e)
+            raise
+        return call.finish(response)
+
+async def ainvoke_llm(llm: "ChatGroq", messages: List[Any], schema: Any = None) -> Any:
+    """
+    Async variant of invoke_llm().
+    """
+    with _llm_span(llm, schema) as span:
+        cached, call = _prepare(llm, messages, schema, span)
+        if call is None:
+            return cached
+        try:
+            await rate_limiter.aacquire(call.estimated)
+        except BaseException:
+            call.not_admitted()
+            raise
+        call.admitted()
+        try:
+            response = await call.runnable.ainvoke(messages)
+        except Exception as e:
+            call.failed(e)
+            raise
+        return call.finish(response)
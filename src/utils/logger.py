@@ -1,9 +1,45 @@
+import atexit
 import logging
+import logging.handlers
+import queue
+import reprlib
 import sys
 import json
 import os
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError: # listed in requirements.txt; without it the standard library encoder is used
+    orjson = None
+
+# Longest decision summary written to the log (characters)
+DECISION_SUMMARY_CHARS = 200
+# Records buffered for the background writer; beyond this new records are dropped and counted
+LOG_QUEUE_SIZE = 10000
+
+def _dumps(record: dict) -> str:
+    if orjson is not None:
+        return orjson.dumps(record, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode("utf-8")
+    return json.dumps(record, default=str)
+
+def summarize_payload(value, limit: int = DECISION_SUMMARY_CHARS) -> str:
+    """
+    Bounded text for a decision payload. Callables are evaluated first, so callers
+    can defer building a summary; DataFrames and Series only render their first rows.
+    """
+    if callable(value):
+        value = value()
+    if isinstance(value, str):
+        text = value
+    elif hasattr(value, "head") and hasattr(value, "shape"):
+        text = f"{type(value).__name__} {value.shape}: {value.head(5).to_string()}"
+    else:
+        bounded = reprlib.Repr()
+        bounded.maxstring = bounded.maxother = limit
+        text = bounded.repr(value)
+    return text[:limit] + "..." if len(text) > limit else text
+
 class JsonFormatter(logging.Formatter):
     """
     Formatter that outputs JSON strings after parsing the LogRecord.
@@ -19,42 +55,74 @@ class JsonFormatter(logging.Formatter):
         }
         if hasattr(record, "decision_data"):
             log_record["decision"] = record.decision_data
+        if hasattr(record, "metrics"):
+            log_record["metrics"] = record.metrics
             
         if record.exc_info:
             log_record["exception"] = self.formatException(record.exc_info)
-        return json.dumps(log_record)
+        elif record.exc_text:
+            log_record["exception"] = record.exc_text
+        return _dumps(log_record)
 
 class LoggerWrapper(logging.Logger):
-    def decision(self, agent_name: str, input_data: str, output_data: str, reason: str):
+    def decision(self, agent_name: str, input_data, output_data, reason: str):
         """
-        Log a decision made by an agent.
+        Log a decision made by an agent. Payloads may be any object (or a
+        zero-argument callable); they are only rendered, and only up to
+        DECISION_SUMMARY_CHARS, when INFO records are actually emitted.
         """
+        if not self.isEnabledFor(logging.INFO):
+            return
         decision_data = {
             "agent": agent_name,
-            "input_summary": input_data[:200] + "..." if len(input_data) > 200 else input_data,
-            "output_summary": output_data[:200] + "..." if len(output_data) > 200 else output_data,
+            "input_summary": summarize_payload(input_data),
+            "output_summary": summarize_payload(output_data),
             "reason": reason
         }
         self._log(logging.INFO, f"Decision by {agent_name}: {reason}", (), extra={"decision_data": decision_data})
 
 logging.setLoggerClass(LoggerWrapper)
 
-def setup_logger(name="kasparro_app", log_dir="logs"):
+class BufferedQueueHandler(logging.handlers.QueueHandler):
     """
-    Sets up a logger with console (INFO) and file (DEBUG/JSON) handlers.
-    Creates a unique run folder.
+    Hands records to a background QueueListener. Only the message and traceback
+    text are rendered on the calling thread; JSON encoding and file I/O happen on
+    the listener thread. When the queue is full the record is dropped and counted
+    instead of blocking the caller.
+    """
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        # Copy so handlers that run later on this thread see the original record
+        prepared = logging.makeLogRecord(record.__dict__)
+        prepared.msg = record.message
+        prepared.args = None
+        prepared.exc_info = None
+        return prepared
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def setup_logger(name="kasparro_app"):
+    """
+    Sets up a logger with a console (INFO) handler. The JSON file handler is only
+    attached once a run starts (see start_run), so importing this module has no
+    filesystem side effects.
     """
-    # Create a unique run folder based on timestamp
-    run_id = datetime.now().strftime("run_%Y%m%d_%H%M%S")
-    run_dir = os.path.join(log_dir, run_id)
-    os.makedirs(run_dir, exist_ok=True)
-    
     logger = logging.getLogger(name)
     logger.setLevel(logging.DEBUG)
     
     # Prevent adding handlers multiple times
     if logger.hasHandlers():
-        return logger, run_dir
+        return logger
 
     # Console Handler - Human readable
     console_handler = logging.StreamHandler(sys.stdout)
@@ -63,15 +131,60 @@ def setup_logger(name="kasparro_app", log_dir="logs"):
     console_handler.setFormatter(console_formatter)
     logger.addHandler(console_handler)
 
+    return logger
+
+def start_run(log_dir="logs", queue_size=LOG_QUEUE_SIZE):
+    """
+    Creates a unique run folder and attaches the file handler (DEBUG/JSON) behind
+    a queue, so records are encoded and written by a background thread.
+    Idempotent: later calls return the folder of the run already in progress.
+    """
+    global current_run_dir, _listener, _queue_handler
+    if current_run_dir is not None:
+        return current_run_dir
+
+    # Create a unique run folder based on timestamp
+    run_id = datetime.now().strftime("run_%Y%m%d_%H%M%S")
+    run_dir = os.path.join(log_dir, run_id)
+    os.makedirs(run_dir, exist_ok=True)
+
     # File Handler - Machine readable (JSON)
     log_file = os.path.join(run_dir, "app.json")
     file_handler = logging.FileHandler(log_file)
     file_handler.setLevel(logging.DEBUG)
     file_handler.setFormatter(JsonFormatter())
-    logger.addHandler(file_handler)
 
-    return logger, run_dir
+    log_queue = queue.Queue(maxsize=queue_size)
+    _queue_handler = BufferedQueueHandler(log_queue)
+    _queue_handler.setLevel(logging.DEBUG)
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _listener.start()
+    logger.addHandler(_queue_handler)
+    atexit.register(stop_run)
+
+    current_run_dir = run_dir
+    return run_dir
+
+def stop_run():
+    """
+    Flushes queued records to the run's log file and detaches it. Safe to call
+    more than once; registered with atexit by start_run.
+    """
+    global current_run_dir, _listener, _queue_handler
+    if _listener is None:
+        return
+    logger.removeHandler(_queue_handler)
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    if _queue_handler.dropped:
+        logger.warning(f"Log queue was full; {_queue_handler.dropped} records were not written to {current_run_dir}.")
+    _listener = None
+    _queue_handler = None
+    current_run_dir = None
 
-# Global logger instance
-# Note: We might need to re-initialize this in run.py to get the run_dir
-logger, current_run_dir = setup_logger()
+# Global logger instance; current_run_dir is set by start_run()
+logger = setup_logger()
+current_run_dir = None
+_listener = None
+_queue_handler = None
@@ -0,0 +1,116 @@
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+import pandas as pd
+from src.utils.logger import logger
+from src.utils.streaming import MEASURES, add_ratio_metrics
+
+# Breakdown dimensions the cube pre-aggregates over (those present in the frame are used)
+DIMENSIONS = ["campaign_name", "adset_name", "creative_type", "audience_type", "platform", "country"]
+
+class MetricCube:
+    """
+    Pre-aggregated sums of the additive measures (spend, impressions, clicks,
+    purchases, revenue) by every breakdown dimension and date.
+
+    The base cuboid is built once at load time at the finest dimension x date grain.
+    The overall and single-dimension daily rollups are precomputed from it; any other
+    combination is rolled up from the base on first use and memoized. Ratio metrics
+    are always derived from the summed components, so e.g. campaign ROAS is
+    sum(revenue) / sum(spend) rather than an average of row-level ROAS.
+    """
+    def __init__(self, df: pd.DataFrame, dimensions: Optional[List[str]] = None):
+        self.dimensions = [d for d in (dimensions or DIMENSIONS) if d in df.columns]
+        if "revenue" not in df.columns and "roas" in df.columns:
+            df = df.assign(revenue=df["roas"] * df["spend"])
+        self.measures = [m for m in MEASURES if m in df.columns]
+
+        self.base = df.groupby(self.dimensions + ["date"], observed=True, dropna=False)[self.measures].sum()
+        self.date_min = df["date"].min()
+        self.date_max = df["date"].max()
+        self._rollups: Dict[Tuple[Tuple[str, ...], bool], pd.DataFrame] = {}
+        self._selections: Dict[tuple, pd.DataFrame] = {}
+
+        for dims in [()] + [(d,) for d in self.dimensions]:
+            self._rollup(dims, by_date=True)
+        logger.debug(f"Built metric cube over {self.dimensions} with {len(self.base)} base cells.")
+
+    def _canonical(self, dimensions: Union[str, Iterable[str], None]) -> Tuple[str, ...]:
+        if dimensions is None:
+            return ()
+        if isinstance(dimensions, str):
+            dimensions = [dimensions]
+        unknown = [d for d in dimensions if d not in self.dimensions]
+        if unknown:
+            raise ValueError(f"Unknown cube dimensions {unknown}. Available: {self.dimensions}")
+        # Canonical order so that ("a", "b") and ("b", "a") share one rollup
+        return tuple(d for d in self.dimensions if d in dimensions)
+
+    def _rollup(self, dims: Tuple[str, ...], by_date: bool) -> pd.DataFrame:
+        key = (dims, by_date)
+        if key not in self._rollups:
+            levels = list(dims) + (["date"] if by_date else [])
+            if levels:
+                rollup = self.base.groupby(level=levels, observed=True, dropna=False).sum()
+            else:
+                rollup = self.base.sum().to_frame().T
+            self._rollups[key] = add_ratio_metrics(rollup)
+        return self._rollups[key]
+
+    def query(
+        self,
+        dimensions: Union[str, Iterable[str], None] = None,
+        metrics: Optional[List[str]] = None,
+        by_date: bool = True,
+        start: Optional[Union[str, pd.Timestamp]] = None,
+        end: Optional[Union[str, pd.Timestamp]] = None,
+        filters: Optional[Dict[str, Union[str, List[str]]]] = None
+    ) -> pd.DataFrame:
+        """
+        Returns summed measures and derived ratios broken down by `dimensions`.
+
+        Args:
+            dimensions: Breakdown column(s), e.g. "campaign_name" or ["creative_type", "audience_type"].
+            metrics: Columns to return (measures and/or roas, ctr, cpm, cpc). Defaults to all.
+            by_date: Keep a daily breakdown; if False, totals over the selected date range.
+            start, end: Inclusive date range.
+            filters: Dimension values to keep, e.g. {"platform": "Instagram"}.
+        """
+        dims = self._canonical(dimensions)
+        filter_dims = self._canonical(list(filters)) if filters else ()
+        needs_range = start is not None or end is not None
+
+        if not needs_range and not filter_dims:
+            # Plain breakdowns are answered from memoized selections, which is what the
+            # repeated daily/segment queries in a plan hit.
+            key = (dims, by_date, tuple(metrics or ()))
+            if key not in self._selections:
+                self._selections[key] = self._select(self._rollup(dims, by_date), metrics)
+            return self._selections[key].copy(deep=False)
+
+        # Filter at the finer grain, then roll up the selection
+        grain = tuple(d for d in self.dimensions if d in dims or d in filter_dims)
+        frame = self._rollup(grain, by_date=True)[self.measures]
+        mask = pd.Series(True, index=frame.index)
+        dates = frame.index.get_level_values("date")
+        if start is not None:
+            mask &= dates >= pd.Timestamp(start)
+        if end is not None:
+            mask &= dates <= pd.Timestamp(end)
+        for dim, values in (filters or {}).items():
+            values = [values] if isinstance(values, str) else list(values)
+            mask &= frame.index.get_level_values(dim).isin(values)
+        frame = frame[mask.to_numpy()]
+        levels = list(dims) + (["date"] if by_date else [])
+        if levels:
+            frame = frame.groupby(level=levels, observed=True, dropna=False).sum()
+        else:
+            frame = frame.sum().to_frame().T
+        return self._select(add_ratio_metrics(frame), metrics)
+
+    def _select(self, frame: pd.DataFrame, metrics: Optional[List[str]]) -> pd.DataFrame:
+        if not metrics:
+            # Shallow copy so callers cannot add columns to the memoized rollups
+            return frame.copy(deep=False)
+        unknown = [m for m in metrics if m not in frame.columns]
+        if unknown:
+            raise ValueError(f"Unknown cube metrics {unknown}. Available: {list(frame.columns)}")
+        return frame[metrics]
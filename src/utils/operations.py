@@ -0,0 +1,117 @@
+from typing import Callable, Dict, List, Optional, Tuple
+import pandas as pd
+from src.schema import OperationCall
+from src.utils.metric_cube import MetricCube
+from src.utils.streaming import MEASURES, add_ratio_metrics
+
+# Columns that identify an individual ad when ranking outside the cube's dimensions
+AD_IDENTITY = ["campaign_name", "adset_name", "creative_type", "creative_message"]
+
+def _check_metrics(cube: MetricCube, metrics: List[str], minimum: int = 1) -> List[str]:
+    available = cube.measures + ["roas", "ctr", "cpm", "cpc"]
+    unknown = [m for m in metrics if m not in available]
+    if unknown:
+        raise ValueError(f"Unknown metrics {unknown}. Available: {available}")
+    if len(metrics) < minimum:
+        raise ValueError(f"Operation needs at least {minimum} metric(s).")
+    return metrics
+
+def _date_range(cube: MetricCube, call: OperationCall) -> Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+    if call.last_n_days:
+        return cube.date_max - pd.Timedelta(days=call.last_n_days - 1), cube.date_max
+    start = pd.Timestamp(call.start) if call.start else None
+    end = pd.Timestamp(call.end) if call.end else None
+    return start, end
+
+def period_over_period(cube: MetricCube, df: pd.DataFrame, call: OperationCall) -> pd.DataFrame:
+    """
+    Compares the last `last_n_days` (default 7) against the same-length period before
+    it, per segment. Segments with the largest drop in the first metric come first.
+    """
+    metrics = _check_metrics(cube, call.metrics)
+    days = call.last_n_days or 7
+    current_end = pd.Timestamp(call.end) if call.end else cube.date_max
+    current_start = current_end - pd.Timedelta(days=days - 1)
+    previous_end = current_start - pd.Timedelta(days=1)
+    previous_start = previous_end - pd.Timedelta(days=days - 1)
+
+    current = cube.query(call.dimensions, metrics=metrics, by_date=False, start=current_start, end=current_end)
+    previous = cube.query(call.dimensions, metrics=metrics, by_date=False, start=previous_start, end=previous_end)
+    result = previous.add_suffix("_previous").join(current.add_suffix("_current"), how="outer")
+    for metric in metrics:
+        base = result[f"{metric}_previous"]
+        result[f"{metric}_change_pct"] = ((result[f"{metric}_current"] - base) / base.where(base != 0) * 100).round(2)
+    result.attrs["periods"] = f"{previous_start.date()}..{previous_end.date()} vs {current_start.date()}..{current_end.date()}"
+    return result.sort_values(f"{metrics[0]}_change_pct")
+
+def top_n(cube: MetricCube, df: pd.DataFrame, call: OperationCall) -> pd.DataFrame:
+    """
+    Ranks segments (or individual ads, by default) by the first metric.
+    Ratios are computed from summed components within each segment.
+    """
+    metrics = _check_metrics(cube, call.metrics)
+    start, end = _date_range(cube, call)
+    dimensions = call.dimensions or [c for c in AD_IDENTITY if c in df.columns]
+
+    if all(d in cube.dimensions for d in dimensions):
+        frame = cube.query(dimensions, by_date=False, start=start, end=end)
+    else:
+        # Outside the cube (e.g. per creative message): aggregate the raw rows once
+        rows = df
+        if start is not None:
+            rows = rows[rows["date"] >= start]
+        if end is not None:
+            rows = rows[rows["date"] <= end]
+        if "revenue" not in rows.columns and "roas" in rows.columns:
+            rows = rows.assign(revenue=rows["roas"] * rows["spend"])
+        measures = [m for m in MEASURES if m in rows.columns]
+        frame = add_ratio_metrics(rows.groupby(dimensions, observed=True, dropna=False)[measures].sum())
+
+    columns = list(dict.fromkeys(metrics + ["spend"]))
+    return frame.sort_values(metrics[0], ascending=call.ascending).head(call.n or 5)[columns]
+
+def daily_trend(cube: MetricCube, df: pd.DataFrame, call: OperationCall) -> pd.DataFrame:
+    """
+    Daily values of the requested metrics, optionally per segment.
+    """
+    metrics = _check_metrics(cube, call.metrics)
+    start, end = _date_range(cube, call)
+    return cube.query(call.dimensions, metrics=metrics, by_date=True, start=start, end=end)
+
+def segment_breakdown(cube: MetricCube, df: pd.DataFrame, call: OperationCall) -> pd.DataFrame:
+    """
+    Totals of the requested metrics per segment over the selected date range.
+    """
+    metrics = _check_metrics(cube, call.metrics)
+    if not call.dimensions:
+        raise ValueError("segment_breakdown needs at least one dimension.")
+    start, end = _date_range(cube, call)
+    result = cube.query(call.dimensions, metrics=metrics, by_date=False, start=start, end=end)
+    return result.sort_values(metrics[0], ascending=call.ascending)
+
+def correlation(cube: MetricCube, df: pd.DataFrame, call: OperationCall) -> pd.DataFrame:
+    """
+    Pearson correlation between the daily series of the requested metrics
+    (pooled over segments when dimensions are given).
+    """
+    metrics = _check_metrics(cube, call.metrics, minimum=2)
+    start, end = _date_range(cube, call)
+    daily = cube.query(call.dimensions, metrics=metrics, by_date=True, start=start, end=end)
+    return daily.corr().round(3)
+
+OPERATIONS: Dict[str, Callable[[MetricCube, pd.DataFrame, OperationCall], pd.DataFrame]] = {
+    "period_over_period": period_over_period,
+    "top_n": top_n,
+    "daily_trend": daily_trend,
+    "segment_breakdown": segment_breakdown,
+    "correlation": correlation,
+}
+
+def run_operation(call: OperationCall, cube: MetricCube, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Dispatches a structured operation call. Raises ValueError for free-form requests
+    and for arguments the operation cannot serve, so the caller can fall back to codegen.
+    """
+    if call.operation not in OPERATIONS:
+        raise ValueError(f"No catalog operation for '{call.operation}'.")
+    return OPERATIONS[call.operation](cube, df, call)
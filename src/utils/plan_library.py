@@ -0,0 +1,209 @@
+"""
+Library of validated plans, reused for queries of a known shape.
+
+Queries are turned into templates by replacing entities with slots: quoted names
+and "campaign <Name>" become {campaign}, ISO dates become {date}, "last N days"
+becomes {days}. Plans are stored with the same values replaced by slots in their
+step names and descriptions. A new query whose template has the same slots and is
+lexically close enough to a stored one (token Jaccard and sequence similarity on
+normalized tokens) gets the stored plan with its own values filled in, without a
+planner LLM call. Metric names and the direction of change decide which analysis
+a plan runs, so they must match exactly; similarity is only scored after that. Plans are learned from runs whose evaluation passed; an entry
+that fails more often than it passes is no longer served.
+"""
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional, Tuple
+from src.utils.config import load_config
+from src.utils.logger import logger
+
+config = load_config()
+
+DATE = re.compile(r"\b\d{4}-\d{2}-\d{2}\b")
+DAYS = re.compile(r"\b(last|past|previous)\s+(\d+)\s+(days?)\b", re.IGNORECASE)
+QUOTED = re.compile(r"[\"']([^\"']{2,})[\"']")
+# A campaign name written after "campaign": capitalized or numbered words
+CAMPAIGN = re.compile(r"\bcampaign\s+((?:[A-Z0-9][\w&-]*)(?:\s+[A-Z0-9][\w&-]*)*)")
+SLOT = re.compile(r"\{(\w+)\}")
+
+STOPWORDS = {"a", "an", "the", "for", "of", "in", "on", "to", "and", "is", "are", "was", "were", "did", "do", "does",
+             "me", "my", "our", "please", "what", "why", "how", "show", "tell", "with", "by", "from", "this", "that"}
+SYNONYMS = {"fell": "drop", "fall": "drop", "falling": "drop", "dropped": "drop", "drops": "drop", "decline": "drop",
+            "declined": "drop", "decrease": "drop", "decreased": "drop", "down": "drop", "analyse": "analyze",
+            "analysis": "analyze", "explain": "analyze", "investigate": "analyze", "campaigns": "campaign",
+            "rose": "increase", "rise": "increase", "increased": "increase", "up": "increase", "grew": "increase",
+            "growth": "increase", "improved": "increase", "higher": "increase", "spike": "increase", "lower": "drop",
+            "worse": "drop", "metrics": "metric"}
+METRIC_TERMS = {"roas", "ctr", "cpm", "cpc", "cpa", "cvr", "spend", "revenue", "impressions", "clicks", "purchases", "conversions"}
+DIRECTION_TERMS = {"drop", "increase"}
+
+def templatize(query: str, known_values: Optional[List[str]] = None) -> Tuple[str, Dict[str, str]]:
+    """
+    Replaces entities in `query` with slots and returns (template, slot values).
+    `known_values` (e.g. campaign names from the dataset) are matched first.
+    """
+    slots: Dict[str, str] = {}
+
+    def add(kind: str, value: str) -> str:
+        name = kind if kind not in slots else f"{kind}_{sum(k.startswith(kind) for k in slots) + 1}"
+        slots[name] = value
+        return "{" + name + "}"
+
+    template = query
+    for value in sorted(known_values or [], key=len, reverse=True):
+        pattern = re.compile(rf"(?<![\w{{]){re.escape(value)}(?!\w)", re.IGNORECASE)
+        if pattern.search(template):
+            template = pattern.sub(lambda m: add("campaign", m.group(0)), template, count=1)
+    template = QUOTED.sub(lambda m: add("campaign", m.group(1)), template)
+    template = CAMPAIGN.sub(lambda m: "campaign " + add("campaign", m.group(1)), template)
+    template = DATE.sub(lambda m: add("date", m.group(0)), template)
+    template = DAYS.sub(lambda m: f"{m.group(1)} {add('days', m.group(2))} {m.group(3)}", template)
+    return template, slots
+
+def normalize(template: str) -> List[str]:
+    tokens = re.findall(r"\{\w+\}|[a-z0-9]+", template.lower())
+    return [SYNONYMS.get(t, t) for t in tokens if t not in STOPWORDS]
+
+def key_terms(tokens: List[str]) -> List[str]:
+    """
+    Metric and direction terms of a normalized query; a stored plan is only reused
+    for a query with exactly the same ones.
+    """
+    return sorted(set(tokens) & (METRIC_TERMS | DIRECTION_TERMS))
+
+def similarity(a: List[str], b: List[str]) -> float:
+    """
+    Mean of token-set Jaccard and sequence similarity, in [0, 1].
+    """
+    if not a or not b:
+        return 0.0
+    jaccard = len(set(a) & set(b)) / len(set(a) | set(b))
+    return (jaccard + SequenceMatcher(None, a, b).ratio()) / 2
+
+def _abstract(text: str, slots: Dict[str, str]) -> str:
+    # Longest values first, so "Summer Sale 2" is not half-replaced by "Summer Sale"
+    for name, value in sorted(slots.items(), key=lambda item: -len(item[1])):
+        if name.startswith("days"):
+            text = re.sub(rf"\b{re.escape(value)}(\s+days?)\b", "{" + name + r"}\1", text, flags=re.IGNORECASE)
+        else:
+            text = re.sub(rf"(?<!\w){re.escape(value)}(?!\w)", "{" + name + "}", text, flags=re.IGNORECASE)
+    return text
+
+def _fill(text: str, slots: Dict[str, str]) -> str:
+    return SLOT.sub(lambda m: slots.get(m.group(1), m.group(0)), text)
+
+class PlanLibrary:
+    """
+    Plan templates in a JSON file, shared by the queries of a process. `entities`
+    are names known to occur in queries (the dataset's campaigns), slotted even
+    when a query does not quote them.
+    """
+    def __init__(self, path: str, threshold: float = 0.8, max_entries: int = 200):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls) -> Optional["PlanLibrary"]:
+        settings = config.get("cache", {}).get("plan_library", {})
+        if not settings.get("enabled", True):
+            return None
+        return cls(settings.get("path", ".cache/plan_library.json"), settings.get("min_similarity", 0.8), settings.get("max_entries", 200))
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        # Caller holds the lock; read lazily so that importing has no filesystem side effects
+        if self._entries is None:
+            try:
+                with open(self.path, "r") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._entries, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not write plan library {self.path}: {e}")
+
+    def match(self, query: str, entities: Optional[List[str]] = None) -> Optional[Tuple[Dict[str, Any], str, float]]:
+        """
+        (plan with this query's values filled in, entry id, similarity) for the best
+        stored template above the threshold, or None.
+        """
+        template, slots = templatize(query, entities)
+        tokens = normalize(template)
+        terms = key_terms(tokens)
+        best = None
+        with self._lock:
+            for entry_id, entry in self._load().items():
+                if entry["failures"] > entry["successes"] or sorted(entry["slots"]) != sorted(slots):
+                    continue
+                if key_terms(entry["tokens"]) != terms:
+                    continue
+                score = similarity(tokens, entry["tokens"])
+                if score >= self.threshold and (best is None or score > best[2]):
+                    best = (entry, entry_id, score)
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry, entry_id, score = best
+            plan = {"steps": [{key: _fill(value, slots) if isinstance(value, str) else value for key, value in step.items()}
+                              for step in entry["plan"]["steps"]]}
+        return plan, entry_id, round(score, 3)
+
+    def learn(self, query: str, plan: Dict[str, Any], entities: Optional[List[str]] = None):
+        """
+        Stores the plan of a successful run under the query's template, or counts
+        another success for an existing entry with the same template.
+        """
+        template, slots = templatize(query, entities)
+        abstract = {"steps": [{key: _abstract(value, slots) if isinstance(value, str) else value for key, value in step.items()}
+                              for step in plan["steps"]]}
+        with self._lock:
+            entries = self._load()
+            entry = next((e for e in entries.values() if e["template"] == template), None)
+            if entry is None:
+                entry = {"template": template, "tokens": normalize(template), "slots": sorted(slots), "plan": abstract,
+                         "source_queries": [], "successes": 0, "failures": 0, "created_at": time.time()}
+                entries[uuid.uuid4().hex[:12]] = entry
+                logger.info(f"📚 Learned plan template: {template}")
+            entry["successes"] += 1
+            entry["last_used"] = time.time()
+            if query not in entry["source_queries"]:
+                entry["source_queries"] = (entry["source_queries"] + [query])[-10:]
+            if len(entries) > self.max_entries:
+                # Least recently used templates go first
+                for stale in sorted(entries, key=lambda k: entries[k].get("last_used", 0))[:len(entries) - self.max_entries]:
+                    del entries[stale]
+            self._save()
+
+    def record(self, entry_id: str, query: str, passed: bool):
+        """
+        Counts the outcome of a run that reused entry `entry_id`.
+        """
+        with self._lock:
+            entry = self._load().get(entry_id)
+            if entry is None:
+                return
+            entry["successes" if passed else "failures"] += 1
+            entry["last_used"] = time.time()
+            if passed and query not in entry["source_queries"]:
+                entry["source_queries"] = (entry["source_queries"] + [query])[-10:]
+            self._save()
+
+plan_library = PlanLibrary.from_config()
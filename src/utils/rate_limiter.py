@@ -0,0 +1,193 @@
+import asyncio
+import random
+import re
+import threading
+import time
+from typing import Optional
+from src.utils.config import load_config
+from src.utils.logger import logger
+
+# Load config
+config = load_config()
+
+class TokenBucketRateLimiter:
+    """
+    Process-wide rate limiter with two token buckets: requests/min and tokens/min.
+
+    Every LLM call reserves one request plus its estimated token count before it is
+    sent. Buckets refill continuously, so callers run at the configured quota ceiling
+    instead of sleeping for a fixed interval. On a 429 the limiter pauses all callers
+    until the provider's retry-after has elapsed and halves its effective rate, then
+    recovers additively with each successful call.
+    """
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        min_rate_fraction: float = 0.25,
+        recovery_step: float = 0.05,
+        default_retry_after: float = 2.0
+    ):
+        self.requests_per_minute = float(requests_per_minute)
+        self.tokens_per_minute = float(tokens_per_minute)
+        self.min_rate_fraction = min_rate_fraction
+        self.recovery_step = recovery_step
+        self.default_retry_after = default_retry_after
+
+        self._lock = threading.Lock()
+        self._rate_scale = 1.0
+        self._request_tokens = self.requests_per_minute
+        self._llm_tokens = self.tokens_per_minute
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+
+    @property
+    def rate_scale(self) -> float:
+        return self._rate_scale
+
+    def _refill(self, now: float):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        request_capacity = self.requests_per_minute * self._rate_scale
+        token_capacity = self.tokens_per_minute * self._rate_scale
+        self._request_tokens = min(request_capacity, self._request_tokens + elapsed * request_capacity / 60.0)
+        self._llm_tokens = min(token_capacity, self._llm_tokens + elapsed * token_capacity / 60.0)
+
+    def _reserve(self, tokens: int) -> float:
+        """
+        Takes capacity from both buckets if available. Returns 0.0 on success,
+        otherwise the number of seconds to wait before trying again.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._blocked_until:
+                return self._blocked_until - now
+
+            request_capacity = self.requests_per_minute * self._rate_scale
+            token_capacity = self.tokens_per_minute * self._rate_scale
+            # A single call larger than the whole bucket would otherwise wait forever.
+            tokens = min(tokens, token_capacity)
+
+            if self._request_tokens >= 1 and self._llm_tokens >= tokens:
+                self._request_tokens -= 1
+                self._llm_tokens -= tokens
+                return 0.0
+
+            request_wait = max(0.0, 1 - self._request_tokens) * 60.0 / request_capacity
+            token_wait = max(0.0, tokens - self._llm_tokens) * 60.0 / token_capacity
+            return max(request_wait, token_wait)
+
+    def _jittered(self, wait: float) -> float:
+        # Jitter keeps callers that were blocked together from waking up together.
+        return wait + random.uniform(0, 0.1 * wait)
+
+    def acquire(self, tokens: int = 0):
+        """
+        Blocks until one request and `tokens` LLM tokens are available.
+        """
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            logger.debug(f"Rate limiter: waiting {wait:.2f}s for capacity ({tokens} tokens).")
+            time.sleep(self._jittered(wait))
+
+    async def aacquire(self, tokens: int = 0):
+        """
+        Async variant of acquire() that yields to the event loop while waiting.
+        """
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            logger.debug(f"Rate limiter: waiting {wait:.2f}s for capacity ({tokens} tokens).")
+            await asyncio.sleep(self._jittered(wait))
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """
+        Corrects the token bucket once the provider reports real usage.
+        """
+        if actual_tokens is None:
+            return
+        with self._lock:
+            self._llm_tokens -= actual_tokens - estimated_tokens
+
+    def on_success(self):
+        with self._lock:
+            self._rate_scale = min(1.0, self._rate_scale + self.recovery_step)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None):
+        """
+        Pauses every caller until retry-after has elapsed and backs off the rate.
+        """
+        retry_after = retry_after if retry_after is not None else self.default_retry_after
+        with self._lock:
+            self._rate_scale = max(self.min_rate_fraction, self._rate_scale * 0.5)
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+            # Start the next window empty so the recovered rate is not exceeded by a burst.
+            self._request_tokens = min(self._request_tokens, 0.0)
+        logger.warning(f"Rate limited by provider. Pausing {retry_after:.2f}s, rate scaled to {self._rate_scale:.2f}.")
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+def parse_retry_after(value) -> Optional[float]:
+    """
+    Parses retry-after style values: plain seconds ("7", "7.5") or
+    Go-style durations as sent in x-ratelimit-reset-* headers ("2m59.56s", "120ms").
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    scale = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    return sum(float(amount) * scale[unit] for amount, unit in parts)
+
+def _iter_causes(exc: BaseException):
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        yield exc
+        exc = exc.__cause__ or exc.__context__
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """
+    True if the exception (or anything in its cause chain) is a provider 429.
+    """
+    for e in _iter_causes(exc):
+        if getattr(e, "status_code", None) == 429 or type(e).__name__ == "RateLimitError":
+            return True
+    return False
+
+def get_retry_after(exc: BaseException) -> Optional[float]:
+    """
+    Extracts the provider's requested wait from a 429 error, if it sent one.
+    """
+    for e in _iter_causes(exc):
+        response = getattr(e, "response", None)
+        headers = getattr(response, "headers", None)
+        if not headers:
+            continue
+        for header in ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+            retry_after = parse_retry_after(headers.get(header))
+            if retry_after is not None:
+                return retry_after
+    return None
+
+def _build_rate_limiter() -> TokenBucketRateLimiter:
+    settings = config.get("rate_limit", {})
+    return TokenBucketRateLimiter(
+        requests_per_minute=settings.get("requests_per_minute", 30),
+        tokens_per_minute=settings.get("tokens_per_minute", 12000),
+        min_rate_fraction=settings.get("min_rate_fraction", 0.25),
+        recovery_step=settings.get("recovery_step", 0.05)
+    )
+
+# Global limiter shared by every agent in this process
+rate_limiter = _build_rate_limiter()
@@ -0,0 +1,227 @@
+import asyncio
+import atexit
+import multiprocessing
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+from typing import Dict, Optional
+import pandas as pd
+from src.utils.logger import logger
+from src.utils.error_handler import DataProcessingError
+from src.utils.sandbox_worker import worker_main
+
+try:
+    import pyarrow.feather as feather
+except ImportError: # Optional: without pyarrow workers load a pickled copy instead
+    feather = None
+
+# Time allowed for a fresh worker to import pandas and attach to the dataset
+WORKER_STARTUP_TIMEOUT = 120
+POLL_INTERVAL = 0.05
+
+# Dataset files this process's pools are attached to -> number of pools
+_in_use: Dict[str, int] = {}
+_in_use_lock = threading.Lock()
+OWNED_FILE = re.compile(r"^(\d+)-[^.]+\.(?:arrow|pkl)$")
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+def _prune(directory: str, keep: Optional[str] = None):
+    """
+    Removes dataset files that no pool can still be using: this process's files
+    that none of its pools is attached to, and the files of processes that exited.
+    """
+    for name in os.listdir(directory):
+        match = OWNED_FILE.match(name)
+        path = os.path.abspath(os.path.join(directory, name))
+        if match is None or path == keep:
+            continue
+        pid = int(match.group(1))
+        with _in_use_lock:
+            in_use = path in _in_use
+        if (pid == os.getpid() and not in_use) or (pid != os.getpid() and not _alive(pid)):
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Could not remove stale sandbox dataset {path}: {e}")
+
+def share_frame(df: pd.DataFrame, fingerprint_id: str, directory: str = ".cache/sandbox", snapshot_path: Optional[str] = None) -> str:
+    """
+    Returns a file every worker can attach to, owned by this process so that no
+    other process deletes it while a pool still needs it (workers replaced after a
+    timeout reopen it). The dataset's Arrow snapshot is hard-linked when there is
+    one, which costs no space and survives the snapshot being replaced; otherwise
+    the frame is written as uncompressed Arrow when available so workers
+    memory-map it instead of copying.
+    """
+    os.makedirs(directory, exist_ok=True)
+    extension = "arrow" if feather is not None else "pkl"
+    path = os.path.abspath(os.path.join(directory, f"{os.getpid()}-{fingerprint_id[:16]}.{extension}"))
+    if not os.path.exists(path):
+        tmp_path = f"{path}.tmp"
+        if snapshot_path is not None and feather is not None and os.path.exists(snapshot_path):
+            try:
+                os.link(snapshot_path, tmp_path)
+            except OSError: # e.g. another filesystem: fall back to a copy
+                shutil.copyfile(snapshot_path, tmp_path)
+        elif feather is not None:
+            feather.write_feather(df.reset_index(drop=True), tmp_path, compression="uncompressed")
+        else:
+            df.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+    _prune(directory, keep=path)
+    return path
+
+def _rss_mb(pid: int) -> Optional[float]:
+    # Linux only; elsewhere the memory cap is simply not enforced.
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+class _Worker:
+    def __init__(self, context, dataset_path: str):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=worker_main, args=(child_conn, dataset_path), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+
+    def wait_ready(self):
+        if self.ready:
+            return
+        if not self.conn.poll(WORKER_STARTUP_TIMEOUT):
+            raise DataProcessingError("Sandbox worker did not start in time.")
+        status, _ = self.conn.recv()
+        self.ready = status == "ready"
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+class SandboxPool:
+    """
+    Pool of worker processes that execute generated pandas snippets.
+
+    Each worker attaches to one shared, memory-mapped copy of the dataset. A snippet
+    that exceeds its wall-clock timeout or the RSS cap has its worker killed and
+    replaced, so a runaway groupby can never block the orchestrator. Several
+    snippets run in parallel, one per worker.
+    """
+    def __init__(self, dataset_path: str, workers: int = 2, timeout_seconds: float = 30, max_memory_mb: float = 2048):
+        self.dataset_path = dataset_path
+        self.timeout_seconds = timeout_seconds
+        self.max_memory_mb = max_memory_mb
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._attached = os.path.abspath(dataset_path)
+        with _in_use_lock:
+            _in_use[self._attached] = _in_use.get(self._attached, 0) + 1
+        for _ in range(max(1, workers)):
+            self._spawn()
+        atexit.register(self.close)
+        logger.info(f"Started sandbox pool with {len(self._workers)} workers on {dataset_path}")
+
+    def _spawn(self):
+        worker = _Worker(self._context, self.dataset_path)
+        with self._lock:
+            self._workers.append(worker)
+        self._idle.put(worker)
+
+    def _replace(self, worker: _Worker):
+        worker.kill()
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        if not self._closed:
+            self._spawn()
+
+    def run(self, code: str) -> str:
+        """
+        Executes a snippet in the next free worker and returns its rendered result.
+        Raises DataProcessingError on errors, timeouts and memory limit violations.
+        """
+        worker = self._idle.get()
+        healthy = True
+        try:
+            worker.wait_ready()
+            worker.conn.send(code)
+            deadline = time.monotonic() + self.timeout_seconds
+            while not worker.conn.poll(POLL_INTERVAL):
+                if not worker.process.is_alive():
+                    healthy = False
+                    raise DataProcessingError("Sandbox worker crashed while executing generated code.")
+                if time.monotonic() > deadline:
+                    healthy = False
+                    raise DataProcessingError(f"Generated code exceeded the {self.timeout_seconds}s time limit.")
+                rss = _rss_mb(worker.process.pid)
+                if rss is not None and rss > self.max_memory_mb:
+                    healthy = False
+                    raise DataProcessingError(f"Generated code exceeded the {self.max_memory_mb}MB memory limit.")
+            status, payload = worker.conn.recv()
+        except (EOFError, OSError) as e:
+            healthy = False
+            raise DataProcessingError(f"Lost contact with sandbox worker: {e}")
+        finally:
+            if healthy:
+                self._idle.put(worker)
+            else:
+                self._replace(worker)
+
+        if status != "ok":
+            raise DataProcessingError(payload)
+        return payload
+
+    async def arun(self, code: str) -> str:
+        return await asyncio.to_thread(self.run, code)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        with self._lock:
+            workers = list(self._workers)
+        for worker in workers:
+            try:
+                worker.conn.send(None)
+            except (OSError, ValueError):
+                pass
+            worker.process.join(timeout=1)
+            worker.kill()
+        self._detach()
+
+    def _detach(self):
+        # The last pool of this process on a file it owns removes it
+        with _in_use_lock:
+            remaining = _in_use.get(self._attached, 1) - 1
+            if remaining > 0:
+                _in_use[self._attached] = remaining
+                return
+            _in_use.pop(self._attached, None)
+        match = OWNED_FILE.match(os.path.basename(self._attached))
+        if match is not None and int(match.group(1)) == os.getpid():
+            try:
+                os.remove(self._attached)
+            except OSError:
+                pass
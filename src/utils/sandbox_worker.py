@@ -0,0 +1,48 @@
+"""
+Worker-side half of the generated-code sandbox. Kept free of agent and LLM
+imports so that worker processes start quickly.
+"""
+import pandas as pd
+
+def render_result(result) -> str:
+    """
+    Renders a snippet's `result` the way DataAgent reports it to the other agents.
+    """
+    if isinstance(result, pd.DataFrame):
+        return result.to_markdown()
+    elif isinstance(result, pd.Series):
+        return result.to_markdown()
+    else:
+        return str(result)
+
+def load_shared_frame(path: str) -> pd.DataFrame:
+    """
+    Attaches to the shared dataset file. Arrow files are memory-mapped, so numeric
+    columns are backed by the OS page cache shared between all workers.
+    """
+    if path.endswith(".arrow"):
+        import pyarrow.feather as feather
+        return feather.read_table(path, memory_map=True).to_pandas(split_blocks=True)
+    return pd.read_pickle(path)
+
+def worker_main(conn, dataset_path: str):
+    """
+    Loads the dataset once, then executes snippets sent over `conn` until it receives None.
+    Replies with ("ok", rendered_result) or ("error", message).
+    """
+    from src.utils.metric_cube import MetricCube
+
+    df = load_shared_frame(dataset_path)
+    cube = MetricCube(df)
+    conn.send(("ready", None))
+
+    while True:
+        code = conn.recv()
+        if code is None:
+            break
+        local_vars = {"df": df.copy(deep=False), "pd": pd, "cube": cube}
+        try:
+            exec(code, {}, local_vars)
+            conn.send(("ok", render_result(local_vars.get("result"))))
+        except BaseException as e: # MemoryError and friends must not kill the worker silently
+            conn.send(("error", f"{type(e).__name__}: {e}"))
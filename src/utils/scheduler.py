@@ -0,0 +1,73 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Set
+from src.utils.logger import logger
+
+# Context keys each agent reads and writes while executing a plan step.
+# A step depends on every earlier step that writes a key it reads, so steps
+# with no such relationship are free to run concurrently.
+STEP_IO = {
+    "DataAgent": {"reads": (), "writes": ("data_summary",)},
+    "InsightAgent": {"reads": ("data_summary",), "writes": ("insights_json",)},
+    "CreativeGenerator": {"reads": ("insights_json", "top_ads"), "writes": ("creative_recommendations",)},
+}
+
+def infer_dependencies(steps: List[Any]) -> Dict[int, Set[int]]:
+    """
+    Maps each step index to the indices of the earlier steps it must wait for.
+    Unknown agents are treated conservatively and depend on all earlier steps.
+    """
+    dependencies = {}
+    for j, step in enumerate(steps):
+        io = STEP_IO.get(step.agent)
+        if io is None:
+            dependencies[j] = set(range(j))
+            continue
+        deps = set()
+        for i in range(j):
+            earlier = STEP_IO.get(steps[i].agent)
+            if earlier is None or set(earlier["writes"]) & set(io["reads"]):
+                deps.add(i)
+        dependencies[j] = deps
+    return dependencies
+
+async def execute_plan(
+    steps: List[Any],
+    run_step: Callable[[int, Any, Dict[int, Any]], Awaitable[Any]],
+    max_concurrency: int = 4
+) -> Dict[int, Any]:
+    """
+    Runs plan steps as a dependency graph instead of a flat list.
+
+    Every step starts as soon as the steps it depends on have finished, with at
+    most `max_concurrency` steps in flight. A failed step does not block its
+    dependents (matching the old serial loop, which logged and continued); it
+    simply contributes no output.
+
+    Args:
+        steps: Plan steps (anything with an `agent` attribute).
+        run_step: Coroutine called as run_step(index, step, results).
+        max_concurrency: Upper bound on concurrently running steps.
+
+    Returns:
+        Mapping of step index to the value returned by run_step, for successful steps only.
+    """
+    dependencies = infer_dependencies(steps)
+    logger.debug(f"Plan dependencies: { {i: sorted(d) for i, d in dependencies.items()} }")
+
+    results: Dict[int, Any] = {}
+    done = {i: asyncio.Event() for i in range(len(steps))}
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run(i: int):
+        try:
+            for dep in dependencies[i]:
+                await done[dep].wait()
+            async with semaphore:
+                results[i] = await run_step(i, steps[i], results)
+        except Exception as e:
+            logger.error(f"Step {i+1} failed with unexpected error: {e}")
+        finally:
+            done[i].set()
+
+    await asyncio.gather(*(run(i) for i in range(len(steps))))
+    return results
@@ -0,0 +1,82 @@
+"""
+Reuse of InsightAgent and CreativeGenerator outputs across dataset appends.
+
+Outputs are keyed by the query, the step, the agent's prompt and the dataset
+lineage (which survives rows being appended to the CSV). A stored output is served again as long as the
+step's inputs have not moved materially since it was produced: the text around the
+numbers must be identical and every number must be within `reuse_tolerance`
+(relative) of the baseline. Dates are ignored, so a window that merely slid by a
+day does not count as a change. The baseline is kept when an output is reused, so
+small drifts cannot add up unnoticed.
+"""
+import json
+import re
+from typing import Optional
+from src.utils.cache import DiskCache, content_hash
+from src.utils.config import load_config
+from src.utils.logger import logger
+
+config = load_config()
+
+DATE = re.compile(r"\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2})?)?")
+NUMBER = re.compile(r"-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?")
+
+def material_change(old: str, new: str, tolerance: float) -> bool:
+    """
+    True if `new` differs from `old` by more than `tolerance` (relative) in any
+    number, or in anything other than numbers and dates.
+    """
+    old, new = DATE.sub("<date>", old), DATE.sub("<date>", new)
+    if NUMBER.sub("#", old) != NUMBER.sub("#", new):
+        return True
+    for a, b in zip(NUMBER.findall(old), NUMBER.findall(new)):
+        a, b = float(a), float(b)
+        if abs(b - a) > tolerance * max(abs(a), abs(b), 1e-9):
+            return True
+    return False
+
+class StepMemo:
+    """
+    Step outputs with the inputs they were produced from.
+    """
+    def __init__(self, cache: DiskCache, tolerance: float = 0.02):
+        self.cache = cache
+        self.tolerance = tolerance
+
+    @classmethod
+    def from_config(cls) -> Optional["StepMemo"]:
+        settings = config.get("cache", {}).get("step_outputs", {})
+        cache = DiskCache.from_settings(settings, ".cache/step_outputs.sqlite", "step_outputs")
+        if cache is None:
+            return None
+        return cls(cache, settings.get("reuse_tolerance", 0.02))
+
+    @staticmethod
+    def key(query: str, agent: str, description: str, lineage: str, prompt: str = "") -> str:
+        # `prompt` is the agent's system prompt, so a prompt edit invalidates its outputs
+        return content_hash({
+            "query": re.sub(r"\s+", " ", query.strip().lower()),
+            "agent": agent,
+            "step": description,
+            "dataset": lineage,
+            "model": config["llm"]["model"],
+            "prompt": content_hash(prompt)
+        })
+
+    def recall(self, key: str, inputs: str) -> Optional[str]:
+        """
+        The stored output for `key` if `inputs` did not move materially, else None.
+        """
+        stored = self.cache.get(key)
+        if stored is None:
+            return None
+        entry = json.loads(stored)
+        if material_change(entry["inputs"], inputs, self.tolerance):
+            logger.info("Step inputs changed materially; re-running the step.")
+            return None
+        return entry["output"]
+
+    def remember(self, key: str, inputs: str, output: str):
+        self.cache.set(key, json.dumps({"inputs": inputs, "output": output}))
+
+step_memo = StepMemo.from_config()
@@ -0,0 +1,282 @@
+"""
+Synthetic FB-ads dataset generator with the same columns as the sample file.
+
+    python -m src.utils.synthetic_data --rows 10000000 --output data/synthetic_fb_ads_undergarments.csv \
+        --roas-drop "Men ComfortMax Launch:2025-03-01:0.6" --ctr-fatigue "auto:2025-02-15:0.03"
+
+Rows are (ad, day) pairs. Every ad belongs to a campaign and adset with a fixed
+audience, platform and country, and has one creative. Metrics are generated to be
+mutually consistent: impressions follow from spend and CPM, clicks from
+impressions and CTR, purchases from clicks and conversion rate, and revenue, ROAS
+and CTR are derived from those. Output is written day-chunk by day-chunk, so
+memory stays flat however many rows are requested. Injected anomalies are
+recorded in a JSON manifest next to the CSV.
+"""
+import argparse
+import json
+import math
+import os
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from src.utils.config import load_config
+from src.utils.logger import logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError: # Optional: pandas.to_csv is used instead (roughly 10x slower)
+    pa = None
+
+config = load_config()
+
+COLUMNS = ["campaign_name", "adset_name", "date", "spend", "impressions", "clicks", "ctr", "purchases",
+           "revenue", "roas", "creative_type", "creative_message", "audience_type", "platform", "country"]
+
+TEXT_COLUMNS = ["campaign_name", "adset_name", "creative_type", "creative_message", "audience_type", "platform", "country"]
+
+PRODUCT_LINES = ["Men ComfortMax", "Women SeamlessFit", "Men ActiveDry", "Women CloudSoft", "Kids EverydayCotton",
+                 "Men BambooLux", "Women SculptLine", "Unisex ThermalCore"]
+CAMPAIGN_THEMES = ["Launch", "Evergreen", "Summer Sale", "Holiday Push", "Retargeting", "Prospecting"]
+ADSET_AUDIENCES = [("Retarget", "Retargeting"), ("LAL1", "Lookalike"), ("LAL2", "Lookalike"), ("Broad", "Broad"), ("Interest", "Broad")]
+CREATIVE_TYPES = ["Image", "Video", "UGC", "Carousel"]
+PLATFORMS = ["Facebook", "Instagram"]
+COUNTRIES = ["US", "UK", "IN"]
+HOOKS = ["Breathable organic cotton that moves with you", "No ride-up guarantee", "Invisible under tees",
+         "Cooling mesh panels for workouts", "Summer-ready essentials", "Cloud-soft comfort all day"]
+PRODUCTS = ["briefs", "boxers", "bralettes", "trunks", "athletic briefs", "inner vests"]
+OFFERS = ["limited offer", "back in stock", "buy 3 get 1 free", "free shipping today"]
+
+# Typical levels per dimension value (multipliers on a common base)
+CPM_BY_PLATFORM = {"Facebook": 1.8, "Instagram": 2.4}
+CPM_BY_COUNTRY = {"US": 1.3, "UK": 1.1, "IN": 0.45}
+CTR_BY_CREATIVE = {"Image": 0.014, "Video": 0.018, "UGC": 0.021, "Carousel": 0.016}
+CVR_BY_AUDIENCE = {"Retargeting": 0.035, "Lookalike": 0.022, "Broad": 0.015}
+
+def parse_injection(spec: str, value_name: str) -> Dict[str, Any]:
+    """
+    Parses "CAMPAIGN:START_DATE:VALUE" (CAMPAIGN may be "auto" for the first campaign).
+    """
+    campaign, start, value = spec.rsplit(":", 2)
+    return {"campaign": campaign, "start": str(pd.Timestamp(start).date()), value_name: float(value)}
+
+class SyntheticAdsGenerator:
+    """
+    Generates a reproducible dataset of `rows` (ad, day) rows over `days` days.
+
+    Args:
+        rows: Total number of rows to write.
+        days: Length of the date range; the number of ads is rows / days.
+        start_date: First day of the range.
+        seed: Seed for every random draw (defaults to `random_seed` in config.yaml).
+        roas_drops: [{"campaign", "start", "factor"}] - conversion rate (and so revenue/ROAS)
+            of the campaign is multiplied by `factor` from `start` on.
+        ctr_fatigue: [{"campaign", "start", "daily_decay"}] - CTR of the campaign decays by
+            `daily_decay` per day from `start` on.
+    """
+    def __init__(self, rows: int, days: int = 90, start_date: str = "2025-01-01", seed: Optional[int] = None,
+                 roas_drops: Optional[List[Dict[str, Any]]] = None, ctr_fatigue: Optional[List[Dict[str, Any]]] = None):
+        self.rows = rows
+        self.days = max(1, min(days, rows))
+        self.dates = pd.date_range(start_date, periods=self.days, freq="D")
+        self.seed = config.get("random_seed", 42) if seed is None else seed
+        self.rng = np.random.default_rng(self.seed)
+        self.ads = self._build_ads(math.ceil(rows / self.days))
+        self._date_labels = self.dates.strftime("%Y-%m-%d")
+        # Per-ad columns as arrays (text as category codes) for fast per-chunk gathering
+        self._categories = {}
+        self._ad_arrays = {}
+        for column in TEXT_COLUMNS:
+            codes, categories = pd.factorize(self.ads[column])
+            self._ad_arrays[column] = codes
+            self._categories[column] = categories
+        for column in ["budget", "cpm", "ctr", "cvr", "aov"]:
+            self._ad_arrays[column] = self.ads[column].to_numpy()
+        self.roas_drops = [self._resolve(i) for i in roas_drops or []]
+        self.ctr_fatigue = [self._resolve(i) for i in ctr_fatigue or []]
+
+    def _build_ads(self, n_ads: int) -> pd.DataFrame:
+        rng = self.rng
+        n_campaigns = int(np.clip(round(math.sqrt(n_ads) / 2), 1, len(PRODUCT_LINES) * len(CAMPAIGN_THEMES)))
+        campaigns = [f"{PRODUCT_LINES[i % len(PRODUCT_LINES)]} {CAMPAIGN_THEMES[i // len(PRODUCT_LINES) % len(CAMPAIGN_THEMES)]}"
+                     for i in range(n_campaigns)]
+
+        campaign_idx = np.arange(n_ads) % n_campaigns
+        # Adsets are numbered within each campaign; each has a fixed audience/platform/country
+        adset_no = (np.arange(n_ads) // n_campaigns) % max(1, min(20, n_ads // n_campaigns or 1))
+        audience_idx = adset_no % len(ADSET_AUDIENCES)
+        adset_names = np.array([f"Adset-{n + 1} {ADSET_AUDIENCES[a][0]}" for n, a in zip(adset_no, audience_idx)])
+        audiences = np.array([ADSET_AUDIENCES[a][1] for a in audience_idx])
+        platforms = np.array(PLATFORMS)[(adset_no + campaign_idx) % len(PLATFORMS)]
+        countries = np.array(COUNTRIES)[(adset_no // len(PLATFORMS) + campaign_idx) % len(COUNTRIES)]
+
+        creative_types = np.array(CREATIVE_TYPES)[rng.integers(0, len(CREATIVE_TYPES), n_ads)]
+        messages = np.array([
+            f"{HOOKS[h]} — {OFFERS[o]} on {PRODUCT_LINES[c % len(PRODUCT_LINES)].split()[0].lower()} {PRODUCTS[p]}."
+            for h, o, p, c in zip(rng.integers(0, len(HOOKS), n_ads), rng.integers(0, len(OFFERS), n_ads),
+                                  rng.integers(0, len(PRODUCTS), n_ads), campaign_idx)
+        ])
+
+        ads = pd.DataFrame({
+            "campaign_name": np.array(campaigns)[campaign_idx],
+            "adset_name": adset_names,
+            "creative_type": creative_types,
+            "creative_message": messages,
+            "audience_type": audiences,
+            "platform": platforms,
+            "country": countries,
+        })
+        # Per-ad levels that stay fixed over time
+        ads["budget"] = rng.lognormal(mean=math.log(500), sigma=0.5, size=n_ads)
+        ads["cpm"] = ads["platform"].map(CPM_BY_PLATFORM) * ads["country"].map(CPM_BY_COUNTRY) * rng.lognormal(0, 0.2, n_ads)
+        ads["ctr"] = ads["creative_type"].map(CTR_BY_CREATIVE) * rng.lognormal(0, 0.25, n_ads)
+        ads["cvr"] = ads["audience_type"].map(CVR_BY_AUDIENCE) * rng.lognormal(0, 0.3, n_ads)
+        ads["aov"] = rng.normal(32, 6, n_ads).clip(12, None)
+        return ads
+
+    def _resolve(self, injection: Dict[str, Any]) -> Dict[str, Any]:
+        resolved = dict(injection)
+        if resolved.get("campaign", "auto") == "auto":
+            resolved["campaign"] = self.ads["campaign_name"].iloc[0]
+        elif resolved["campaign"] not in set(self.ads["campaign_name"]):
+            raise ValueError(f"Unknown campaign '{resolved['campaign']}' for injection.")
+        resolved["start"] = str(pd.Timestamp(resolved["start"]).date())
+        return resolved
+
+    def _campaign_code(self, campaign: str) -> int:
+        return int(self._categories["campaign_name"].get_loc(campaign))
+
+    def _chunk(self, day_indices: np.ndarray, limit: int) -> pd.DataFrame:
+        rng = self.rng
+        n_ads = len(self.ads)
+        ad_idx = np.tile(np.arange(n_ads), len(day_indices))[:limit]
+        day_idx = np.repeat(day_indices, n_ads)[:limit]
+        ads = {column: values[ad_idx] for column, values in self._ad_arrays.items()}
+        dates = self.dates[day_idx]
+
+        # Mild weekly seasonality on spend and conversion
+        weekday = np.asarray(dates.dayofweek)
+        season = 1 + 0.08 * np.sin(2 * np.pi * weekday / 7)
+
+        ctr = ads["ctr"] * rng.lognormal(0, 0.1, limit)
+        cvr = ads["cvr"] * season * rng.lognormal(0, 0.15, limit)
+        campaigns = ads["campaign_name"]
+        for drop in self.roas_drops:
+            mask = (campaigns == self._campaign_code(drop["campaign"])) & (dates >= pd.Timestamp(drop["start"]))
+            cvr[mask] *= drop["factor"]
+        for fatigue in self.ctr_fatigue:
+            elapsed = np.asarray((dates - pd.Timestamp(fatigue["start"])).days)
+            mask = (campaigns == self._campaign_code(fatigue["campaign"])) & (elapsed > 0)
+            ctr[mask] *= (1 - fatigue["daily_decay"]) ** elapsed[mask]
+
+        spend = np.round(ads["budget"] * season * rng.gamma(8, 1 / 8, limit), 2).clip(0.5, None)
+        impressions = np.maximum(1, (spend / (ads["cpm"] / 1000) * rng.lognormal(0, 0.05, limit)).astype(np.int64))
+        clicks = rng.binomial(impressions, np.clip(ctr, 0, 1))
+        purchases = rng.binomial(clicks, np.clip(cvr, 0, 1))
+        revenue = np.round(purchases * ads["aov"] * rng.lognormal(0, 0.1, limit), 2)
+
+        columns = {
+            "date": pd.Categorical.from_codes(day_idx, self._date_labels),
+            "spend": spend,
+            "impressions": impressions,
+            "clicks": clicks,
+            "ctr": np.round(clicks / impressions, 4),
+            "purchases": purchases,
+            "revenue": revenue,
+            "roas": np.round(revenue / spend, 2),
+        }
+        # Text columns stay categorical: codes are gathered per row, strings are never copied
+        for column in TEXT_COLUMNS:
+            columns[column] = pd.Categorical.from_codes(ads[column], self._categories[column])
+        return pd.DataFrame(columns)[COLUMNS]
+
+    def iter_chunks(self, chunk_rows: int = 500_000):
+        """
+        Yields DataFrames of whole days (at least one day each) until `rows` rows are produced.
+        """
+        days_per_chunk = max(1, chunk_rows // len(self.ads))
+        produced = 0
+        for first in range(0, self.days, days_per_chunk):
+            if produced >= self.rows:
+                break
+            day_indices = np.arange(first, min(self.days, first + days_per_chunk))
+            limit = min(self.rows - produced, len(day_indices) * len(self.ads))
+            chunk = self._chunk(day_indices, limit)
+            produced += len(chunk)
+            yield chunk
+
+    def manifest(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "days": self.days,
+            "ads": len(self.ads),
+            "campaigns": sorted(self.ads["campaign_name"].unique().tolist()),
+            "seed": self.seed,
+            "date_min": str(self.dates[0].date()),
+            "date_max": str(self.dates[-1].date()),
+            "roas_drops": self.roas_drops,
+            "ctr_fatigue": self.ctr_fatigue,
+        }
+
+    def write_csv(self, path: str, chunk_rows: int = 500_000) -> Dict[str, Any]:
+        """
+        Streams the dataset to `path` (atomically) and writes `<path>.anomalies.json`.
+        Returns the manifest.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        written = 0
+        if pa is not None:
+            writer = None
+            for chunk in self.iter_chunks(chunk_rows):
+                # Decode the categorical columns to plain strings while writing
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                table = table.cast(pa.schema([
+                    pa.field(f.name, pa.string()) if pa.types.is_dictionary(f.type) else f for f in table.schema
+                ]))
+                if writer is None:
+                    writer = pa_csv.CSVWriter(tmp_path, table.schema, write_options=pa_csv.WriteOptions(quoting_style="needed"))
+                writer.write_table(table)
+                written += len(chunk)
+            if writer is not None:
+                writer.close()
+        else:
+            with open(tmp_path, "w", newline="") as f:
+                for chunk in self.iter_chunks(chunk_rows):
+                    chunk.to_csv(f, header=written == 0, index=False)
+                    written += len(chunk)
+        os.replace(tmp_path, path)
+
+        manifest = self.manifest()
+        with open(f"{path}.anomalies.json", "w") as f:
+            json.dump(manifest, f, indent=2)
+        logger.info(f"Wrote {written} synthetic rows ({len(self.ads)} ads x {self.days} days) to {path}")
+        return manifest
+
+def main(argv: Optional[List[str]] = None):
+    settings = config.get("synthetic", {})
+    parser = argparse.ArgumentParser(description="Generate a synthetic FB ads dataset")
+    parser.add_argument("--rows", type=int, default=settings.get("rows", 100_000))
+    parser.add_argument("--days", type=int, default=settings.get("days", 90))
+    parser.add_argument("--start-date", type=str, default=settings.get("start_date", "2025-01-01"))
+    parser.add_argument("--seed", type=int, default=None, help="Defaults to random_seed in config.yaml")
+    parser.add_argument("--output", type=str, default=config["data"]["csv_path"])
+    parser.add_argument("--chunk-rows", type=int, default=settings.get("chunk_rows", 500_000))
+    parser.add_argument("--roas-drop", action="append", default=[], metavar="CAMPAIGN:START:FACTOR",
+                        help="Multiply conversion rate (so ROAS) of CAMPAIGN by FACTOR from START; CAMPAIGN may be 'auto'")
+    parser.add_argument("--ctr-fatigue", action="append", default=[], metavar="CAMPAIGN:START:DAILY_DECAY",
+                        help="Decay CTR of CAMPAIGN by DAILY_DECAY per day from START; CAMPAIGN may be 'auto'")
+    args = parser.parse_args(argv)
+
+    generator = SyntheticAdsGenerator(
+        rows=args.rows,
+        days=args.days,
+        start_date=args.start_date,
+        seed=args.seed,
+        roas_drops=[parse_injection(s, "factor") for s in args.roas_drop],
+        ctr_fatigue=[parse_injection(s, "daily_decay") for s in args.ctr_fatigue],
+    )
+    generator.write_csv(args.output, chunk_rows=args.chunk_rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Span-based tracing for analysis runs.
+
+A trace is a tree of spans: the run, each plan step, each safe_execute attempt,
+each LLM call and each execution of generated code. The current span is kept in a
+context variable, so nesting follows asyncio tasks and asyncio.to_thread calls
+without passing anything around. Outside an active trace, span() is a no-op.
+
+    python -m src.utils.tracing logs/run_x/traces.jsonl --chrome trace.chrome.json
+
+prints p50/p95 latency per span and converts the traces to the Chrome Trace Event
+format (chrome://tracing, https://ui.perfetto.dev).
+"""
+import argparse
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+
+class Span:
+    """
+    One timed operation. Attributes hold token counts, cache status and the like;
+    status is "ok" or "error".
+    """
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "attributes", "start", "end",
+                 "status", "error", "_perf", "_token")
+
+    def __init__(self, trace: Optional["Trace"], name: str, kind: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self._perf = time.perf_counter()
+        self._token = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def fail(self, error: Any):
+        self.status = "error"
+        self.error = str(error)[:500]
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return None if self.end is None else round((self.end - self.start) * 1000, 3)
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = self.start + (time.perf_counter() - self._perf)
+        if exc is not None and self.status == "ok":
+            self.fail(f"{exc_type.__name__}: {exc}")
+        _current_span.reset(self._token)
+        self.trace.add(self)
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start": self.start,
+            "end": self.end,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+class _NoopSpan:
+    """
+    Returned by span() when no trace is active; accepts and drops everything.
+    """
+    def set(self, **attributes):
+        pass
+
+    def fail(self, error: Any):
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+NOOP_SPAN = _NoopSpan()
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+class Trace:
+    """
+    Collects the finished spans of one run. Spans may finish on worker threads.
+    """
+    def __init__(self, name: str, **attributes):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+        self.root = Span(self, name, "run", None, attributes)
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        return {"trace_id": self.trace_id, "name": self.name, "spans": [s.to_dict() for s in spans]}
+
+    def write(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+
+    def append_to(self, path: str):
+        """
+        Appends the trace as one JSON line, so a run directory can collect every
+        query served by the process.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        line = json.dumps(self.to_dict(), default=str)
+        with open(path, "a") as f:
+            f.write(line + "\n")
+
+def start_trace(name: str, **attributes) -> Trace:
+    """
+    Creates a trace whose root span becomes current when entered:
+
+        trace = start_trace("run", query=query)
+        with trace.root:
+            ...
+    """
+    return Trace(name, **attributes)
+
+def span(name: str, kind: str = "internal", **attributes):
+    """
+    Opens a child of the current span. Use as a context manager; returns a no-op
+    span when no trace is active.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return NOOP_SPAN
+    return Span(parent.trace, name, kind, parent.span_id, attributes)
+
+def current_span():
+    """
+    The innermost open span, or a no-op span outside a trace.
+    """
+    return _current_span.get() or NOOP_SPAN
+
+def _lanes(spans: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Assigns each span the thread lane of its nearest run/step ancestor, so that
+    concurrent plan steps do not overlap on one Chrome timeline row.
+    """
+    by_id = {s["span_id"]: s for s in spans}
+    lane_ids: Dict[str, int] = {}
+    lanes = {}
+    for s in spans:
+        owner = s
+        while owner["kind"] not in ("run", "step") and owner["parent_id"] in by_id:
+            owner = by_id[owner["parent_id"]]
+        lanes[s["span_id"]] = lane_ids.setdefault(owner["span_id"], len(lane_ids) + 1)
+    return lanes
+
+def to_chrome_trace(traces: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Converts traces (Trace.to_dict() output) to Chrome Trace Event "complete" events.
+    Each trace becomes one process.
+    """
+    events = []
+    for pid, trace in enumerate(traces, start=1):
+        spans = [s for s in trace["spans"] if s["end"] is not None]
+        events.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": f"{trace['name']} {trace['trace_id'][:8]}"}})
+        lanes = _lanes(spans)
+        for s in spans:
+            events.append({
+                "name": s["name"],
+                "cat": s["kind"],
+                "ph": "X",
+                "ts": round(s["start"] * 1e6),
+                "dur": round((s["end"] - s["start"]) * 1e6),
+                "pid": pid,
+                "tid": lanes[s["span_id"]],
+                "args": {**s["attributes"], "status": s["status"], **({"error": s["error"]} if s["error"] else {})},
+            })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+def summarize(traces: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Latency percentiles per (kind, agent or name), slowest p95 first.
+    """
+    import numpy as np
+
+    groups: Dict[tuple, List[float]] = {}
+    errors: Dict[tuple, int] = {}
+    for trace in traces:
+        for s in trace["spans"]:
+            if s["duration_ms"] is None:
+                continue
+            key = (s["kind"], s["attributes"].get("agent") or s["name"])
+            groups.setdefault(key, []).append(s["duration_ms"])
+            errors[key] = errors.get(key, 0) + (s["status"] == "error")
+    rows = []
+    for (kind, name), durations in groups.items():
+        values = np.array(durations)
+        rows.append({
+            "kind": kind,
+            "name": name,
+            "count": len(values),
+            "errors": errors[(kind, name)],
+            "p50_ms": round(float(np.percentile(values, 50)), 1),
+            "p95_ms": round(float(np.percentile(values, 95)), 1),
+            "total_ms": round(float(values.sum()), 1),
+        })
+    return sorted(rows, key=lambda r: -r["p95_ms"])
+
+def load_traces(path: str) -> List[Dict[str, Any]]:
+    """
+    Reads a trace.json (one trace) or a traces.jsonl (one trace per line).
+    """
+    with open(path, "r") as f:
+        if path.endswith(".jsonl"):
+            return [json.loads(line) for line in f if line.strip()]
+        return [json.load(f)]
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Summarize run traces and export them for chrome://tracing / Perfetto")
+    parser.add_argument("path", help="trace.json or traces.jsonl")
+    parser.add_argument("--chrome", type=str, help="Write a Chrome Trace Event file here")
+    args = parser.parse_args(argv)
+
+    traces = load_traces(args.path)
+    print(f"{'kind':>8} {'name':<32} {'count':>6} {'errors':>6} {'p50 ms':>10} {'p95 ms':>10} {'total ms':>11}")
+    for row in summarize(traces):
+        print(f"{row['kind']:>8} {row['name'][:32]:<32} {row['count']:>6} {row['errors']:>6} {row['p50_ms']:>10.1f} {row['p95_ms']:>10.1f} {row['total_ms']:>11.1f}")
+    if args.chrome:
+        with open(args.chrome, "w") as f:
+            json.dump(to_chrome_trace(traces), f)
+        print(f"Chrome trace written to {args.chrome}")
+
+if __name__ == "__main__":
+    main()
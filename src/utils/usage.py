@@ -0,0 +1,198 @@
+"""
+Token accounting and budgets per query.
+
+run_query activates a TokenLedger for the query; invoke_llm/ainvoke_llm reserve
+the estimated tokens of every call against it before sending and record the
+reported usage afterwards. Usage is attributed to the agent and attempt of the
+enclosing safe_execute call and to the plan step set with step_scope(). Every
+ledger also feeds the process-wide session totals written to the run directory.
+"""
+import contextvars
+import copy
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+from src.utils.config import load_config
+from src.utils.error_handler import BudgetExceededError, current_attempt
+
+config = load_config()
+
+_current_ledger: contextvars.ContextVar = contextvars.ContextVar("current_ledger", default=None)
+_current_step: contextvars.ContextVar = contextvars.ContextVar("current_step", default=None)
+
+def _labels() -> Dict[str, Any]:
+    context, attempt = current_attempt.get() or ("unattributed", 1)
+    return {"agent": context.split(".")[0], "call": context, "attempt": attempt, "step": _current_step.get()}
+
+class TokenLedger:
+    """
+    Prompt/completion tokens of one query, by agent, step and attempt, checked
+    against `run_tokens` and per-agent `agent_tokens` limits (None = unlimited).
+    Estimated tokens are reserved while a call is in flight, so concurrent steps
+    cannot overrun the budget together. With `keep_calls`, every call is also
+    listed individually.
+    """
+    def __init__(self, run_tokens: Optional[int] = None, agent_tokens: Optional[Dict[str, int]] = None,
+                 pricing: Optional[Dict[str, float]] = None, parent: Optional["TokenLedger"] = None,
+                 keep_calls: bool = True):
+        self.run_tokens = run_tokens
+        self.agent_tokens = agent_tokens or {}
+        self.pricing = pricing or {}
+        self.parent = parent
+        self.keep_calls = keep_calls
+        self.calls: List[Dict[str, Any]] = []
+        self.totals = {"calls": 0, "cached_calls": 0, "failed_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "retry_tokens": 0}
+        self.by_agent: Dict[str, Any] = {}
+        self.by_step: Dict[str, Any] = {}
+        self.by_attempt: Dict[str, Any] = {}
+        self.spent = 0
+        self.reserved = 0
+        self.agent_spent: Dict[str, int] = {}
+        self.agent_reserved: Dict[str, int] = {}
+        self.exceeded: List[str] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, parent: Optional["TokenLedger"] = None) -> "TokenLedger":
+        settings = config.get("budgets", {}) or {}
+        return cls(settings.get("run_tokens"), settings.get("agent_tokens"), settings.get("pricing"), parent)
+
+    @property
+    def budget_exceeded(self) -> bool:
+        return bool(self.exceeded)
+
+    def remaining(self, agent: Optional[str] = None) -> Optional[int]:
+        """
+        Tokens still available to `agent` (or the whole run), or None if unlimited.
+        """
+        with self._lock:
+            limits = []
+            if self.run_tokens is not None:
+                limits.append(self.run_tokens - self.spent - self.reserved)
+            if agent is not None and self.agent_tokens.get(agent) is not None:
+                limits.append(self.agent_tokens[agent] - self.agent_spent.get(agent, 0) - self.agent_reserved.get(agent, 0))
+        return min(limits) if limits else None
+
+    def reserve(self, tokens: int) -> Dict[str, Any]:
+        """
+        Reserves `tokens` for a call about to be sent and returns the labels to
+        settle it with. Raises BudgetExceededError if the run or agent budget
+        cannot cover the call.
+        """
+        labels = _labels()
+        agent = labels["agent"]
+        with self._lock:
+            reason = None
+            if self.run_tokens is not None and self.spent + self.reserved + tokens > self.run_tokens:
+                reason = f"run budget of {self.run_tokens} tokens ({self.spent} spent, call needs ~{tokens})"
+            limit = self.agent_tokens.get(agent)
+            if reason is None and limit is not None and self.agent_spent.get(agent, 0) + self.agent_reserved.get(agent, 0) + tokens > limit:
+                reason = f"{agent} budget of {limit} tokens ({self.agent_spent.get(agent, 0)} spent, call needs ~{tokens})"
+            if reason is not None:
+                self.exceeded.append(reason)
+                raise BudgetExceededError(f"Token budget exceeded: {reason}")
+            self.reserved += tokens
+            self.agent_reserved[agent] = self.agent_reserved.get(agent, 0) + tokens
+        labels["reserved"] = tokens
+        return labels
+
+    def _add(self, labels: Dict[str, Any], prompt: int, completion: int, cached: bool, ok: bool):
+        # Caller holds the lock
+        self.totals["calls"] += 1
+        self.totals["cached_calls"] += int(cached)
+        self.totals["failed_calls"] += int(not ok)
+        self.totals["prompt_tokens"] += prompt
+        self.totals["completion_tokens"] += completion
+        if labels["attempt"] > 1:
+            self.totals["retry_tokens"] += prompt + completion
+        groups = [(self.by_agent, labels["agent"]), (self.by_attempt, str(labels["attempt"]))]
+        if self.keep_calls:
+            groups.append((self.by_step, labels["step"] or "(outside steps)"))
+            self.calls.append({**{k: v for k, v in labels.items() if k != "reserved"},
+                               "prompt_tokens": prompt, "completion_tokens": completion, "cached": cached, "ok": ok})
+        for totals, key in groups:
+            entry = totals.setdefault(key, {"calls": 0, "cached_calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+            entry["calls"] += 1
+            entry["cached_calls"] += int(cached)
+            entry["prompt_tokens"] += prompt
+            entry["completion_tokens"] += completion
+
+    def record(self, labels: Dict[str, Any], prompt_tokens: int, completion_tokens: int, ok: bool = True):
+        """
+        Settles a reservation with the tokens the call actually used.
+        """
+        agent = labels["agent"]
+        reserved = labels.get("reserved", 0)
+        with self._lock:
+            self.reserved -= reserved
+            self.agent_reserved[agent] = self.agent_reserved.get(agent, 0) - reserved
+            self.spent += prompt_tokens + completion_tokens
+            self.agent_spent[agent] = self.agent_spent.get(agent, 0) + prompt_tokens + completion_tokens
+            self._add(labels, prompt_tokens, completion_tokens, cached=False, ok=ok)
+        if self.parent is not None:
+            self.parent.record({**labels, "reserved": 0}, prompt_tokens, completion_tokens, ok)
+
+    def record_cached(self, labels: Optional[Dict[str, Any]] = None):
+        labels = labels or _labels()
+        with self._lock:
+            self._add(labels, 0, 0, cached=True, ok=True)
+        if self.parent is not None:
+            self.parent.record_cached(labels)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            summary = {
+                **self.totals,
+                "total_tokens": self.totals["prompt_tokens"] + self.totals["completion_tokens"],
+                "budget": {"run_tokens": self.run_tokens, "agent_tokens": self.agent_tokens, "exceeded": list(self.exceeded)},
+                "by_agent": copy.deepcopy(self.by_agent),
+                "by_attempt": copy.deepcopy(self.by_attempt),
+            }
+            if self.keep_calls:
+                summary["by_step"] = copy.deepcopy(self.by_step)
+                summary["calls_detail"] = list(self.calls)
+        if self.pricing:
+            summary["estimated_cost_usd"] = round(
+                summary["prompt_tokens"] * self.pricing.get("prompt", 0) / 1e6
+                + summary["completion_tokens"] * self.pricing.get("completion", 0) / 1e6, 6)
+        return summary
+
+    def write(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        summary = self.summary()
+        with open(path, "w") as f:
+            json.dump(summary, f, indent=2)
+
+# Unlimited totals across every query of this process (written to the run directory)
+session_usage = TokenLedger(pricing=(config.get("budgets", {}) or {}).get("pricing"), keep_calls=False)
+
+def current_ledger() -> TokenLedger:
+    """
+    The ledger of the query being run, or the session ledger outside a query.
+    """
+    return _current_ledger.get() or session_usage
+
+@contextmanager
+def track_run(ledger: TokenLedger):
+    """
+    Makes `ledger` the active ledger for the enclosed code (and the tasks and
+    threads it starts).
+    """
+    token = _current_ledger.set(ledger)
+    try:
+        yield ledger
+    finally:
+        _current_ledger.reset(token)
+
+@contextmanager
+def step_scope(step: str):
+    """
+    Attributes LLM usage inside the block to plan step `step`.
+    """
+    token = _current_step.set(step)
+    try:
+        yield
+    finally:
+        _current_step.reset(token)
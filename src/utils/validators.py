@@ -1,39 +1,135 @@
+import numpy as np
 import pandas as pd
-from typing import List, Dict, Any
+from datetime import datetime
+from typing import List, Dict, Any, Tuple
 from src.utils.logger import logger
 from src.utils.error_handler import SchemaValidationError
 from src.schema import InputSchema
 from pydantic import ValidationError
 
-def validate_schema(df: pd.DataFrame) -> bool:
+# Human-readable descriptions for the annotated_types constraints pydantic stores in field metadata
+BOUND_CHECKS = {
+    "ge": (np.greater_equal, "greater than or equal to"),
+    "gt": (np.greater, "greater than"),
+    "le": (np.less_equal, "less than or equal to"),
+    "lt": (np.less, "less than"),
+}
+
+def _field_rules(field_info) -> List[Tuple[str, Any]]:
+    """
+    Returns (rule_name, bound) pairs derived from a pydantic field's metadata.
+    """
+    rules = []
+    for constraint in field_info.metadata:
+        for attr in BOUND_CHECKS:
+            if hasattr(constraint, attr):
+                rules.append((attr, getattr(constraint, attr)))
+    return rules
+
+def _type_violations(series: pd.Series, annotation) -> Tuple[pd.Series, pd.Series]:
+    """
+    Coerces a whole column the way pydantic would coerce each cell.
+    Returns (coerced_values, invalid_mask), where invalid_mask covers nulls and
+    values that cannot be converted to the field's type.
+    """
+    nulls = series.isna()
+    if annotation is str:
+        if pd.api.types.is_string_dtype(series.dtype) and pd.api.types.infer_dtype(series, skipna=True) in ("string", "empty"):
+            return series, nulls
+        return series, nulls | ~series.map(lambda value: isinstance(value, str)).astype(bool)
+
+    if annotation is datetime:
+        if pd.api.types.is_datetime64_any_dtype(series.dtype) or pd.api.types.is_numeric_dtype(series.dtype):
+            return series, nulls
+        coerced = pd.to_datetime(series, errors="coerce", format="mixed")
+        return coerced, nulls | coerced.isna()
+
+    if annotation in (int, float):
+        coerced = series if pd.api.types.is_numeric_dtype(series.dtype) else pd.to_numeric(series, errors="coerce")
+        coerced = coerced.astype("float64")
+        invalid = nulls | coerced.isna()
+        if annotation is int:
+            invalid |= ~np.isfinite(coerced) | (np.mod(coerced, 1) != 0)
+        return coerced, invalid
+
+    # Unknown annotation: only enforce presence
+    return series, nulls
+
+def find_violations(df: pd.DataFrame, max_rows_per_rule: int = 5) -> Dict[str, Dict[str, Any]]:
     """
-    Validates that the DataFrame contains the required columns and types using Pydantic.
+    Runs every InputSchema rule as a whole-column operation.
+
+    Returns a mapping of rule description -> {"count": total violating rows,
+    "rows": first `max_rows_per_rule` violating row labels, "positions": their
+    integer positions}. Only rules with at least one violation are included.
+    """
+    violations = {}
+
+    def record(rule: str, mask: pd.Series):
+        mask = np.asarray(mask, dtype=bool)
+        count = int(mask.sum())
+        if count:
+            positions = np.flatnonzero(mask)[:max_rows_per_rule]
+            violations[rule] = {"count": count, "rows": df.index[positions].tolist(), "positions": positions.tolist()}
+
+    for field_name, field_info in InputSchema.model_fields.items():
+        values, invalid = _type_violations(df[field_name], field_info.annotation)
+        record(f"{field_name}: null or not a valid {field_info.annotation.__name__}", invalid)
+
+        for attr, bound in _field_rules(field_info):
+            check, description = BOUND_CHECKS[attr]
+            with np.errstate(invalid="ignore"):
+                passes = check(values.to_numpy(dtype="float64"), bound)
+            # Rows that already failed the type check are not reported twice
+            record(f"{field_name}: must be {description} {bound}", ~passes & ~np.asarray(invalid, dtype=bool))
+
+    return violations
+
+def validate_schema(df: pd.DataFrame, max_errors: int = 5) -> bool:
+    """
+    Validates that the DataFrame contains the required columns and types using the
+    InputSchema field definitions.
+
+    Rules (type coercion, nulls, ge/le bounds) run as vectorized column operations.
+    Pydantic is then only invoked on the first few offending rows so the reported
+    messages match a per-row InputSchema validation exactly.
     """
     logger.info("Starting strict schema validation...")
-    
+
     # Check for required columns first (fast fail)
-    required_fields = InputSchema.__fields__.keys()
+    required_fields = InputSchema.model_fields.keys()
     missing_columns = [field for field in required_fields if field not in df.columns]
-    
+
     if missing_columns:
         error_msg = f"Schema Validation Failed: Missing columns: {missing_columns}"
         logger.error(error_msg)
         raise SchemaValidationError(error_msg)
-    
-    # Validate each row
+
+    violations = find_violations(df, max_rows_per_rule=max_errors)
+    if not violations:
+        logger.info("✅ Data schema validation passed.")
+        return True
+
+    # Explain the first few offending rows (in frame order) with pydantic's own messages
+    flagged = set()
+    for violation in violations.values():
+        flagged.update(violation["positions"])
+
     errors = []
-    for index, row in df.iterrows():
+    for position in sorted(flagged)[:max_errors]:
+        index = df.index[position]
         try:
-            InputSchema(**row.to_dict())
+            InputSchema(**df.iloc[position].to_dict())
+            # Stricter than pydantic (e.g. nulls in an unconstrained column): describe the rule instead
+            rules = [rule for rule, violation in violations.items() if position in violation["positions"]]
+            errors.append(f"Row {index}: {'; '.join(rules)}")
         except ValidationError as e:
             errors.append(f"Row {index}: {e}")
-            if len(errors) >= 5: # Limit error reporting
-                break
-    
-    if errors:
-        error_msg = f"Schema Validation Failed with {len(errors)} errors. First few:\n" + "\n".join(errors)
-        logger.error(error_msg)
-        raise SchemaValidationError(error_msg)
-    
-    logger.info("✅ Data schema validation passed.")
-    return True
+
+    summary = "\n".join(
+        f"- {rule}: {violation['count']} rows (first: {violation['rows']})"
+        for rule, violation in violations.items()
+    )
+    error_msg = f"Schema Validation Failed with {len(errors)} errors. First few:\n" + "\n".join(errors) + f"\nViolations by rule:\n{summary}"
+    logger.error(error_msg)
+    raise SchemaValidationError(error_msg)
@@ -0,0 +1,28 @@
+import copy
+import pytest
+from src.agents import data_agent
+from src.utils import llm, plan_library, step_memo
+from src.utils.config import load_config
+from src.utils.rate_limiter import TokenBucketRateLimiter
+
+@pytest.fixture(autouse=True)
+def unlimited_rate(monkeypatch):
+    """
+    A fresh, unlimited rate limiter for every test, so that LLM calls in one test
+    never drain the process-wide budget and slow down the tests after it.
+    """
+    monkeypatch.setattr(llm, "rate_limiter", TokenBucketRateLimiter(requests_per_minute=1e9, tokens_per_minute=1e12))
+
+@pytest.fixture
+def isolated_config(monkeypatch):
+    """
+    The shared config dict and the module-level caches, restored after the test,
+    for tests that run the pipeline through benchmark.configure_offline.
+    """
+    config = load_config()
+    saved = copy.deepcopy(config)
+    for module, name in [(llm, "llm_cache"), (data_agent, "code_memo"), (data_agent, "result_memo"), (step_memo, "step_memo"), (plan_library, "plan_library")]:
+        monkeypatch.setattr(module, name, getattr(module, name))
+    yield config
+    config.clear()
+    config.update(saved)
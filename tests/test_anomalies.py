@@ -0,0 +1,60 @@
+import asyncio
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from src.utils.anomalies import precompute_anomalies, rolling_zscores
+from src.utils.metric_cube import MetricCube
+
+@pytest.fixture
+def cube():
+    # Campaign A's ROAS falls by 30% from 2025-01-22 on; everything else is noise
+    rng = np.random.default_rng(1)
+    dates = pd.date_range("2025-01-01", periods=28)
+    rows = []
+    for campaign in ["Campaign A", "Campaign B", "Campaign C"]:
+        for creative in ["Video", "Image"]:
+            for i, date in enumerate(dates):
+                spend = 100.0 * rng.uniform(0.9, 1.1)
+                drop = 0.7 if campaign == "Campaign A" and i >= 21 else 1.0
+                rows.append({"date": date, "campaign_name": campaign, "adset_name": f"{campaign} adset", "creative_type": creative,
+                             "spend": spend, "revenue": spend * 3.0 * drop * rng.uniform(0.97, 1.03),
+                             "impressions": int(10000 * rng.uniform(0.95, 1.05)), "clicks": int(200 * rng.uniform(0.95, 1.05))})
+    return MetricCube(pd.DataFrame(rows))
+
+def test_rolling_zscores_match_pandas():
+    series = np.random.default_rng(0).normal(size=(3, 30))
+    series[1, 5] = np.nan
+    frame = pd.DataFrame(series.T)
+    mean = frame.rolling(7, min_periods=3).mean().shift(1).to_numpy().T[:, 7:]
+    std = frame.rolling(7, min_periods=3).std(ddof=0).shift(1).to_numpy().T[:, 7:]
+    np.testing.assert_allclose(rolling_zscores(series, 7), (series[:, 7:] - mean) / std, rtol=1e-6)
+
+def test_drop_is_ranked_first_with_its_change_point(cube):
+    table = precompute_anomalies(cube, metrics=["roas", "spend"], dimensions=["campaign_name", "creative_type"], window=7, recent_days=7)
+    top = table.iloc[0]
+    assert (top["metric"], top["segment"]) in {("roas", "Campaign A"), ("roas", "All")}
+    campaign = table[(table["metric"] == "roas") & (table["segment"] == "Campaign A")].iloc[0]
+    assert campaign["change_date"] == "2025-01-22"
+    assert campaign["z_score"] < -3 and campaign["change_pct"] < -25
+    # Campaign A accounts for (nearly) all of the account-level ROAS drop
+    assert campaign["contribution_pct"] > 80
+    assert not ((table["segment"] == "Campaign B") & (table["metric"] == "roas")).any()
+
+def test_contributions_add_up_to_the_account_change(cube):
+    table = precompute_anomalies(cube, metrics=["roas"], dimensions=["campaign_name"], min_effect_pct=0, top_k=100)
+    campaigns = table[table["dimension"] == "campaign_name"]
+    assert len(campaigns) == 3
+    assert campaigns["contribution_pct"].sum() == pytest.approx(100, abs=0.5)
+    assert precompute_anomalies(cube, recent_days=20).empty
+
+def test_insight_step_survives_a_failed_precomputation(isolated_config, tmp_path, monkeypatch):
+    from src import benchmark
+    from src.agents.data_agent import DataAgent
+
+    def broken(self):
+        raise KeyError("spend")
+    monkeypatch.setattr(DataAgent, "anomaly_report", broken)
+    report = asyncio.run(benchmark.run_benchmark([120], "Analyze ROAS drop", sandbox=False, output_dir=str(tmp_path)))
+    assert report["sizes"][0]["status"] == "ok"
+    assert json.loads((tmp_path / "rows_120" / "insights.json").read_text())
@@ -0,0 +1,52 @@
+import asyncio
+import json
+import os
+import pytest
+from dotenv import load_dotenv
+
+load_dotenv(".env")
+if not os.getenv("GROQ_API_KEY"):
+    os.environ["GROQ_API_KEY"] = "placeholder_key_for_testing"
+
+from src import run
+
+def test_load_batch_assigns_unique_ids(tmp_path):
+    path = tmp_path / "queries.jsonl"
+    path.write_text(
+        '{"id": "roas drop", "query": "Analyze ROAS drop"}\n'
+        '\n'
+        '{"query": "Top campaigns by CTR"}\n'
+        '{"id": "roas drop", "query": "Analyze ROAS drop again"}\n'
+    )
+    queries = run.load_batch(str(path))
+    assert [query_id for query_id, _ in queries] == ["roas_drop", "q002", "roas_drop_3"]
+    assert queries[1][1] == "Top campaigns by CTR"
+
+def test_load_batch_rejects_lines_without_query(tmp_path):
+    path = tmp_path / "queries.jsonl"
+    path.write_text('{"id": "a"}\n')
+    with pytest.raises(ValueError):
+        run.load_batch(str(path))
+
+def test_run_batch_bounds_concurrency_and_writes_summary(tmp_path, monkeypatch):
+    active = {"now": 0, "peak": 0}
+
+    async def fake_run_query(query, agents, output_dir="reports"):
+        active["now"] += 1
+        active["peak"] = max(active["peak"], active["now"])
+        await asyncio.sleep(0.01)
+        active["now"] -= 1
+        if query == "boom":
+            raise RuntimeError("planner exploded")
+        return {"query": query, "status": "ok", "output_dir": output_dir, "latency_seconds": 0.01}
+
+    monkeypatch.setattr(run, "run_query", fake_run_query)
+    queries = [(f"q{i}", f"query {i}") for i in range(5)] + [("bad", "boom")]
+    summary = asyncio.run(run.run_batch(queries, agents=None, output_dir=str(tmp_path), concurrency=2))
+
+    assert active["peak"] == 2
+    assert summary["queries"] == 6 and summary["succeeded"] == 5
+    assert summary["results"][0]["output_dir"] == os.path.join(str(tmp_path), "q0")
+    assert summary["results"][-1]["status"] == "failed"
+    with open(tmp_path / "summary.json") as f:
+        assert json.load(f)["succeeded"] == 5
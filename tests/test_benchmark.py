@@ -0,0 +1,42 @@
+import asyncio
+from langchain_core.messages import HumanMessage, SystemMessage
+from src import benchmark
+from src.agents.planner import Plan
+from src.schema import CreativeOutput, OperationCall
+from src.utils import llm
+from src.utils.fake_llm import FakeChatModel
+
+def test_fake_llm_answers_every_schema():
+    fake = FakeChatModel()
+    plan = fake.with_structured_output(Plan).invoke([HumanMessage(content="Analyze ROAS drop")])
+    assert [s.agent for s in plan.steps].count("DataAgent") == 3
+
+    call = fake.with_structured_output(OperationCall).invoke([HumanMessage(content="Get top 5 ads by ROAS")])
+    assert call.operation == "top_n"
+
+    raw = fake.with_structured_output(CreativeOutput, include_raw=True).invoke([HumanMessage(content="x")])
+    assert raw["parsed"].recommendations and raw["raw"].usage_metadata["total_tokens"] > 0
+
+    code = fake.invoke([SystemMessage(content="You are a Data Agent ..."), HumanMessage(content="anything")])
+    assert "df.groupby" in code.content
+    assert fake.invoke([HumanMessage(content="Evaluate")]).content == "PASS"
+
+def test_create_llm_switches_to_fake(monkeypatch):
+    monkeypatch.setenv("KASPARRO_FAKE_LLM", "1")
+    monkeypatch.setenv("KASPARRO_FAKE_LLM_LATENCY", "0.25")
+    model = llm.create_llm(temperature=0)
+    assert isinstance(model, FakeChatModel) and model.latency_seconds == 0.25
+
+def test_offline_benchmark_reports_every_stage(isolated_config, tmp_path):
+    report = asyncio.run(benchmark.run_benchmark([150], "Analyze ROAS drop", sandbox=False, output_dir=str(tmp_path)))
+    entry = report["sizes"][0]
+    assert entry["status"] == "ok"
+    assert list(entry["stages"]) == benchmark.STAGES
+    assert entry["stages"]["execute"]["llm_calls"] > 0 and entry["stages"]["execute"]["prompt_tokens"] > 0
+    assert all(step["ok"] for step in entry["steps"])
+    assert (tmp_path / "rows_150" / "report.md").exists()
+
+def test_baseline_comparison_flags_only_real_regressions():
+    baseline = {"sizes": [{"rows": 100, "stages": {"execute": {"wall_seconds": 1.0}, "plan": {"wall_seconds": 0.001}}}]}
+    current = [{"rows": 100, "stages": {"execute": {"wall_seconds": 1.5}, "plan": {"wall_seconds": 0.004}}}]
+    assert benchmark.compare_to_baseline(current, baseline, tolerance=0.25) == ["100 rows / execute: 1.000s -> 1.500s"]
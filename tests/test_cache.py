@@ -0,0 +1,64 @@
+import time
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from src.utils import llm as llm_module
+from src.utils.cache import DiskCache, content_hash
+
+class CountingLLM:
+    model_name = "test-model"
+
+    def __init__(self, temperature=0.0):
+        self.temperature = temperature
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        return AIMessage(content=f"answer {self.calls}")
+
+def test_content_hash_is_order_independent():
+    assert content_hash({"a": 1, "b": 2}) == content_hash({"b": 2, "a": 1})
+    assert content_hash({"a": 1}) != content_hash({"a": 2})
+
+def test_disk_cache_roundtrip_and_stats(tmp_path):
+    cache = DiskCache(str(tmp_path / "c.sqlite"))
+    assert cache.get("k") is None
+    cache.set("k", "v")
+    assert cache.get("k") == "v"
+    assert cache.stats() == {"hits": 1, "misses": 1, "evictions": 0}
+
+def test_disk_cache_ttl_expiry(tmp_path):
+    cache = DiskCache(str(tmp_path / "c.sqlite"), ttl_seconds=0.05)
+    cache.set("k", "v")
+    time.sleep(0.1)
+    assert cache.get("k") is None
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(str(tmp_path / "c.sqlite"), max_size_mb=2.5 / 1024) # 2.5 KB
+    cache.set("old", "x" * 1024)
+    cache.set("recent", "y" * 1024)
+    cache.get("old") # "old" is now the most recently used
+    cache.set("new", "z" * 1024)
+    assert cache.get("recent") is None
+    assert cache.get("old") is not None
+    assert cache.get("new") is not None
+    assert cache.evictions == 1
+
+def test_invoke_llm_serves_repeat_calls_from_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_module, "llm_cache", DiskCache(str(tmp_path / "llm.sqlite")))
+    llm = CountingLLM()
+    messages = [SystemMessage(content="system"), HumanMessage(content="question")]
+
+    first = llm_module.invoke_llm(llm, messages)
+    second = llm_module.invoke_llm(llm, messages)
+    assert first.content == second.content == "answer 1"
+    assert llm.calls == 1
+
+    llm_module.invoke_llm(llm, [SystemMessage(content="system"), HumanMessage(content="other")])
+    assert llm.calls == 2
+
+def test_invoke_llm_skips_cache_for_sampled_calls(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_module, "llm_cache", DiskCache(str(tmp_path / "llm.sqlite")))
+    llm = CountingLLM(temperature=0.7)
+    messages = [HumanMessage(content="write an ad")]
+    llm_module.invoke_llm(llm, messages)
+    llm_module.invoke_llm(llm, messages)
+    assert llm.calls == 2
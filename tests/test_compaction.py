@@ -0,0 +1,38 @@
+import pandas as pd
+from src.utils.compaction import compact_table, compact_text
+from src.utils.llm import estimate_tokens
+
+def daily_table(rows=60):
+    df = pd.DataFrame({
+        "date": pd.date_range("2025-01-01", periods=rows).strftime("%Y-%m-%d"),
+        "platform": ["Instagram"] * rows,
+        "spend": [100.0 + (i % 5) for i in range(rows)],
+    })
+    df.loc[30, "spend"] = 5000.0 # spike that must survive compaction
+    return df.to_markdown(index=False)
+
+def test_small_tables_are_untouched():
+    table = pd.DataFrame({"a": [1, 2], "b": [3, 4]}).to_markdown(index=False)
+    assert compact_table(table.split("\n"), max_rows=10) == table.split("\n")
+
+def test_table_keeps_edges_and_outliers_and_collapses_constants():
+    lines = compact_table(daily_table().split("\n"), max_rows=8, edge_rows=3, outlier_rows=2)
+    text = "\n".join(lines)
+    assert "2025-01-01" in text and "2025-03-01" in text # head and tail
+    assert "5000" in text # outlier
+    assert "Instagram" not in lines[0] # constant column dropped from the header
+    assert "Same in every row: platform = Instagram" in text
+    assert "Showing 7 of 60 rows" in text
+    assert "Omitted rows: spend min" in text
+
+def test_compact_text_fits_budget_and_keeps_prose():
+    text = "### Data Output (Daily spend):\n" + daily_table(400)
+    compacted = compact_text(text, token_budget=400)
+    assert estimate_tokens([compacted]) <= 400
+    assert compacted.startswith("### Data Output (Daily spend):")
+    assert "5000" in compacted
+
+def test_compact_text_truncates_as_last_resort():
+    compacted = compact_text("word " * 2000, token_budget=100)
+    assert estimate_tokens([compacted]) <= 100
+    assert compacted.endswith("_[Truncated to fit the context budget.]_")
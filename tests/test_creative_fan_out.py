@@ -0,0 +1,114 @@
+import asyncio
+import json
+import pytest
+from src.agents import creative_generator as creative_module
+from src.agents.creative_generator import CreativeGenerator, merge_outputs, shard_insights
+from src.schema import CreativeOutput
+from src.utils import error_handler
+
+real_sleep = asyncio.sleep
+
+TOP_ADS = "| campaign_name | roas |\n|:--|--:|\n| Campaign A | 2.1 |\n| Campaign B | 3.4 |"
+
+def insight(segment, metric="roas"):
+    return {"hypothesis": f"{segment} fatigue", "impact": "High", "confidence": 0.7, "reasoning": "...",
+            "evidence": [{"metric": metric, "delta": "-20%", "segment": segment}]}
+
+INSIGHTS = json.dumps([insight("Campaign A"), insight("Campaign B"), insight("Campaign A", "ctr")])
+
+class ShardLLM:
+    """
+    Answers each shard with a recommendation for the campaigns in its prompt;
+    shards listed in `fail` return malformed output the first `failures` times.
+    """
+    temperature = 0.7
+    model_name = "test-model"
+
+    def __init__(self, fail=(), failures=1, delay=0.05):
+        self.fail = set(fail)
+        self.failures = failures
+        self.delay = delay
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def with_structured_output(self, schema, include_raw=False):
+        llm = self
+
+        class Runnable:
+            async def ainvoke(self, messages):
+                text = messages[-1].content
+                campaign = "Campaign A" if "Campaign A fatigue" in text else "Campaign B"
+                llm.calls.append(campaign)
+                llm.in_flight += 1
+                llm.max_in_flight = max(llm.max_in_flight, llm.in_flight)
+                await real_sleep(llm.delay)
+                llm.in_flight -= 1
+                if campaign in llm.fail and llm.calls.count(campaign) <= llm.failures:
+                    raise ValueError("malformed JSON")
+                return CreativeOutput.model_validate({"recommendations": [{
+                    "campaign_name": campaign, "current_performance_issue": "ROAS down", "suggested_headline": f"New {campaign}",
+                    "suggested_message": "...", "reasoning": "..."}]})
+
+            def invoke(self, messages):
+                return asyncio.run(self.ainvoke(messages))
+        return Runnable()
+
+@pytest.fixture
+def generator(monkeypatch):
+    monkeypatch.setattr(creative_module, "fan_out_settings", {"fan_out": "campaign", "max_concurrency": 4})
+    # Only the retry backoff is skipped; the fake LLM keeps its own reference to the real sleep
+    async def no_backoff(seconds):
+        await real_sleep(0)
+    monkeypatch.setattr(error_handler.asyncio, "sleep", no_backoff)
+    agent = CreativeGenerator.__new__(CreativeGenerator)
+    agent.llm = ShardLLM()
+    agent.campaigns = ["Campaign A", "Campaign B"]
+    return agent
+
+def test_shards_by_campaign_and_by_insight():
+    by_campaign = shard_insights(INSIGHTS, TOP_ADS, "campaign")
+    assert [label for label, _, _ in by_campaign] == ["Campaign A", "Campaign B"]
+    assert len(json.loads(by_campaign[0][1])) == 2
+    assert "Campaign B" not in by_campaign[0][2] and "Campaign A" in by_campaign[0][2]
+    assert len(shard_insights(INSIGHTS, TOP_ADS, "insight")) == 3
+    assert len(shard_insights(INSIGHTS, TOP_ADS, "off")) == 1
+
+def test_segments_are_resolved_to_dataset_campaigns():
+    top_ads = "|    | campaign_name | ad_name | roas |\n|---:|:--|:--|--:|\n| 0 | A | Ad for AB | 2.1 |\n| 1 | AB | Ad 2 | 3.4 |\n| 2 | B | Ad 3 | 1.2 |"
+    insights = json.dumps([insight("a / Instagram"), insight("Instagram"), insight("25-34"), insight("AB")])
+    shards = {label: (json.loads(batch), context) for label, batch, context in shard_insights(insights, top_ads, "campaign", ["A", "AB", "B"])}
+    assert list(shards) == ["A", "account-wide", "AB"]
+    # Platforms and audiences are not campaigns: one account-wide shard with the full context
+    assert len(shards["account-wide"][0]) == 2 and shards["account-wide"][1] == top_ads
+    # Rows are kept on an exact campaign_name match, not on a substring anywhere in the row
+    assert shards["A"][1].splitlines()[2:] == ["| 0 | A | Ad for AB | 2.1 |"]
+    assert shards["AB"][1].splitlines()[2:] == ["| 1 | AB | Ad 2 | 3.4 |"]
+
+def test_shards_run_concurrently_and_merge(generator):
+    output = asyncio.run(generator.agenerate(INSIGHTS, TOP_ADS))
+    assert [r.campaign_name for r in output.recommendations] == ["Campaign A", "Campaign B"]
+    assert generator.llm.max_in_flight == 2
+
+def test_only_failed_shards_are_retried(generator):
+    generator.llm = ShardLLM(fail={"Campaign B"})
+    output = asyncio.run(generator.agenerate(INSIGHTS, TOP_ADS))
+    assert len(output.recommendations) == 2
+    assert generator.llm.calls.count("Campaign A") == 1 and generator.llm.calls.count("Campaign B") == 2
+
+def test_exhausted_shard_keeps_the_others(generator):
+    generator.llm = ShardLLM(fail={"Campaign B"}, failures=10)
+    output = generator.generate(INSIGHTS, TOP_ADS)
+    assert [r.campaign_name for r in output.recommendations] == ["Campaign A"]
+
+def test_sync_generate_works_inside_a_running_loop(generator):
+    async def caller():
+        return generator.generate(INSIGHTS, TOP_ADS)
+    output = asyncio.run(caller())
+    assert [r.campaign_name for r in output.recommendations] == ["Campaign A", "Campaign B"]
+
+def test_merge_drops_duplicates():
+    rec = {"campaign_name": "A", "current_performance_issue": "x", "suggested_headline": "h", "suggested_message": "m", "reasoning": "r"}
+    one = CreativeOutput.model_validate({"recommendations": [rec]})
+    assert len(merge_outputs([one, None, one]).recommendations) == 1
+    assert merge_outputs([None]) is None
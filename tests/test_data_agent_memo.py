@@ -0,0 +1,99 @@
+import pandas as pd
+import pytest
+from langchain_core.messages import AIMessage
+from src.agents import data_agent as data_agent_module
+from src.agents.data_agent import DataAgent, normalize_instruction
+from src.utils.cache import DiskCache
+from src.utils.metric_cube import MetricCube
+from src.schema import OperationCall
+
+class CodeLLM:
+    # Sampling temperature keeps the shared LLM response cache out of the way
+    temperature = 0.7
+    model_name = "test-model"
+
+    def __init__(self, code):
+        self.code = code
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        return AIMessage(content=f"```python\n{self.code}\n```")
+
+class RoutingLLM(CodeLLM):
+    def __init__(self, code, call):
+        super().__init__(code)
+        self.call = call
+
+    def with_structured_output(self, schema, include_raw=False):
+        llm = self
+        class Runnable:
+            def invoke(self, messages):
+                return {"raw": AIMessage(content=""), "parsed": llm.call, "parsing_error": None}
+        return Runnable()
+
+def make_agent(code, fingerprint="v1"):
+    agent = DataAgent.__new__(DataAgent)
+    agent.df = pd.DataFrame({
+        "date": pd.to_datetime(["2025-01-01", "2025-01-02"]),
+        "campaign_name": ["A", "B"],
+        "spend": [10.0, 20.0],
+        "impressions": [1000, 2000],
+        "clicks": [10, 20],
+        "revenue": [30.0, 20.0],
+    })
+    agent.cube = MetricCube(agent.df)
+    agent.data_fingerprint = fingerprint
+    agent.data_lineage = fingerprint
+    agent.sandbox = None
+    agent.llm = CodeLLM(code)
+    return agent
+
+@pytest.fixture(autouse=True)
+def memos(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_agent_module, "code_memo", DiskCache(str(tmp_path / "code.sqlite")))
+    monkeypatch.setattr(data_agent_module, "result_memo", DiskCache(str(tmp_path / "results.sqlite")))
+
+def test_normalize_instruction():
+    assert normalize_instruction("  Get top 5 ads   by ROAS. ") == "get top 5 ads by roas"
+
+def test_repeated_instruction_skips_llm_and_execution(monkeypatch):
+    agent = make_agent("result = df['spend'].sum()")
+    first = agent.execute("Total spend")
+
+    runs = []
+    original = DataAgent._run_code
+    monkeypatch.setattr(DataAgent, "_run_code", lambda self, *args: runs.append(args) or original(self, *args))
+    second = agent.execute("total   spend.")
+
+    assert first == second == "30.0"
+    assert agent.llm.calls == 1
+    assert runs == []
+
+def test_data_change_invalidates_memos():
+    agent = make_agent("result = df['spend'].sum()")
+    agent.execute("Total spend")
+
+    changed = make_agent("result = df['spend'].sum()", fingerprint="v2")
+    changed.df["spend"] = [1.0, 2.0]
+    assert changed.execute("Total spend") == "3.0"
+    assert changed.llm.calls == 1
+
+def test_failing_code_is_not_memoized(monkeypatch):
+    monkeypatch.setattr("src.utils.error_handler.time.sleep", lambda seconds: None)
+    agent = make_agent("result = df['missing_column'].sum()")
+    assert agent.execute("Broken instruction").startswith("Error")
+    assert data_agent_module.code_memo.get(agent._code_key("Broken instruction")) is None
+
+def test_catalog_operation_skips_code_generation():
+    agent = make_agent("result = 'generated'")
+    agent.llm = RoutingLLM("result = 'generated'", OperationCall(operation="segment_breakdown", metrics=["spend"], dimensions=["campaign_name"]))
+    result = agent.execute("Spend by campaign")
+    assert "20" in result and "generated" not in result
+    assert agent.llm.calls == 0
+
+def test_free_form_falls_back_to_code_generation():
+    agent = make_agent("result = df['spend'].sum()")
+    agent.llm = RoutingLLM("result = df['spend'].sum()", OperationCall(operation="free_form"))
+    assert agent.execute("Something bespoke") == "30.0"
+    assert agent.llm.calls == 1
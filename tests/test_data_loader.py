@@ -0,0 +1,53 @@
+import os
+import pandas as pd
+import pytest
+from src.utils import data_loader
+
+pytest.importorskip("pyarrow")
+
+def write_csv(path, rows=10, spend=50.0):
+    pd.DataFrame({
+        "campaign_name": ["Campaign A"] * rows,
+        "adset_name": ["Adset 1"] * rows,
+        "date": pd.date_range("2025-01-01", periods=rows).strftime("%Y-%m-%d"),
+        "spend": [spend] * rows,
+        "impressions": [1000] * rows,
+        "clicks": [20] * rows,
+        "ctr": [0.02] * rows,
+        "roas": [2.0] * rows
+    }).to_csv(path, index=False)
+
+@pytest.fixture
+def snapshot_dir(tmp_path, monkeypatch):
+    snapshot_dir = tmp_path / "snapshots"
+    monkeypatch.setitem(data_loader.config, "cache", {"snapshot": {"enabled": True, "dir": str(snapshot_dir)}})
+    return snapshot_dir
+
+def test_second_load_uses_snapshot_and_skips_validation(tmp_path, snapshot_dir, monkeypatch):
+    csv_path = str(tmp_path / "ads.csv")
+    write_csv(csv_path)
+    calls = []
+    monkeypatch.setattr(data_loader, "validate_schema", lambda df: calls.append(len(df)) or True)
+
+    first, first_id = data_loader.load_dataset(csv_path)
+    second, second_id = data_loader.load_dataset(csv_path)
+
+    assert calls == [10]
+    assert first_id == second_id
+    assert len(os.listdir(snapshot_dir)) == 1
+    pd.testing.assert_frame_equal(first, second, check_dtype=False)
+    assert pd.api.types.is_datetime64_any_dtype(second["date"])
+    assert {"cpm", "cpc"} <= set(second.columns)
+
+def test_changed_file_invalidates_snapshot(tmp_path, snapshot_dir):
+    csv_path = str(tmp_path / "ads.csv")
+    write_csv(csv_path)
+    _, first_id = data_loader.load_dataset(csv_path)
+
+    write_csv(csv_path, rows=12, spend=75.0)
+    df, second_id = data_loader.load_dataset(csv_path)
+
+    assert first_id != second_id
+    assert len(df) == 12
+    # The stale snapshot of the same source is replaced, not accumulated
+    assert len(os.listdir(snapshot_dir)) == 1
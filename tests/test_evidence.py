@@ -0,0 +1,111 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from langchain_core.messages import AIMessage
+from src.agents.evaluator import EvaluatorAgent
+from src.utils.evidence import EvidenceVerifier, parse_delta
+from src.utils.metric_cube import MetricCube
+
+class CountingLLM:
+    temperature = 0.7
+    model_name = "test-model"
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        return AIMessage(content="PASS")
+
+@pytest.fixture
+def cube():
+    # Campaign A's ROAS falls by 20% over the last 7 of 28 days; Campaign B stays flat
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2025-01-01", periods=28)
+    rows = []
+    for campaign, drop in [("Campaign A", 0.8), ("Campaign B", 1.0)]:
+        for i, date in enumerate(dates):
+            spend = 100.0 * rng.uniform(0.9, 1.1)
+            roas = 3.0 * (drop if i >= 21 else 1.0) * rng.uniform(0.98, 1.02)
+            rows.append({"date": date, "campaign_name": campaign, "adset_name": "Adset 1", "spend": spend,
+                         "revenue": spend * roas, "impressions": 10000, "clicks": 200})
+    return MetricCube(pd.DataFrame(rows))
+
+def insights(*evidence, confidence=0.8):
+    return json.dumps([{
+        "hypothesis": "Creative fatigue", "impact": "High", "confidence": confidence, "reasoning": "...",
+        "evidence": [{"metric": m, "delta": d, "segment": s} for m, d, s in evidence],
+    }])
+
+def make_evaluator():
+    agent = EvaluatorAgent.__new__(EvaluatorAgent)
+    agent.llm = CountingLLM()
+    return agent
+
+REPORT = "# Report\n## Strategic Insights\n...\n## Creative Recommendations\n### Campaign: Campaign A\n"
+
+def test_parse_delta():
+    assert parse_delta("-32%") == -32.0
+    assert parse_delta("dropped 12.5 %") == -12.5
+    assert parse_delta("+15%") == 15.0
+    assert parse_delta("2.1x") is None
+
+def test_claims_are_checked_against_the_data(cube):
+    verifier = EvidenceVerifier(cube, windows=[7], samples=500)
+    verified = verifier.check("ROAS", "-20%", "Campaign A")
+    assert verified["status"] == "verified"
+    assert -23 < verified["observed_pct"] < -17
+    assert verified["ci_low_pct"] <= verified["observed_pct"] <= verified["ci_high_pct"]
+    assert verifier.check("roas", "+25%", "Campaign A")["status"] == "contradicted"
+    assert verifier.check("roas", "-20%", "Campaign B")["status"] == "contradicted"
+    assert verifier.check("roas", "-20%", "Campaign A / Adset 1")["status"] == "verified"
+    assert verifier.check("roas", "-20%", "Largest campaign")["reason"] == "unknown segment"
+    # Seeded bootstrap: the same claim always gets the same interval
+    assert verifier.check("ROAS", "-20%", "Campaign A") == verified
+
+def test_statistical_failures_skip_the_llm():
+    evaluator = make_evaluator()
+    result = evaluator.evaluate("Analyze ROAS drop", REPORT, insights(("roas", "-20%", "Campaign A"), confidence=1.5))
+    assert result.startswith("FAIL: Statistical validation found 1 issue")
+    assert evaluator.llm.calls == 0
+
+def test_contradicted_evidence_fails_without_llm(cube):
+    evaluator = make_evaluator()
+    # Campaign A's ROAS fell, so a rise is wrong whatever period the claim is about
+    result = evaluator.evaluate("Analyze ROAS drop", REPORT, insights(("roas", "+25%", "Campaign A")), cube)
+    assert result.startswith("FAIL: 1 evidence delta(s) contradicted") and "Campaign A" in result
+    assert evaluator.llm.calls == 0
+
+def test_claims_about_other_periods_go_to_the_llm(cube):
+    evaluator = make_evaluator()
+    # Campaign B is flat in the checked windows, but the claim may be about another period
+    assert evaluator.evaluate("Analyze ROAS drop", REPORT, insights(("roas", "-40%", "Campaign B")), cube) == "PASS"
+    assert evaluator.llm.calls == 1
+
+def test_zero_baseline_is_unverifiable():
+    dates = pd.date_range("2025-01-01", periods=28)
+    # No revenue before the last week: any change from there is infinite
+    rows = [{"date": date, "campaign_name": "Campaign C", "adset_name": "Adset 1", "spend": 100.0,
+             "revenue": 300.0 if i >= 21 else 0.0, "impressions": 10000, "clicks": 200} for i, date in enumerate(dates)]
+    verifier = EvidenceVerifier(MetricCube(pd.DataFrame(rows)), windows=[7, 14], samples=200)
+    result = verifier.check("roas", "+50%", "Campaign C")
+    assert result["status"] == "unverifiable" and "baseline" in result["reason"]
+
+def test_verified_evidence_passes_without_llm(cube):
+    evaluator = make_evaluator()
+    result = evaluator.evaluate("Analyze ROAS drop", REPORT, insights(("roas", "-20%", "Campaign A")), cube)
+    assert result.startswith("PASS") and evaluator.llm.calls == 0
+
+def test_reports_without_creatives_go_to_the_llm(cube):
+    evaluator = make_evaluator()
+    report = "# Report\n## Strategic Insights\nROAS fell in Campaign A.\n"
+    assert evaluator.evaluate("Analyze ROAS drop", report, insights(("roas", "-20%", "Campaign A")), cube) == "PASS"
+    assert evaluator.llm.calls == 1
+
+def test_unsettled_reports_go_to_the_llm(cube):
+    evaluator = make_evaluator()
+    assert evaluator.evaluate("Analyze ROAS drop", REPORT, insights(("roas", "-20%", "Largest campaign")), cube) == "PASS"
+    # The query asks about CTR, which no evidence covers
+    assert evaluator.evaluate("Why did CTR fall?", REPORT, insights(("roas", "-20%", "Campaign A")), cube) == "PASS"
+    assert evaluator.llm.calls == 2
@@ -0,0 +1,118 @@
+import os
+import pandas as pd
+import pytest
+from src.utils import data_loader
+from src.utils.cache import DiskCache
+from src.utils.step_memo import StepMemo, material_change
+
+pytest.importorskip("pyarrow")
+
+def frame(start, rows, spend=50.0):
+    return pd.DataFrame({
+        "campaign_name": ["Campaign A", "Campaign B"] * (rows // 2),
+        "adset_name": ["Adset 1"] * rows,
+        "date": pd.date_range(start, periods=rows // 2).repeat(2).strftime("%Y-%m-%d"),
+        "spend": [spend] * rows,
+        "impressions": [1000] * rows,
+        "clicks": [20] * rows,
+        "ctr": [0.02] * rows,
+        "roas": [2.0] * rows
+    })
+
+def append_csv(path, df):
+    df.to_csv(path, mode="a", header=not os.path.exists(path), index=False)
+
+@pytest.fixture
+def settings(tmp_path, monkeypatch):
+    monkeypatch.setitem(data_loader.config, "cache", {"snapshot": {"enabled": True, "dir": str(tmp_path / "snapshots")}})
+    ingestion = {"mode": "full", "incremental": True, "chunk_size": 7, "group_by": ["campaign_name", "adset_name", "date"]}
+    monkeypatch.setitem(data_loader.config, "data", {"ingestion": ingestion})
+    return ingestion
+
+def test_appended_rows_are_ingested_incrementally(tmp_path, settings, monkeypatch):
+    csv_path = str(tmp_path / "ads.csv")
+    append_csv(csv_path, frame("2025-01-01", 20))
+    _, first_id, first = data_loader.load_dataset_delta(csv_path)
+    assert first["mode"] == "full"
+
+    append_csv(csv_path, frame("2025-01-11", 4, spend=80.0))
+    validated = []
+    original = data_loader.validate_schema
+    monkeypatch.setattr(data_loader, "validate_schema", lambda df: validated.append(len(df)) or original(df))
+    df, second_id, delta = data_loader.load_dataset_delta(csv_path)
+
+    assert second_id != first_id
+    assert delta["mode"] == "incremental" and delta["new_rows"] == 4 and validated == [4]
+    assert delta["lineage"] == first["lineage"]
+    assert delta["previous_watermark"] == "2025-01-10" and delta["changed_to"] == "2025-01-12"
+    full = data_loader.prepare_frame(pd.read_csv(csv_path))
+    assert len(df) == len(full) == 24
+    assert df["spend"].sum() == full["spend"].sum()
+    assert df["date"].dtype == full["date"].dtype
+    # The snapshot hit on the next load keeps the lineage too
+    assert data_loader.load_dataset_delta(csv_path)[2] == {"mode": "snapshot", "new_rows": 0, "lineage": first["lineage"]}
+
+def test_rewritten_file_is_reloaded_in_full(tmp_path, settings):
+    csv_path = str(tmp_path / "ads.csv")
+    append_csv(csv_path, frame("2025-01-01", 20))
+    first = data_loader.load_dataset_delta(csv_path)[2]
+
+    os.remove(csv_path)
+    append_csv(csv_path, frame("2025-01-01", 24, spend=10.0))
+    df, _, delta = data_loader.load_dataset_delta(csv_path)
+    assert delta["mode"] == "full" and delta["lineage"] != first["lineage"]
+    assert df["spend"].sum() == 240.0
+
+def test_edited_history_with_appended_rows_is_reloaded_in_full(tmp_path, settings):
+    csv_path = str(tmp_path / "ads.csv")
+    append_csv(csv_path, frame("2025-01-01", 20))
+    data_loader.load_dataset_delta(csv_path)
+
+    # Same length, one historical value changed, then rows appended
+    with open(csv_path, "r+") as f:
+        content = f.read()
+        f.seek(0)
+        f.write(content.replace("50.0", "90.0", 1))
+    append_csv(csv_path, frame("2025-01-11", 4, spend=80.0))
+    df, _, delta = data_loader.load_dataset_delta(csv_path)
+    assert delta["mode"] == "full"
+    assert df["spend"].sum() == 50.0 * 19 + 90.0 + 80.0 * 4
+
+def test_streaming_aggregates_are_resumed(tmp_path, settings):
+    settings["mode"] = "streaming"
+    csv_path = str(tmp_path / "ads.csv")
+    append_csv(csv_path, frame("2025-01-01", 20))
+    data_loader.load_dataset_delta(csv_path)
+
+    # Overlapping date: the new rows must fold into existing groups
+    append_csv(csv_path, frame("2025-01-10", 4, spend=80.0))
+    df, _, delta = data_loader.load_dataset_delta(csv_path)
+    assert delta["mode"] == "incremental"
+
+    settings["incremental"] = False
+    os.utime(csv_path, (0, 0))
+    full = data_loader.load_dataset_delta(csv_path)[0]
+    keys = settings["group_by"]
+    pd.testing.assert_frame_equal(
+        df.sort_values(keys).reset_index(drop=True)[["spend", "rows"]],
+        full.sort_values(keys).reset_index(drop=True)[["spend", "rows"]],
+        check_dtype=False
+    )
+
+def test_material_change():
+    old = "| 2025-01-10 | Campaign A | roas 2.00 | spend 1000 |"
+    assert not material_change(old, "| 2025-01-11 | Campaign A | roas 2.01 | spend 1010 |", 0.02)
+    assert material_change(old, "| 2025-01-11 | Campaign A | roas 1.50 | spend 1010 |", 0.02)
+    assert material_change(old, "| 2025-01-11 | Campaign B | roas 2.00 | spend 1000 |", 0.02)
+
+def test_step_memo_compares_against_the_original_inputs(tmp_path):
+    memo = StepMemo(DiskCache(str(tmp_path / "steps.sqlite")), tolerance=0.02)
+    key = StepMemo.key("Analyze ROAS", "InsightAgent", "Diagnose", "lineage")
+    memo.remember(key, "roas 2.00", "[insight]")
+
+    assert memo.recall(key, "roas 2.03") == "[insight]"
+    # Drift is measured from the run that produced the output, not the last reuse
+    assert memo.recall(key, "roas 2.06") is None
+    assert memo.recall(StepMemo.key("Analyze ROAS", "InsightAgent", "Diagnose", "other"), "roas 2.00") is None
+    # An edited prompt invalidates the stored outputs
+    assert StepMemo.key("Analyze ROAS", "InsightAgent", "Diagnose", "lineage", "edited prompt") != key
@@ -0,0 +1,58 @@
+import json
+import logging
+import queue
+import threading
+import pandas as pd
+import pytest
+from src.utils import logger as log_setup
+from src.utils.logger import BufferedQueueHandler, JsonFormatter, logger, summarize_payload
+
+@pytest.fixture
+def run_dir(tmp_path):
+    assert log_setup.current_run_dir is None
+    path = log_setup.start_run(log_dir=str(tmp_path))
+    yield path
+    log_setup.stop_run()
+
+def read_records(path):
+    with open(f"{path}/app.json") as f:
+        return [json.loads(line) for line in f]
+
+def test_payload_summaries_are_bounded_and_lazy():
+    df = pd.DataFrame({"spend": range(1_000_000)})
+    text = summarize_payload(df, limit=120)
+    assert text.startswith("DataFrame (1000000, 1)") and len(text) <= 123
+
+    calls = []
+    assert summarize_payload(lambda: calls.append(1) or "built") == "built"
+    assert calls == [1]
+    assert summarize_payload("x" * 500).endswith("...")
+
+def test_records_are_encoded_on_the_writer_thread(run_dir, monkeypatch):
+    threads = set()
+    original = JsonFormatter.format
+
+    def tracking_format(self, record):
+        threads.add(threading.current_thread().name)
+        return original(self, record)
+
+    monkeypatch.setattr(JsonFormatter, "format", tracking_format)
+    logger.decision("DataAgent", "instruction", pd.DataFrame({"roas": [1.0, 2.0]}), "Ran code")
+    try:
+        raise ValueError("bad column")
+    except ValueError:
+        logger.exception("Execution failed")
+    log_setup.stop_run()
+
+    assert threads and threading.current_thread().name not in threads
+    records = read_records(run_dir)
+    decision = next(r for r in records if "decision" in r)
+    assert decision["decision"]["output_summary"].startswith("DataFrame (2, 1)")
+    failure = next(r for r in records if r["message"] == "Execution failed")
+    assert "ValueError: bad column" in failure["exception"]
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = BufferedQueueHandler(queue.Queue(maxsize=1))
+    for i in range(3):
+        handler.emit(logging.makeLogRecord({"msg": f"record {i}"}))
+    assert handler.queue.qsize() == 1 and handler.dropped == 2
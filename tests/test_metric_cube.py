@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.utils.metric_cube import MetricCube
+
+@pytest.fixture
+def ads():
+    rng = np.random.default_rng(1)
+    n = 400
+    spend = rng.uniform(10, 100, n)
+    clicks = rng.integers(10, 100, n)
+    impressions = rng.integers(1000, 5000, n)
+    return pd.DataFrame({
+        "date": pd.date_range("2025-03-01", periods=20).repeat(n // 20),
+        "campaign_name": rng.choice(["Campaign A", "Campaign B", "Campaign C"], n),
+        "adset_name": rng.choice(["Adset 1", "Adset 2"], n),
+        "creative_type": rng.choice(["Image", "Video", "UGC"], n),
+        "audience_type": rng.choice(["Broad", "Lookalike"], n),
+        "platform": rng.choice(["Facebook", "Instagram"], n),
+        "spend": spend,
+        "impressions": impressions,
+        "clicks": clicks,
+        "purchases": rng.integers(0, 10, n),
+        "revenue": spend * rng.uniform(0.5, 4, n),
+    })
+
+def test_single_dimension_daily_matches_raw_groupby(ads):
+    cube = MetricCube(ads)
+    result = cube.query("campaign_name", metrics=["spend", "roas", "ctr"])
+    expected = ads.groupby(["campaign_name", "date"])[["spend", "revenue", "clicks", "impressions"]].sum()
+    np.testing.assert_allclose(result["spend"], expected["spend"])
+    np.testing.assert_allclose(result["roas"], expected["revenue"] / expected["spend"])
+    np.testing.assert_allclose(result["ctr"], expected["clicks"] / expected["impressions"])
+
+def test_multi_dimension_totals_are_order_independent(ads):
+    cube = MetricCube(ads)
+    a = cube.query(["creative_type", "audience_type"], by_date=False)
+    b = cube.query(["audience_type", "creative_type"], by_date=False)
+    pd.testing.assert_frame_equal(a, b)
+    expected = ads.groupby(["creative_type", "audience_type"])["revenue"].sum() / ads.groupby(["creative_type", "audience_type"])["spend"].sum()
+    np.testing.assert_allclose(a["roas"], expected)
+
+def test_date_range_and_filters(ads):
+    cube = MetricCube(ads)
+    result = cube.query("adset_name", by_date=False, start="2025-03-05", end="2025-03-10", filters={"platform": "Instagram"})
+    subset = ads[(ads["date"] >= "2025-03-05") & (ads["date"] <= "2025-03-10") & (ads["platform"] == "Instagram")]
+    expected = subset.groupby("adset_name")[["spend", "impressions"]].sum()
+    np.testing.assert_allclose(result["spend"], expected["spend"])
+    np.testing.assert_allclose(result["cpm"], expected["spend"] / expected["impressions"] * 1000)
+
+def test_overall_total_and_unknown_dimension(ads):
+    cube = MetricCube(ads)
+    total = cube.query(by_date=False)
+    assert total["spend"].iloc[0] == pytest.approx(ads["spend"].sum())
+    with pytest.raises(ValueError):
+        cube.query("not_a_column")
+
+def test_returned_frames_do_not_leak_into_cube(ads):
+    cube = MetricCube(ads)
+    first = cube.query("platform")
+    first["extra"] = 1
+    assert "extra" not in cube.query("platform").columns
@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+from src.schema import OperationCall
+from src.utils.metric_cube import MetricCube
+from src.utils.operations import run_operation
+
+@pytest.fixture
+def frame():
+    dates = pd.date_range("2025-01-01", periods=14)
+    rows = []
+    for i, day in enumerate(dates):
+        # Campaign A's ROAS halves in the second week, B stays flat
+        rows.append({"date": day, "campaign_name": "A", "creative_message": "Sale", "spend": 10.0,
+                     "impressions": 1000, "clicks": 20, "revenue": 40.0 if i < 7 else 20.0})
+        rows.append({"date": day, "campaign_name": "B", "creative_message": "New", "spend": 10.0,
+                     "impressions": 1000, "clicks": 10, "revenue": 30.0})
+    return pd.DataFrame(rows)
+
+def test_period_over_period_ranks_drops_first(frame):
+    cube = MetricCube(frame)
+    call = OperationCall(operation="period_over_period", metrics=["roas"], dimensions=["campaign_name"], last_n_days=7)
+    result = run_operation(call, cube, frame)
+    assert list(result.index) == ["A", "B"]
+    assert result.loc["A", "roas_change_pct"] == pytest.approx(-50.0)
+    assert result.loc["B", "roas_change_pct"] == pytest.approx(0.0)
+
+def test_top_n_ranks_ads_outside_the_cube(frame):
+    cube = MetricCube(frame)
+    call = OperationCall(operation="top_n", metrics=["roas"], n=1)
+    result = run_operation(call, cube, frame)
+    assert len(result) == 1
+    assert result.index[0][0] == "A"
+    assert result["roas"].iloc[0] == pytest.approx(420 / 140)
+
+def test_daily_trend_and_breakdown_match_raw_sums(frame):
+    cube = MetricCube(frame)
+    trend = run_operation(OperationCall(operation="daily_trend", metrics=["spend", "ctr"], last_n_days=3), cube, frame)
+    assert len(trend) == 3
+    assert trend["spend"].tolist() == [20.0, 20.0, 20.0]
+
+    breakdown = run_operation(OperationCall(operation="segment_breakdown", metrics=["clicks"], dimensions=["campaign_name"]), cube, frame)
+    assert breakdown["clicks"].to_dict() == frame.groupby("campaign_name")["clicks"].sum().to_dict()
+
+def test_correlation_needs_two_metrics(frame):
+    cube = MetricCube(frame)
+    result = run_operation(OperationCall(operation="correlation", metrics=["spend", "revenue"]), cube, frame)
+    assert result.shape == (2, 2)
+    with pytest.raises(ValueError):
+        run_operation(OperationCall(operation="correlation", metrics=["spend"]), cube, frame)
+
+def test_unservable_calls_raise_value_error(frame):
+    cube = MetricCube(frame)
+    with pytest.raises(ValueError):
+        run_operation(OperationCall(operation="free_form"), cube, frame)
+    with pytest.raises(ValueError):
+        run_operation(OperationCall(operation="daily_trend", metrics=["frequency"]), cube, frame)
@@ -0,0 +1,78 @@
+import json
+import pytest
+from src.agents.planner import Plan, PlannerAgent
+from src.utils import plan_library
+from src.utils.plan_library import PlanLibrary, templatize
+
+PLAN = {"steps": [
+    {"step_name": "Daily metrics", "agent": "DataAgent",
+     "description": "Calculate daily ROAS and CTR for Summer Sale over the last 14 days."},
+    {"step_name": "Diagnose", "agent": "InsightAgent",
+     "description": "Explain the ROAS drop of Summer Sale since 2025-01-10."},
+]}
+
+class NoLLM:
+    def invoke(self, messages):
+        raise AssertionError("the planner LLM should not be called")
+
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    lib = PlanLibrary(str(tmp_path / "plans.json"), threshold=0.8)
+    monkeypatch.setattr(plan_library, "plan_library", lib)
+    return lib
+
+def make_planner(entities=()):
+    planner = PlannerAgent.__new__(PlannerAgent)
+    planner.llm = NoLLM()
+    planner.entities = list(entities)
+    return planner
+
+def test_templatize_slots_campaigns_dates_and_day_counts():
+    template, slots = templatize("Why did ROAS drop for campaign Summer Sale in the last 14 days since 2025-01-10?")
+    assert template == "Why did ROAS drop for campaign {campaign} in the last {days} days since {date}?"
+    assert slots == {"campaign": "Summer Sale", "days": "14", "date": "2025-01-10"}
+    assert templatize("Compare 'Spring Promo' and 'Winter Deals'")[1] == {"campaign": "Spring Promo", "campaign_2": "Winter Deals"}
+    # Known dataset entities are slotted without quotes or a "campaign" prefix
+    assert templatize("why is summer sale falling", ["Summer Sale"])[0] == "why is {campaign} falling"
+
+def test_learned_plan_is_reused_with_the_new_values(library):
+    library.learn("Why did ROAS drop for campaign Summer Sale in the last 14 days since 2025-01-10?", PLAN)
+    plan, _, score = library.match("Why did ROAS fall for campaign Winter Deals over the last 7 days since 2025-02-01?")
+    assert score >= 0.8
+    assert plan["steps"][0]["description"] == "Calculate daily ROAS and CTR for Winter Deals over the last 7 days."
+    assert plan["steps"][1]["description"] == "Explain the ROAS drop of Winter Deals since 2025-02-01."
+    # A different question, or the same one about a different set of entities, is planned afresh
+    assert library.match("Write new headlines for campaign Winter Deals in the last 7 days since 2025-02-01") is None
+    assert library.match("Why did ROAS drop in the last 7 days since 2025-02-01?") is None
+    # The library is persisted for later processes
+    assert PlanLibrary(library.path).match("Why did ROAS drop for campaign Autumn in the last 3 days since 2025-03-01?") is not None
+
+def test_metric_and_direction_must_match(library):
+    library.learn("Analyze why ROAS dropped last week and suggest creative fixes", PLAN)
+    assert library.match("Analyze why ROAS fell last week and suggest creative fixes") is not None
+    # Same wording, different analysis: these are planned afresh
+    assert library.match("Analyze why CTR dropped last week and suggest creative fixes") is None
+    assert library.match("Analyze why CPM dropped last week and suggest creative fixes") is None
+    assert library.match("Analyze why ROAS increased last week and suggest creative fixes") is None
+    assert library.match("Analyze why ROAS and CTR dropped last week and suggest creative fixes") is None
+
+def test_planner_reuses_and_learns_from_outcomes(library):
+    planner = make_planner(entities=["Summer Sale", "Winter Deals"])
+    first = Plan.model_validate(PLAN)
+    planner.record_outcome("Why did ROAS drop for Summer Sale in the last 14 days since 2025-01-10?", first, passed=True)
+
+    reused = planner.create_plan("Why did ROAS drop for Winter Deals in the last 14 days since 2025-01-10?")
+    assert reused._library_entry is not None
+    assert "Winter Deals" in reused.steps[0].description
+
+    # A reused plan that fails more often than it passes is no longer served
+    planner.record_outcome("q", reused, passed=False)
+    planner.record_outcome("q", reused, passed=False)
+    assert library.match("Why did ROAS drop for Winter Deals in the last 14 days since 2025-01-10?", planner.entities) is None
+    entry = json.load(open(library.path))[reused._library_entry]
+    assert (entry["successes"], entry["failures"]) == (1, 2)
+
+def test_failed_runs_are_not_learned(library):
+    planner = make_planner()
+    planner.record_outcome("Analyze ROAS drop", Plan.model_validate(PLAN), passed=False)
+    assert library.match("Analyze ROAS drop") is None
@@ -0,0 +1,33 @@
+import asyncio
+import json
+from src import benchmark, run
+
+def test_top_ads_are_fetched_off_the_critical_path(isolated_config, tmp_path):
+    report = asyncio.run(benchmark.run_benchmark([120], "Analyze ROAS drop", latency=0.05, sandbox=False, output_dir=str(tmp_path)))
+    assert report["sizes"][0]["status"] == "ok"
+
+    with open(tmp_path / "rows_120" / "trace.json") as f:
+        spans = {s["name"]: s for s in json.load(f)["spans"]}
+    fetch = spans["fetch top_ads"]
+    insight = next(s for name, s in spans.items() if name.startswith("step") and s["attributes"]["agent"] == "InsightAgent")
+    creative = next(s for name, s in spans.items() if name.startswith("step") and s["attributes"]["agent"] == "CreativeGenerator")
+    # Fetched while the earlier steps ran, so the creative step does not wait for it
+    assert fetch["start"] < insight["start"]
+    assert fetch["end"] <= creative["start"] + 0.01
+
+def test_unused_prefetches_are_cancelled():
+    async def slow():
+        await asyncio.sleep(10)
+
+    async def failing():
+        raise RuntimeError("no data")
+
+    async def main():
+        tasks = {"top_ads": asyncio.create_task(slow()), "other": asyncio.create_task(failing())}
+        await asyncio.sleep(0)
+        await run.discard_prefetches(tasks)
+        return tasks
+
+    tasks = asyncio.run(main())
+    assert tasks["top_ads"].cancelled()
+    assert isinstance(tasks["other"].exception(), RuntimeError)
@@ -2,6 +2,7 @@ import unittest
 import pandas as pd
 import os
 import time
+import asyncio
 from src.utils.validators import validate_schema
 from src.utils.error_handler import safe_execute, AgentError
 from src.utils.logger import setup_logger
@@ -61,5 +62,19 @@ class TestProductionReadiness(unittest.TestCase):
         # Should have tried 2 times (initial + 1 retry)
         self.assertEqual(self.counter, 2)
 
+    def test_async_retry_logic(self):
+        self.counter = 0
+
+        @safe_execute(retries=2, backoff_factor=0.1, raise_on_error=True)
+        async def failing_coroutine():
+            self.counter += 1
+            if self.counter < 3:
+                raise Exception("Fail")
+            return "Success"
+
+        result = asyncio.run(failing_coroutine())
+        self.assertEqual(result, "Success")
+        self.assertEqual(self.counter, 3)
+
 if __name__ == '__main__':
     unittest.main()
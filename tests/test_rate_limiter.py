@@ -0,0 +1,53 @@
+import time
+from types import SimpleNamespace
+from src.utils.rate_limiter import TokenBucketRateLimiter, parse_retry_after, is_rate_limit_error, get_retry_after
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, headers):
+        super().__init__("rate limited")
+        self.response = SimpleNamespace(headers=headers)
+
+def test_acquire_within_quota_does_not_wait():
+    limiter = TokenBucketRateLimiter(requests_per_minute=60, tokens_per_minute=10000)
+    start = time.perf_counter()
+    for _ in range(5):
+        limiter.acquire(tokens=100)
+    assert time.perf_counter() - start < 0.1
+
+def test_exhausted_bucket_reports_wait():
+    limiter = TokenBucketRateLimiter(requests_per_minute=60, tokens_per_minute=600)
+    assert limiter._reserve(600) == 0.0
+    wait = limiter._reserve(60)
+    # 60 tokens at 600 tokens/min refill is roughly 6 seconds
+    assert 5.0 < wait <= 6.0
+
+def test_rate_limited_pauses_and_backs_off():
+    limiter = TokenBucketRateLimiter(requests_per_minute=60, tokens_per_minute=10000, min_rate_fraction=0.25)
+    limiter.on_rate_limited(retry_after=3)
+    assert limiter.rate_scale == 0.5
+    assert limiter._reserve(1) > 2.5
+    limiter.on_rate_limited(retry_after=3)
+    limiter.on_rate_limited(retry_after=3)
+    assert limiter.rate_scale == 0.25
+    limiter.on_success()
+    assert limiter.rate_scale > 0.25
+
+def test_parse_retry_after_formats():
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after("2m59.5s") == 179.5
+    assert parse_retry_after("120ms") == 0.12
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+
+def test_retry_after_found_through_cause_chain():
+    try:
+        try:
+            raise FakeRateLimitError({"retry-after": "4"})
+        except FakeRateLimitError as e:
+            raise RuntimeError("wrapped") from e
+    except RuntimeError as wrapped:
+        assert is_rate_limit_error(wrapped)
+        assert get_retry_after(wrapped) == 4.0
+    assert not is_rate_limit_error(ValueError("nope"))
@@ -0,0 +1,89 @@
+import os
+import subprocess
+import sys
+import time
+import pandas as pd
+import pytest
+from src.utils.error_handler import DataProcessingError
+from src.utils import sandbox
+from src.utils.sandbox import SandboxPool, share_frame
+
+@pytest.fixture(scope="module")
+def pool(tmp_path_factory):
+    df = pd.DataFrame({
+        "date": pd.to_datetime(["2025-01-01", "2025-01-02", "2025-01-03"]),
+        "campaign_name": ["A", "B", "A"],
+        "spend": [10.0, 20.0, 30.0],
+        "impressions": [1000, 2000, 3000],
+        "clicks": [10, 20, 30],
+        "revenue": [30.0, 20.0, 90.0],
+    })
+    path = share_frame(df, "test-fingerprint", directory=str(tmp_path_factory.mktemp("sandbox")))
+    pool = SandboxPool(path, workers=2, timeout_seconds=2, max_memory_mb=4096)
+    yield pool
+    pool.close()
+
+def test_runs_snippet_against_shared_frame(pool):
+    assert pool.run("result = df['spend'].sum()") == "60.0"
+    rendered = pool.run("result = cube.query('campaign_name', metrics=['roas'], by_date=False)")
+    assert "campaign_name" in rendered and "| A" in rendered
+
+def test_errors_are_reported_and_worker_survives(pool):
+    with pytest.raises(DataProcessingError, match="KeyError"):
+        pool.run("result = df['missing']")
+    assert pool.run("result = len(df)") == "3"
+
+def test_timeout_kills_and_replaces_worker(pool):
+    start = time.monotonic()
+    with pytest.raises(DataProcessingError, match="time limit"):
+        pool.run("while True:\n    pass")
+    assert time.monotonic() - start < 5
+    # The pool is still fully usable afterwards
+    assert pool.run("result = 1 + 1") == "2"
+    assert pool.run("result = 2 + 2") == "4"
+
+def test_pool_keeps_its_dataset_when_the_snapshot_is_replaced(tmp_path):
+    pytest.importorskip("pyarrow")
+    snapshot = str(tmp_path / "snapshot.arrow")
+    pd.DataFrame({
+        "date": pd.to_datetime(["2025-01-01", "2025-01-02"]),
+        "campaign_name": ["A", "B"],
+        "spend": [1.0, 2.0],
+        "impressions": [100, 200],
+        "clicks": [1, 2],
+        "revenue": [3.0, 6.0],
+    }).to_feather(snapshot)
+    path = share_frame(None, "snapshot-fingerprint", directory=str(tmp_path / "sandbox"), snapshot_path=snapshot)
+    assert path != snapshot and os.path.samefile(path, snapshot)
+
+    pool = SandboxPool(path, workers=1, timeout_seconds=2, max_memory_mb=4096)
+    try:
+        # A newer ingest deletes the old snapshot; a replacement worker must still find its data
+        os.remove(snapshot)
+        with pytest.raises(DataProcessingError, match="time limit"):
+            pool.run("while True:\n    pass")
+        assert pool.run("result = df['spend'].sum()") == "3.0"
+    finally:
+        pool.close()
+    assert not os.path.exists(path)
+
+def test_only_unused_dataset_files_are_pruned(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    directory = tmp_path / "sandbox"
+    directory.mkdir()
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    files = {
+        "exited": directory / f"{exited.pid}-old.arrow",
+        "other_process": directory / f"{os.getppid()}-live.arrow",
+        "own_unused": directory / f"{os.getpid()}-unused.arrow",
+        "own_in_use": directory / f"{os.getpid()}-in-use.arrow",
+    }
+    for path in files.values():
+        path.write_bytes(b"")
+    monkeypatch.setitem(sandbox._in_use, str(files["own_in_use"]), 1)
+
+    share_frame(pd.DataFrame({"spend": [1.0]}), "new-fingerprint", directory=str(directory))
+    remaining = set(os.listdir(directory))
+    assert files["other_process"].name in remaining and files["own_in_use"].name in remaining
+    assert files["exited"].name not in remaining and files["own_unused"].name not in remaining
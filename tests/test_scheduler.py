@@ -0,0 +1,53 @@
+import asyncio
+import time
+from src.agents.planner import PlanStep
+from src.utils.scheduler import infer_dependencies, execute_plan
+
+def make_steps(*agents):
+    return [PlanStep(step_name=f"Step {i+1}", description="test", agent=agent) for i, agent in enumerate(agents)]
+
+def test_infer_dependencies_typical_plan():
+    steps = make_steps("DataAgent", "InsightAgent", "DataAgent", "InsightAgent", "CreativeGenerator")
+    deps = infer_dependencies(steps)
+    assert deps[0] == set()
+    assert deps[1] == {0}
+    assert deps[2] == set() # DataAgent steps never wait on each other
+    assert deps[3] == {0, 2}
+    assert deps[4] == {1, 3}
+
+def test_infer_dependencies_unknown_agent_is_a_barrier():
+    steps = make_steps("DataAgent", "Evaluator", "DataAgent")
+    deps = infer_dependencies(steps)
+    assert deps[1] == {0}
+    assert deps[2] == {1}
+
+def test_execute_plan_runs_independent_steps_concurrently():
+    steps = make_steps("DataAgent", "DataAgent", "DataAgent", "InsightAgent")
+    order = []
+
+    async def run_step(i, step, results):
+        await asyncio.sleep(0.2)
+        if step.agent == "InsightAgent":
+            # All DataAgent outputs must be available by now
+            assert sorted(results) == [0, 1, 2]
+        order.append(i)
+        return f"out-{i}"
+
+    start = time.perf_counter()
+    results = asyncio.run(execute_plan(steps, run_step, max_concurrency=4))
+    elapsed = time.perf_counter() - start
+
+    assert results == {0: "out-0", 1: "out-1", 2: "out-2", 3: "out-3"}
+    assert order[-1] == 3
+    assert elapsed < 0.6 # critical path is two steps, not four
+
+def test_execute_plan_continues_after_failure():
+    steps = make_steps("DataAgent", "InsightAgent")
+
+    async def run_step(i, step, results):
+        if i == 0:
+            raise RuntimeError("boom")
+        return "insights"
+
+    results = asyncio.run(execute_plan(steps, run_step))
+    assert results == {1: "insights"}
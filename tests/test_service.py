@@ -0,0 +1,61 @@
+import asyncio
+import json
+from src.service import AnalysisService, JobManager
+
+async def fake_runner(query, output_dir, progress):
+    progress({"event": "planned", "steps": [{"step": 1, "name": "load", "agent": "DataAgent"}]})
+    await asyncio.sleep(0.01)
+    progress({"event": "step_completed", "step": 1, "name": "load", "ok": True})
+    if query == "boom":
+        raise RuntimeError("agent exploded")
+    return {"query": query, "status": "ok", "output_dir": output_dir, "latency_seconds": 0.01}
+
+async def request(port, method, path, payload=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, body = raw.partition(b"\r\n\r\n")
+    return int(head.split()[1]), body
+
+def run_with_service(scenario):
+    async def main():
+        service = AnalysisService(JobManager(fake_runner, max_concurrent_jobs=2, output_dir="reports/test_jobs"))
+        server = await asyncio.start_server(service.handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return await scenario(port, service)
+    return asyncio.run(main())
+
+def test_job_lifecycle_with_streamed_progress():
+    async def scenario(port, service):
+        status, body = await request(port, "POST", "/jobs", {"query": "Analyze ROAS drop"})
+        assert status == 202
+        job_id = json.loads(body)["id"]
+
+        status, body = await request(port, "GET", f"/jobs/{job_id}/events")
+        events = [json.loads(line)["event"] for line in body.splitlines()]
+        assert events == ["started", "planned", "step_completed", "done"]
+
+        status, body = await request(port, "GET", f"/jobs/{job_id}")
+        job = json.loads(body)
+        assert status == 200 and job["status"] == "done"
+        assert job["result"]["output_dir"].endswith(job_id)
+    run_with_service(scenario)
+
+def test_failed_job_and_bad_requests():
+    async def scenario(port, service):
+        status, body = await request(port, "POST", "/jobs", {"query": "boom"})
+        job_id = json.loads(body)["id"]
+        await service.jobs.wait_idle()
+        job = json.loads((await request(port, "GET", f"/jobs/{job_id}"))[1])
+        assert job["status"] == "failed" and "exploded" in job["error"]
+
+        assert (await request(port, "POST", "/jobs", {"nope": 1}))[0] == 400
+        assert (await request(port, "GET", "/jobs/unknown"))[0] == 404
+        assert (await request(port, "DELETE", "/jobs"))[0] == 405
+        health = json.loads((await request(port, "GET", "/health"))[1])
+        assert health["status"] == "ok" and health["active_jobs"] == 0
+    run_with_service(scenario)
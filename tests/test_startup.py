@@ -0,0 +1,49 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["pandas", "numpy", "langchain_core", "langchain_groq"]
+# Measured at well under 0.2s; the budget leaves room for slow CI machines
+IMPORT_BUDGET_SECONDS = 1.0
+
+def run_python(code):
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+def run_dirs():
+    return {d for d in os.listdir(os.path.join(REPO_ROOT, "logs")) if d.startswith("run_")} if os.path.isdir(os.path.join(REPO_ROOT, "logs")) else set()
+
+def test_importing_run_defers_heavy_modules():
+    out = run_python(
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        "import src.run\n"
+        "print(json.dumps({'seconds': time.perf_counter() - start, 'modules': sorted(sys.modules)}))"
+    )
+    report = json.loads(out.strip().splitlines()[-1])
+    assert [m for m in HEAVY_MODULES if m in report["modules"]] == []
+    assert report["seconds"] < IMPORT_BUDGET_SECONDS
+
+def test_config_is_parsed_once():
+    out = run_python(
+        "import yaml\n"
+        "calls = []\n"
+        "original = yaml.safe_load\n"
+        "yaml.safe_load = lambda *a, **k: calls.append(1) or original(*a, **k)\n"
+        "import src.agents.data_agent, src.agents.planner, src.agents.insight_agent, src.agents.evaluator, src.agents.creative_generator, src.run\n"
+        "print(len(calls))"
+    )
+    assert out.strip().splitlines()[-1] == "1"
+
+def test_help_is_fast_and_creates_no_run_directory():
+    before = run_dirs()
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-m", "src.run", "--help"], cwd=REPO_ROOT, capture_output=True, text=True, timeout=60)
+    elapsed = time.perf_counter() - start
+    assert result.returncode == 0 and "--batch" in result.stdout
+    assert elapsed < IMPORT_BUDGET_SECONDS + 1.0 # includes interpreter startup
+    assert run_dirs() == before
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.utils.streaming import StreamingAggregator, stream_aggregate
+from src.utils.error_handler import SchemaValidationError
+
+def make_rows(n=60):
+    rng = np.random.default_rng(0)
+    spend = rng.uniform(10, 100, n).round(2)
+    impressions = rng.integers(1000, 5000, n)
+    clicks = rng.integers(10, 100, n)
+    revenue = (spend * rng.uniform(0.5, 4, n)).round(2)
+    return pd.DataFrame({
+        "campaign_name": np.where(np.arange(n) % 2, "Campaign A", "Campaign B"),
+        "adset_name": np.where(np.arange(n) % 3, "Adset 1", "Adset 2"),
+        "date": pd.date_range("2025-01-01", periods=5).repeat(n // 5).strftime("%Y-%m-%d"),
+        "spend": spend,
+        "impressions": impressions,
+        "clicks": clicks,
+        "ctr": clicks / impressions,
+        "purchases": rng.integers(0, 10, n),
+        "revenue": revenue,
+        "roas": revenue / spend
+    })
+
+def test_streamed_aggregate_matches_in_memory_groupby(tmp_path):
+    raw = make_rows()
+    csv_path = tmp_path / "ads.csv"
+    raw.to_csv(csv_path, index=False)
+
+    keys = ["campaign_name", "adset_name", "date"]
+    streamed = stream_aggregate(str(csv_path), chunk_size=7, keys=keys)
+
+    raw["date"] = pd.to_datetime(raw["date"])
+    expected = raw.groupby(keys)[["spend", "revenue", "clicks", "impressions"]].sum().reset_index()
+    merged = streamed.merge(expected, on=keys, suffixes=("", "_expected"))
+    assert len(merged) == len(expected) == len(streamed)
+    for measure in ["spend", "revenue", "clicks", "impressions"]:
+        np.testing.assert_allclose(merged[measure], merged[f"{measure}_expected"])
+    # Ratios come from summed components, not averaged ratios
+    np.testing.assert_allclose(merged["roas"], merged["revenue_expected"] / merged["spend_expected"])
+    assert streamed["rows"].sum() == len(raw)
+
+def test_aggregator_recovers_revenue_from_roas():
+    chunk = pd.DataFrame({
+        "campaign_name": ["A", "A"],
+        "date": pd.to_datetime(["2025-01-01", "2025-01-01"]),
+        "spend": [10.0, 30.0],
+        "impressions": [100, 100],
+        "clicks": [1, 3],
+        "roas": [4.0, 2.0]
+    })
+    aggregator = StreamingAggregator(["campaign_name", "date"])
+    aggregator.update(chunk)
+    result = aggregator.result()
+    # (10 * 4 + 30 * 2) / 40, not the plain average of 3.0
+    assert result.loc[0, "roas"] == pytest.approx(2.5)
+
+def test_invalid_batch_fails_with_global_row_number(tmp_path):
+    raw = make_rows(20)
+    raw.loc[13, "impressions"] = -1
+    csv_path = tmp_path / "ads.csv"
+    raw.to_csv(csv_path, index=False)
+    with pytest.raises(SchemaValidationError, match="Row 13"):
+        stream_aggregate(str(csv_path), chunk_size=5, keys=["campaign_name", "date"])
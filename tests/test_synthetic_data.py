@@ -0,0 +1,57 @@
+import json
+import pandas as pd
+import pytest
+from src.utils.synthetic_data import COLUMNS, SyntheticAdsGenerator, parse_injection
+from src.utils.validators import validate_schema
+
+def read(path):
+    df = pd.read_csv(path)
+    df["date"] = pd.to_datetime(df["date"])
+    return df
+
+def test_output_matches_schema_and_row_count(tmp_path):
+    path = str(tmp_path / "ads.csv")
+    manifest = SyntheticAdsGenerator(rows=5000, days=30).write_csv(path, chunk_rows=700)
+    df = read(path)
+    assert list(df.columns) == COLUMNS
+    assert len(df) == 5000 == manifest["rows"]
+    assert validate_schema(df)
+    # Derived columns are consistent with their components
+    assert (df["ctr"] - df["clicks"] / df["impressions"]).abs().max() < 1e-4
+    assert (df["roas"] - df["revenue"] / df["spend"]).abs().max() < 0.01
+
+def test_same_seed_same_data(tmp_path):
+    a = pd.concat(SyntheticAdsGenerator(rows=2000, days=20, seed=7).iter_chunks(500))
+    b = pd.concat(SyntheticAdsGenerator(rows=2000, days=20, seed=7).iter_chunks(500))
+    c = pd.concat(SyntheticAdsGenerator(rows=2000, days=20, seed=8).iter_chunks(500))
+    pd.testing.assert_frame_equal(a.reset_index(drop=True), b.reset_index(drop=True))
+    assert not a["spend"].equals(c["spend"])
+
+def test_chunks_are_bounded():
+    generator = SyntheticAdsGenerator(rows=10_000, days=50)
+    sizes = [len(chunk) for chunk in generator.iter_chunks(chunk_rows=1000)]
+    assert sum(sizes) == 10_000
+    assert max(sizes) <= max(1000, len(generator.ads))
+
+def test_injected_anomalies_are_visible(tmp_path):
+    path = str(tmp_path / "ads.csv")
+    generator = SyntheticAdsGenerator(
+        rows=20_000, days=40,
+        roas_drops=[parse_injection("auto:2025-01-21:0.5", "factor")],
+        ctr_fatigue=[{"campaign": "auto", "start": "2025-01-11", "daily_decay": 0.05}],
+    )
+    generator.write_csv(path)
+    df = read(path)
+    campaign = generator.roas_drops[0]["campaign"]
+    rows = df[df["campaign_name"] == campaign]
+    before, after = rows[rows["date"] < "2025-01-21"], rows[rows["date"] >= "2025-01-21"]
+    assert after["revenue"].sum() / after["spend"].sum() < 0.7 * before["revenue"].sum() / before["spend"].sum()
+    assert after["clicks"].sum() / after["impressions"].sum() < 0.5 * before["clicks"].sum() / before["impressions"].sum()
+
+    with open(f"{path}.anomalies.json") as f:
+        manifest = json.load(f)
+    assert manifest["roas_drops"][0]["campaign"] == campaign
+
+def test_unknown_injection_campaign_is_rejected():
+    with pytest.raises(ValueError):
+        SyntheticAdsGenerator(rows=100, days=10, roas_drops=[{"campaign": "Nope", "start": "2025-01-05", "factor": 0.5}])
@@ -0,0 +1,94 @@
+import asyncio
+import json
+from src import benchmark
+from src.utils import tracing
+from src.utils.error_handler import safe_execute
+
+def spans_by_name(trace):
+    return {s["name"]: s for s in trace.to_dict()["spans"]}
+
+def test_spans_are_noops_outside_a_trace():
+    with tracing.span("orphan") as span:
+        span.set(tokens=3)
+    assert span is tracing.NOOP_SPAN
+
+def test_nesting_follows_tasks_and_threads():
+    trace = tracing.start_trace("run")
+
+    def blocking_work():
+        with tracing.span("in thread", kind="exec"):
+            pass
+
+    async def step(n):
+        with tracing.span(f"step {n}", kind="step"):
+            await asyncio.to_thread(blocking_work)
+
+    async def main():
+        with trace.root:
+            await asyncio.gather(step(1), step(2))
+
+    asyncio.run(main())
+    spans = trace.to_dict()["spans"]
+    by_id = {s["span_id"]: s for s in spans}
+    threaded = [s for s in spans if s["name"] == "in thread"]
+    assert len(spans) == 5 and len(threaded) == 2
+    assert {by_id[s["parent_id"]]["name"] for s in threaded} == {"step 1", "step 2"}
+    assert all(by_id[s["parent_id"]]["kind"] == "run" for s in spans if s["kind"] == "step")
+    assert all(s["duration_ms"] >= 0 for s in spans)
+
+def test_retries_are_recorded_as_attempt_spans():
+    calls = {"n": 0}
+
+    @safe_execute(default_return=None, log_context="Flaky", retries=2, backoff_factor=0)
+    def flaky():
+        calls["n"] += 1
+        if calls["n"] < 3:
+            raise RuntimeError("transient")
+        return "ok"
+
+    trace = tracing.start_trace("run")
+    with trace.root:
+        assert flaky() == "ok"
+    attempts = [s for s in trace.to_dict()["spans"] if s["kind"] == "attempt"]
+    assert [a["attributes"]["attempt"] for a in attempts] == [1, 2, 3]
+    assert [a["status"] for a in attempts] == ["error", "error", "ok"]
+    assert "transient" in attempts[0]["error"]
+
+def test_chrome_export_and_summary():
+    trace = tracing.start_trace("run")
+    with trace.root:
+        with tracing.span("step 1", kind="step", agent="DataAgent"):
+            with tracing.span("llm text", kind="llm"):
+                pass
+        with tracing.span("step 2", kind="step", agent="InsightAgent"):
+            pass
+    data = trace.to_dict()
+
+    chrome = tracing.to_chrome_trace([data])
+    events = [e for e in chrome["traceEvents"] if e["ph"] == "X"]
+    assert len(events) == 4
+    lanes = {e["name"]: e["tid"] for e in events}
+    assert lanes["llm text"] == lanes["step 1"] != lanes["step 2"]
+
+    rows = {(r["kind"], r["name"]): r for r in tracing.summarize([data])}
+    assert rows[("step", "DataAgent")]["count"] == 1
+    assert rows[("step", "DataAgent")]["p95_ms"] >= rows[("llm", "llm text")]["p50_ms"]
+
+def test_run_query_writes_span_tree(isolated_config, tmp_path):
+    report = asyncio.run(benchmark.run_benchmark([120], "Analyze ROAS drop", sandbox=False, output_dir=str(tmp_path)))
+    assert report["sizes"][0]["status"] == "ok"
+
+    with open(tmp_path / "rows_120" / "trace.json") as f:
+        trace = json.load(f)
+    spans = trace["spans"]
+    by_id = {s["span_id"]: s for s in spans}
+    kinds = {s["kind"] for s in spans}
+    assert {"run", "step", "attempt", "llm", "exec"} <= kinds
+
+    steps = [s for s in spans if s["kind"] == "step"]
+    assert {s["attributes"]["agent"] for s in steps} >= {"PlannerAgent", "DataAgent", "InsightAgent", "CreativeGenerator", "EvaluatorAgent"}
+    llm_calls = [s for s in spans if s["kind"] == "llm"]
+    assert all(s["attributes"]["cache"] in ("hit", "miss", "off") for s in llm_calls)
+    assert any(s["attributes"].get("completion_tokens") for s in llm_calls)
+    # Every span except the root hangs off a span of the same trace
+    assert all(s["parent_id"] in by_id for s in spans if s["kind"] != "run")
@@ -0,0 +1,80 @@
+import asyncio
+import json
+import pytest
+from src import benchmark
+from src.utils.error_handler import BudgetExceededError, safe_execute
+from src.utils.usage import TokenLedger, step_scope, track_run
+
+def test_usage_is_attributed_to_agent_step_and_attempt():
+    ledger = TokenLedger()
+    attempts = {"n": 0}
+
+    @safe_execute(log_context="InsightAgent.analyze", retries=2, backoff_factor=0)
+    def analyze():
+        labels = ledger.reserve(100)
+        attempts["n"] += 1
+        if attempts["n"] == 1:
+            ledger.record(labels, 80, 0, ok=False)
+            raise RuntimeError("malformed JSON")
+        ledger.record(labels, 80, 20)
+        return "ok"
+
+    with track_run(ledger), step_scope("4. Diagnose"):
+        assert analyze() == "ok"
+
+    summary = ledger.summary()
+    assert summary["prompt_tokens"] == 160 and summary["completion_tokens"] == 20
+    assert summary["retry_tokens"] == 100 and summary["failed_calls"] == 1
+    assert summary["by_agent"]["InsightAgent"]["calls"] == 2
+    assert summary["by_step"]["4. Diagnose"]["prompt_tokens"] == 160
+    assert ledger.reserved == 0
+
+def test_budget_errors_are_not_retried_even_when_wrapped():
+    ledger = TokenLedger(agent_tokens={"CreativeGenerator": 50})
+    calls = {"n": 0}
+
+    @safe_execute(default_return=None, log_context="CreativeGenerator.generate", retries=3, backoff_factor=0)
+    def generate():
+        calls["n"] += 1
+        try:
+            ledger.reserve(100)
+        except Exception as e:
+            raise RuntimeError("LLM failed") from e
+
+    with pytest.raises(BudgetExceededError):
+        generate()
+    assert calls["n"] == 1
+    assert "CreativeGenerator budget of 50" in ledger.summary()["budget"]["exceeded"][0]
+
+def test_reservations_keep_concurrent_calls_within_budget():
+    ledger = TokenLedger(run_tokens=250)
+    first = ledger.reserve(100)
+    ledger.reserve(100)
+    with pytest.raises(BudgetExceededError):
+        ledger.reserve(100)
+    ledger.record(first, 10, 5)
+    assert ledger.remaining() == 250 - 15 - 100
+
+def run_offline(tmp_path, rows):
+    report = asyncio.run(benchmark.run_benchmark([rows], "Analyze ROAS drop", sandbox=False, output_dir=str(tmp_path)))
+    with open(tmp_path / f"rows_{rows}" / "usage.json") as f:
+        return report["sizes"][0], json.load(f)
+
+def test_run_writes_usage_and_degrades_evaluator(isolated_config, tmp_path):
+    isolated_config["budgets"] = {"run_tokens": None, "agent_tokens": {"EvaluatorAgent": 100}}
+    entry, usage = run_offline(tmp_path, 110)
+
+    assert entry["status"] == "ok"
+    assert set(usage["by_agent"]) == {"PlannerAgent", "DataAgent", "InsightAgent", "CreativeGenerator"}
+    assert usage["total_tokens"] == usage["prompt_tokens"] + usage["completion_tokens"] > 0
+    assert "EvaluatorAgent budget" in usage["budget"]["exceeded"][0]
+    with open(tmp_path / "rows_110" / "report.md") as f:
+        assert "Creative Recommendations" in f.read()
+
+def test_run_stops_cleanly_when_planning_exceeds_budget(isolated_config, tmp_path):
+    isolated_config["budgets"] = {"run_tokens": 50}
+    report = asyncio.run(benchmark.run_benchmark([110], "Analyze ROAS drop", sandbox=False, output_dir=str(tmp_path)))
+    with open(tmp_path / "rows_110" / "usage.json") as f:
+        usage = json.load(f)
+    assert report["sizes"][0]["status"] == "budget_exceeded"
+    assert usage["calls"] == 0 and usage["budget"]["exceeded"]
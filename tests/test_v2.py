@@ -2,7 +2,9 @@ import pytest
 import pandas as pd
 import json
 from datetime import datetime
-from src.utils.validators import validate_schema
+from pydantic import ValidationError
+from src.schema import InputSchema
+from src.utils.validators import validate_schema, find_violations
 from src.utils.error_handler import SchemaValidationError
 from src.agents.evaluator import EvaluatorAgent
 
@@ -52,6 +54,50 @@ def test_schema_validation_fail_invalid_type():
     with pytest.raises(SchemaValidationError):
         validate_schema(df)
 
+def test_schema_validation_matches_row_by_row_pydantic():
+    data = {
+        "date": ["2025-01-01", "2025-01-02", "not a date", "2025-01-04", "2025-01-05", "2025-01-06"],
+        "campaign_name": ["A", "B", "C", None, "E", "F"],
+        "adset_name": ["x"] * 6,
+        "impressions": [1000, -5, 1000, 1000, 1000, 1000],
+        "clicks": [10.0, 10.0, 10.0, 10.0, 10.5, 10.0],
+        "spend": [50.0, 50.0, 50.0, 50.0, 50.0, float("nan")],
+        "roas": [2.5] * 6,
+        "ctr": [1.0, 1.0, 1.0, 1.0, 1.0, 150.0]
+    }
+    df = pd.DataFrame(data)
+    violations = find_violations(df)
+    flagged = sorted({row for violation in violations.values() for row in violation["rows"]})
+
+    expected = []
+    for index, row in df.iterrows():
+        try:
+            InputSchema(**row.to_dict())
+        except ValidationError:
+            expected.append(index)
+    assert flagged == expected == [1, 2, 3, 4, 5]
+
+    with pytest.raises(SchemaValidationError) as excinfo:
+        validate_schema(df)
+    assert "Schema Validation Failed with 5 errors" in str(excinfo.value)
+    assert "Row 1: 1 validation error for InputSchema" in str(excinfo.value)
+
+def test_schema_validation_reports_first_rows_per_rule():
+    df = pd.DataFrame({
+        "date": [datetime.now()] * 20,
+        "campaign_name": ["A"] * 20,
+        "adset_name": ["x"] * 20,
+        "impressions": [-1] * 20,
+        "clicks": [1] * 20,
+        "spend": [1.0] * 20,
+        "roas": [1.0] * 20,
+        "ctr": [1.0] * 20
+    })
+    violations = find_violations(df, max_rows_per_rule=3)
+    rule = "impressions: must be greater than or equal to 0"
+    assert violations[rule]["count"] == 20
+    assert violations[rule]["rows"] == [0, 1, 2]
+
 # --- Evaluator Tests ---
 
 def test_evaluator_statistical_validation_pass():